@@ -0,0 +1,154 @@
+# aiodb.py
+"""
+Async access to the database get_conn() uses, for the ASGI entry point (asgi.py).
+
+MySQL with aiomysql installed (requirements-asgi.txt): one aiomysql pool per
+event loop for the primary and one per replica, so a coroutine awaiting a query
+frees the loop for other requests. Replicas get the same treatment as in db.py:
+round-robin, a failed one is skipped for REPLICA_RETRY_SECONDS, the primary
+serves when none is usable.
+
+SQLite, or MySQL without aiomysql: each query runs on the sync get_conn() in a
+bounded thread pool (ASYNC_DB_THREADS), with exactly the WSGI app's connection
+handling, just off the event loop.
+
+    rows = await aiodb.fetchall("SELECT ... WHERE Order_ID = %s", (order_id,), readonly=True)
+"""
+import asyncio
+import itertools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+
+import pymysql
+
+import db
+
+try:
+    import aiomysql
+except ImportError:  # optional; the thread pool serves instead
+    aiomysql = None
+
+ASYNC_DB_THREADS = int(os.getenv("ASYNC_DB_THREADS", str(db.POOL_SIZE)))
+
+_query_count = ContextVar("aiodb_query_count", default=None)
+
+def count_queries():
+    """Count the fetchall() calls of this task and the ones it spawns; returns the counter ([n])."""
+    counter = [0]
+    _query_count.set(counter)
+    return counter
+
+def backend() -> str:
+    if not db.MYSQL_URL:
+        return "sqlite+threads"
+    return "aiomysql" if aiomysql is not None else "mysql+threads"
+
+async def fetchall(sql, params=None, readonly=False):
+    counter = _query_count.get()
+    if counter is not None:
+        counter[0] += 1
+    if db.MYSQL_URL and aiomysql is not None:
+        return await _pools().fetchall(sql, params, readonly)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), _sync_fetchall, sql, params, readonly)
+
+async def fetchone(sql, params=None, readonly=False):
+    rows = await fetchall(sql, params, readonly)
+    return rows[0] if rows else None
+
+async def close():
+    """Release this loop's pools and the query threads (ASGI lifespan shutdown)."""
+    global _executor
+    pools = _loop_pools.pop(asyncio.get_running_loop(), None)
+    if pools is not None:
+        await pools.close()
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+
+# =========================
+# Thread-pool backend
+# =========================
+_executor = None
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=ASYNC_DB_THREADS, thread_name_prefix="aiodb")
+    return _executor
+
+def _sync_fetchall(sql, params, readonly):
+    with db.get_conn(readonly=readonly) as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            return cur.fetchall()
+
+# =========================
+# aiomysql backend
+# =========================
+class _AioPools:
+    def __init__(self):
+        self._primary = None
+        self._replicas = {}  # url -> pool
+        self._down_until = {url: 0.0 for url in db.MYSQL_REPLICA_URLS}
+        self._turn = itertools.count()
+        self._lock = asyncio.Lock()
+
+    async def _pool(self, url):
+        async with self._lock:
+            pool = self._replicas.get(url) if url else self._primary
+            if pool is None:
+                params = db.mysql_params(url)
+                pool = await aiomysql.create_pool(
+                    host=params["host"], user=params["user"], password=params["password"] or "",
+                    port=params["port"], db=params["database"], autocommit=True,
+                    minsize=1, maxsize=db.POOL_SIZE, pool_recycle=int(db.POOL_RECYCLE),
+                    cursorclass=aiomysql.DictCursor,
+                )
+                if url:
+                    self._replicas[url] = pool
+                else:
+                    self._primary = pool
+            return pool
+
+    def _replica_order(self):
+        urls = db.MYSQL_REPLICA_URLS
+        start = next(self._turn)
+        return [urls[(start + i) % len(urls)] for i in range(len(urls))]
+
+    async def fetchall(self, sql, params, readonly):
+        if readonly:
+            for url in self._replica_order():
+                if self._down_until[url] > time.monotonic():
+                    continue
+                try:
+                    return await self._run(await self._pool(url), sql, params)
+                except (pymysql.err.OperationalError, OSError) as e:
+                    self._down_until[url] = time.monotonic() + db.REPLICA_RETRY_SECONDS
+                    print(f"Read replica {db._redact(url)} unavailable, skipping for {db.REPLICA_RETRY_SECONDS:g}s: {e}")
+        return await self._run(await self._pool(None), sql, params)
+
+    @staticmethod
+    async def _run(pool, sql, params):
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(sql, params)
+                return await cur.fetchall()
+
+    async def close(self):
+        for pool in [self._primary, *self._replicas.values()]:
+            if pool is not None:
+                pool.close()
+                await pool.wait_closed()
+
+_loop_pools = {}
+
+def _pools():
+    # aiomysql connections belong to the loop that opened them
+    loop = asyncio.get_running_loop()
+    pools = _loop_pools.get(loop)
+    if pools is None:
+        pools = _loop_pools[loop] = _AioPools()
+    return pools
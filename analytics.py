@@ -0,0 +1,155 @@
+# analytics.py
+"""
+Sales rollups: DAILY_RESTAURANT_REVENUE (orders and revenue per restaurant per day)
+and DAILY_ITEM_SALES (quantity and revenue per item per day).
+
+Write routes call touch_order() inside their transaction; it enqueues a
+refresh_rollup job for the affected (day, restaurant), coalesced with any refresh
+already waiting. The job recomputes just that slice from ORDERS/ORDER_DETAIL, so
+reports read O(days) rollup rows and never aggregate the order tables on a request.
+`flask analytics-rebuild` recomputes any date range from scratch.
+
+Item revenue uses the current FOOD_ITEM.Price (order lines don't store a price).
+"""
+import os
+from datetime import date, datetime, timedelta
+
+from db import transaction
+from jobs import enqueue_once, task
+
+# Refreshes wait this long so a burst of orders for one restaurant costs one recompute.
+ANALYTICS_REFRESH_DELAY = float(os.getenv("ANALYTICS_REFRESH_DELAY", "5"))
+REBUILD_CHUNK_DAYS = 31
+
+def _day(value) -> str:
+    if isinstance(value, (date, datetime)):
+        return value.strftime("%Y-%m-%d")
+    return str(value)[:10]
+
+def _next_day(day) -> str:
+    return (datetime.strptime(day, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+
+# =========================
+# Maintenance
+# =========================
+def touch_order(conn, order_id=None, order_date=None, restaurant_id=None):
+    """Schedule a rollup refresh for an order's day (pass order_id, or its date and restaurant)."""
+    if order_id is not None:
+        with conn.cursor() as cur:
+            cur.execute("SELECT Order_Date, Restaurant_ID FROM ORDERS WHERE Order_ID = %s", (order_id,))
+            row = cur.fetchone()
+        if not row:
+            return
+        order_date, restaurant_id = row["Order_Date"], row["Restaurant_ID"]
+    if order_date is None or restaurant_id is None:
+        return
+    enqueue_once(conn, "refresh_rollup", {"day": _day(order_date), "restaurant_id": int(restaurant_id)},
+                 delay=ANALYTICS_REFRESH_DELAY)
+
+def forget(conn, restaurant_id=None, item_id=None):
+    """
+    Drop the rollup rows of a restaurant or food item that is being deleted (caller commits).
+    The delete detaches the restaurant's orders and cascades to the order lines, so no
+    refresh would produce these rows again.
+    """
+    with conn.cursor() as cur:
+        if restaurant_id is not None:
+            cur.execute("DELETE FROM DAILY_RESTAURANT_REVENUE WHERE Restaurant_ID = %s", (restaurant_id,))
+            cur.execute("DELETE FROM DAILY_ITEM_SALES WHERE Restaurant_ID = %s", (restaurant_id,))
+        if item_id is not None:
+            cur.execute("DELETE FROM DAILY_ITEM_SALES WHERE Item_ID = %s", (item_id,))
+
+def refresh(conn, start, end, restaurant_id=None):
+    """Recompute both rollups for days start..end (inclusive), optionally for one restaurant."""
+    until = _next_day(end)
+    rest_filter = " AND Restaurant_ID = %s" if restaurant_id is not None else ""
+    order_filter = " AND o.Restaurant_ID = %s" if restaurant_id is not None else ""
+    extra = (restaurant_id,) if restaurant_id is not None else ()
+    with transaction(conn), conn.cursor() as cur:
+        cur.execute(f"DELETE FROM DAILY_RESTAURANT_REVENUE WHERE Sales_Date >= %s AND Sales_Date <= %s{rest_filter}",
+                    (start, end) + extra)
+        cur.execute(f"DELETE FROM DAILY_ITEM_SALES WHERE Sales_Date >= %s AND Sales_Date <= %s{rest_filter}",
+                    (start, end) + extra)
+        cur.execute(f"""
+            INSERT INTO DAILY_RESTAURANT_REVENUE (Sales_Date, Restaurant_ID, Order_Count, Revenue)
+            SELECT DATE(o.Order_Date), o.Restaurant_ID, COUNT(*), COALESCE(SUM(o.Total_Amount), 0)
+            FROM ORDERS o
+            WHERE o.Order_Date >= %s AND o.Order_Date < %s AND o.Restaurant_ID IS NOT NULL{order_filter}
+            GROUP BY DATE(o.Order_Date), o.Restaurant_ID
+        """, (start, until) + extra)
+        cur.execute(f"""
+            INSERT INTO DAILY_ITEM_SALES (Sales_Date, Item_ID, Restaurant_ID, Quantity, Revenue)
+            SELECT DATE(o.Order_Date), od.Item_ID, o.Restaurant_ID, SUM(od.Quantity), SUM(od.Quantity * f.Price)
+            FROM ORDERS o
+            JOIN ORDER_DETAIL od ON od.Order_ID = o.Order_ID
+            JOIN FOOD_ITEM f ON f.Item_ID = od.Item_ID
+            WHERE o.Order_Date >= %s AND o.Order_Date < %s AND o.Restaurant_ID IS NOT NULL{order_filter}
+            GROUP BY DATE(o.Order_Date), od.Item_ID, o.Restaurant_ID
+        """, (start, until) + extra)
+
+@task("refresh_rollup")
+def refresh_rollup(conn, payload):
+    refresh(conn, payload["day"], payload["day"], payload.get("restaurant_id"))
+
+def rebuild(conn, start=None, end=None):
+    """Recompute every day in start..end (default: the whole ORDERS range), a month per transaction."""
+    if start is None or end is None:
+        with conn.cursor() as cur:
+            cur.execute("SELECT MIN(Order_Date) AS first, MAX(Order_Date) AS last FROM ORDERS")
+            row = cur.fetchone() or {}
+        if row.get("first") is None:
+            return 0
+        start, end = start or _day(row["first"]), end or _day(row["last"])
+    day, days = start, 0
+    while day <= end:
+        chunk_end = min(end, (datetime.strptime(day, "%Y-%m-%d") + timedelta(days=REBUILD_CHUNK_DAYS - 1)).strftime("%Y-%m-%d"))
+        refresh(conn, day, chunk_end)
+        days += (datetime.strptime(chunk_end, "%Y-%m-%d") - datetime.strptime(day, "%Y-%m-%d")).days + 1
+        day = _next_day(chunk_end)
+    return days
+
+# =========================
+# Reports
+# =========================
+def revenue_by_day(conn, start, end, restaurant_id=None):
+    where = " AND d.Restaurant_ID = %s" if restaurant_id is not None else ""
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            SELECT d.Sales_Date, SUM(d.Order_Count) AS Order_Count, SUM(d.Revenue) AS Revenue
+            FROM DAILY_RESTAURANT_REVENUE d
+            WHERE d.Sales_Date >= %s AND d.Sales_Date <= %s{where}
+            GROUP BY d.Sales_Date
+            ORDER BY d.Sales_Date
+        """, (start, end) + ((restaurant_id,) if restaurant_id is not None else ()))
+        return cur.fetchall()
+
+def revenue_by_restaurant(conn, start, end, limit=50):
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT d.Restaurant_ID, r.Name AS Restaurant, SUM(d.Order_Count) AS Order_Count, SUM(d.Revenue) AS Revenue
+            FROM DAILY_RESTAURANT_REVENUE d
+            LEFT JOIN RESTAURANT r ON r.Restaurant_ID = d.Restaurant_ID
+            WHERE d.Sales_Date >= %s AND d.Sales_Date <= %s
+            GROUP BY d.Restaurant_ID, r.Name
+            ORDER BY Revenue DESC
+            LIMIT %s
+        """, (start, end, limit))
+        return cur.fetchall()
+
+def top_items(conn, start, end, restaurant_id=None, limit=10):
+    where = " AND s.Restaurant_ID = %s" if restaurant_id is not None else ""
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            SELECT s.Item_ID, f.Name AS Item, s.Restaurant_ID, SUM(s.Quantity) AS Quantity, SUM(s.Revenue) AS Revenue
+            FROM DAILY_ITEM_SALES s
+            LEFT JOIN FOOD_ITEM f ON f.Item_ID = s.Item_ID
+            WHERE s.Sales_Date >= %s AND s.Sales_Date <= %s{where}
+            GROUP BY s.Item_ID, f.Name, s.Restaurant_ID
+            ORDER BY Quantity DESC
+            LIMIT %s
+        """, (start, end) + ((restaurant_id,) if restaurant_id is not None else ()) + (limit,))
+        return cur.fetchall()
+
+def default_range(days=30):
+    end = datetime.utcnow().date()
+    return (end - timedelta(days=days - 1)).strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
@@ -0,0 +1,439 @@
+# api.py
+import sqlite3
+import time
+import traceback
+from datetime import date, datetime
+from decimal import Decimal
+
+import pymysql
+from flask import Blueprint, jsonify, request, url_for
+
+from analytics import default_range, forget, revenue_by_day, revenue_by_restaurant, top_items, touch_order
+from cache import invalidate
+from coupons import (CouponError, coupon_index, discount_amount, normalize_code, parse_discount, parse_expiry_date,
+                     parse_max_redemptions)
+from db import get_conn, transaction
+from dispatch import Backpressure, dispatcher, location_batcher, validate_ping, validate_point
+from events import publish
+from orders import OrderError, place_order, recompute_total
+from pagination import Keyset, fetch_page, page_size
+from tasks import after_delivery_update
+
+api_v1 = Blueprint("api_v1", __name__, url_prefix="/api/v1")
+
+class Resource:
+    """
+    A table exposed as /api/v1/<name>.
+    `fields` maps JSON keys to (column, converter); `required` lists JSON keys that must be present.
+    `filters` maps query-string args to columns for list endpoints (?restaurant_id=3).
+    `event` names the live events ("<event>.created" / ".deleted") published on writes;
+    `before_delete(conn, obj_id)` runs on the deleting connection just before the DELETE.
+    """
+    def __init__(self, name, table, pk, keyset, fields, required=(), filters=None, select=None, event=None,
+                 before_delete=None):
+        self.name = name
+        self.table = table
+        self.pk = pk
+        self.keyset = keyset
+        self.fields = fields
+        self.required = required
+        self.filters = filters or {}
+        self.select = select or f"SELECT * FROM {table}"
+        self.event = event
+        self.before_delete = before_delete
+
+RESOURCES = [
+    Resource("restaurants", "RESTAURANT", "Restaurant_ID",
+             Keyset(("Name", "Name"), ("Restaurant_ID", "Restaurant_ID")),
+             {"name": ("Name", str), "address": ("Address", str), "phone": ("Phone", str),
+              "opening_hours": ("Opening_Hours", str),
+              "latitude": ("Latitude", float), "longitude": ("Longitude", float)},
+             required=("name",),
+             before_delete=lambda conn, obj_id: forget(conn, restaurant_id=obj_id)),
+    Resource("customers", "CUSTOMER", "Customer_ID",
+             Keyset(("Name", "Name"), ("Customer_ID", "Customer_ID")),
+             {"name": ("Name", str), "email": ("Email", str), "phone": ("Phone", str), "address": ("Address", str)},
+             required=("name",)),
+    Resource("delivery_agents", "DELIVERY_AGENT", "Agent_ID",
+             Keyset(("Name", "Name"), ("Agent_ID", "Agent_ID")),
+             {"name": ("Name", str), "phone": ("Phone", str)},
+             required=("name",)),
+    Resource("food_items", "FOOD_ITEM", "Item_ID",
+             Keyset(("Restaurant_ID", "Restaurant_ID"), ("Name", "Name"), ("Item_ID", "Item_ID")),
+             {"name": ("Name", str), "price": ("Price", float), "restaurant_id": ("Restaurant_ID", int)},
+             required=("name", "price", "restaurant_id"),
+             filters={"restaurant_id": "Restaurant_ID"},
+             before_delete=lambda conn, obj_id: forget(conn, item_id=obj_id)),
+    Resource("deliveries", "DELIVERY", "Delivery_ID",
+             Keyset(("Delivery_Date", "Delivery_Date"), ("Delivery_ID", "Delivery_ID"), descending=True, nullable=True),
+             {"order_id": ("Order_ID", int), "agent_id": ("Agent_ID", int),
+              "delivery_date": ("Delivery_Date", str), "status": ("Status", str)},
+             required=("order_id", "agent_id"),
+             filters={"order_id": "Order_ID", "agent_id": "Agent_ID"},
+             event="delivery"),
+    Resource("coupons", "COUPON", "Coupon_ID",
+             Keyset(("Code", "Code")),
+             {"code": ("Code", normalize_code), "discount": ("Discount", parse_discount),
+              "expiry_date": ("Expiry_Date", parse_expiry_date),
+              "max_redemptions": ("Max_Redemptions", parse_max_redemptions)},
+             required=("code", "discount")),
+    # Orders are created through place_order (server-computed totals), see create_order below.
+    Resource("orders", "ORDERS", "Order_ID",
+             Keyset(("Order_Date", "Order_Date"), ("Order_ID", "Order_ID"), descending=True),
+             {},
+             filters={"customer_id": "Customer_ID", "restaurant_id": "Restaurant_ID", "agent_id": "Agent_ID"},
+             event="order", before_delete=touch_order),
+]
+
+# -------- Helpers --------
+def _jsonable(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat(sep=" ") if isinstance(value, datetime) else value.isoformat()
+    return value
+
+def _clean(row):
+    return {k: _jsonable(v) for k, v in row.items()}
+
+def _error(message, status):
+    return jsonify(error=message), status
+
+def _cacheable(payload):
+    """200 with a strong ETag; 304 when it matches If-None-Match."""
+    resp = jsonify(payload)
+    resp.add_etag()
+    return resp.make_conditional(request)
+
+def _body():
+    return request.get_json(silent=True) or {}
+
+def _order_date(value):
+    """None, or "YYYY-MM-DD[ HH:MM:SS]" normalized to the ORDERS.Order_Date format."""
+    if value in (None, ""):
+        return None
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(str(value), fmt).strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            pass
+    raise ValueError("order_date must be YYYY-MM-DD or YYYY-MM-DD HH:MM:SS")
+
+_INTEGRITY_ERRORS = (sqlite3.IntegrityError, pymysql.err.IntegrityError)
+_MYSQL_FK_ERRORS = (1216, 1452)  # ER_NO_REFERENCED_ROW, ER_NO_REFERENCED_ROW_2
+
+def _integrity_error(e):
+    """409 for a failed constraint; the driver's message (tables, columns) stays in the log."""
+    print(f"Integrity error in API route: {e}")
+    if "FOREIGN KEY" in str(e) or (e.args and e.args[0] in _MYSQL_FK_ERRORS):
+        return _error("Referenced row not found", 409)
+    return _error("Conflicts with existing data", 409)
+
+# -------- Generic table endpoints --------
+def _list(res):
+    where, params = [], []
+    for arg, column in res.filters.items():
+        value = request.args.get(arg)
+        if value is not None:
+            where.append(f"{column} = %s")
+            params.append(value)
+    with get_conn(readonly=True) as conn:
+        with conn.cursor() as cur:
+            page = fetch_page(cur, res.select, res.keyset, params=params,
+                              where=" AND ".join(where) or None,
+                              after=request.args.get("after"), before=request.args.get("before"),
+                              limit=page_size(request.args.get("limit")))
+    return _cacheable({"data": [_clean(r) for r in page.rows], "page": page.to_dict()})
+
+def _fetch_one(cur, res, obj_id):
+    cur.execute(f"{res.select} WHERE {res.pk} = %s", (obj_id,))
+    return cur.fetchone()
+
+def _get(res, obj_id):
+    with get_conn(readonly=True) as conn:
+        with conn.cursor() as cur:
+            row = _fetch_one(cur, res, obj_id)
+    if row is None:
+        return _error(f"{res.name} {obj_id} not found", 404)
+    return _cacheable({"data": _clean(row)})
+
+def _create(res):
+    data = _body()
+    missing = [k for k in res.required if data.get(k) in (None, "")]
+    if missing:
+        return _error(f"Missing fields: {', '.join(missing)}", 400)
+    columns, values = [], []
+    for key, (column, convert) in res.fields.items():
+        if key in data and data[key] is not None:
+            try:
+                values.append(convert(data[key]))
+            except (TypeError, ValueError):
+                return _error(f"Invalid value for {key}", 400)
+            columns.append(column)
+    try:
+        with get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"INSERT INTO {res.table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})",
+                    tuple(values),
+                )
+                new_id = cur.lastrowid
+                row = _fetch_one(cur, res, new_id)
+    except _INTEGRITY_ERRORS as e:
+        return _integrity_error(e)
+    invalidate(res.table)
+    if res.event:
+        publish(f"{res.event}.created", **{k.lower(): v for k, v in _clean(row).items()})
+    resp = jsonify(data=_clean(row))
+    resp.status_code = 201
+    resp.headers["Location"] = url_for(f"api_v1.get_{res.name}", obj_id=new_id)
+    return resp
+
+def _delete(res, obj_id):
+    with get_conn() as conn, transaction(conn):
+        if res.before_delete:
+            res.before_delete(conn, obj_id)
+        with conn.cursor() as cur:
+            cur.execute(f"DELETE FROM {res.table} WHERE {res.pk} = %s", (obj_id,))
+            deleted = cur.rowcount
+    if not deleted:
+        return _error(f"{res.name} {obj_id} not found", 404)
+    invalidate(res.table)
+    if res.event:
+        publish(f"{res.event}.deleted", **{res.pk.lower(): obj_id})
+    return "", 204
+
+def _register(res):
+    api_v1.add_url_rule(f"/{res.name}", f"list_{res.name}", lambda: _list(res), methods=["GET"])
+    api_v1.add_url_rule(f"/{res.name}/<int:obj_id>", f"get_{res.name}", lambda obj_id: _get(res, obj_id), methods=["GET"])
+    api_v1.add_url_rule(f"/{res.name}/<int:obj_id>", f"delete_{res.name}", lambda obj_id: _delete(res, obj_id), methods=["DELETE"])
+    if res.fields:
+        api_v1.add_url_rule(f"/{res.name}", f"create_{res.name}", lambda: _create(res), methods=["POST"])
+
+for _res in RESOURCES:
+    _register(_res)
+
+# -------- Orders and their items --------
+_ITEMS_SQL = """
+    SELECT od.Item_ID, f.Name, f.Price, od.Quantity
+    FROM ORDER_DETAIL od
+    JOIN FOOD_ITEM f ON od.Item_ID = f.Item_ID
+    WHERE od.Order_ID = %s
+    ORDER BY od.Item_ID
+"""
+
+@api_v1.post("/orders")
+def create_order():
+    """Same contract as /orders/place: the whole cart in one request, total computed server-side."""
+    data = _body()
+    if not data.get("customer_id") or not data.get("restaurant_id"):
+        return _error("customer_id and restaurant_id are required", 400)
+    try:
+        order_date = _order_date(data.get("order_date"))
+    except ValueError as e:
+        return _error(str(e), 400)
+    try:
+        with get_conn() as conn:
+            order_id, total, agent_id = place_order(conn, data["customer_id"], data["restaurant_id"],
+                                                    data.get("items") or [], agent_id=data.get("agent_id"),
+                                                    order_date=order_date, coupon_code=data.get("coupon_code"))
+    except OrderError as e:
+        return _error(str(e), 400)
+    except _INTEGRITY_ERRORS as e:
+        return _integrity_error(e)
+    publish("order.created", order_id=order_id, customer_id=data["customer_id"], restaurant_id=data["restaurant_id"],
+            agent_id=agent_id, total=total)
+    resp = jsonify(data={"Order_ID": order_id, "Total_Amount": float(total)})
+    resp.status_code = 201
+    resp.headers["Location"] = url_for("api_v1.get_orders", obj_id=order_id)
+    return resp
+
+@api_v1.get("/orders/<int:order_id>/items")
+def list_order_items(order_id):
+    with get_conn(readonly=True) as conn:
+        with conn.cursor() as cur:
+            cur.execute(_ITEMS_SQL, (order_id,))
+            rows = cur.fetchall()
+    return _cacheable({"data": [_clean(r) for r in rows]})
+
+@api_v1.post("/orders/<int:order_id>/items")
+def add_order_item(order_id):
+    data = _body()
+    try:
+        item_id, quantity = int(data.get("item_id")), int(data.get("quantity") or 1)
+    except (TypeError, ValueError):
+        return _error("item_id and a numeric quantity are required", 400)
+    try:
+        with get_conn() as conn, transaction(conn):
+            with conn.cursor() as cur:
+                cur.execute("INSERT INTO ORDER_DETAIL (Order_ID, Item_ID, Quantity) VALUES (%s, %s, %s)",
+                            (order_id, item_id, quantity))
+                recompute_total(cur, order_id)
+            touch_order(conn, order_id)
+    except _INTEGRITY_ERRORS as e:
+        return _integrity_error(e)
+    publish("order_detail.added", order_id=order_id, item_id=item_id, quantity=quantity)
+    return jsonify(data={"Order_ID": order_id, "Item_ID": item_id, "Quantity": quantity}), 201
+
+@api_v1.delete("/orders/<int:order_id>/items/<int:item_id>")
+def delete_order_item(order_id, item_id):
+    with get_conn() as conn, transaction(conn):
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM ORDER_DETAIL WHERE Order_ID = %s AND Item_ID = %s", (order_id, item_id))
+            deleted = cur.rowcount
+            recompute_total(cur, order_id)
+            touch_order(conn, order_id)
+    if not deleted:
+        return _error(f"item {item_id} is not on order {order_id}", 404)
+    publish("order_detail.removed", order_id=order_id, item_id=item_id)
+    return "", 204
+
+@api_v1.patch("/deliveries/<int:delivery_id>")
+def update_delivery_status(delivery_id):
+    """{"status": "Picked Up"} -- moves a delivery along and broadcasts the transition."""
+    status = (_body().get("status") or "").strip()
+    if not status:
+        return _error("status is required", 400)
+    with get_conn() as conn, transaction(conn):
+        with conn.cursor() as cur:
+            cur.execute("SELECT Order_ID, Agent_ID, Status FROM DELIVERY WHERE Delivery_ID = %s", (delivery_id,))
+            row = cur.fetchone()
+            if row is not None:
+                cur.execute("UPDATE DELIVERY SET Status = %s WHERE Delivery_ID = %s", (status, delivery_id))
+                after_delivery_update(conn, status)
+    if row is None:
+        return _error(f"deliveries {delivery_id} not found", 404)
+    invalidate("DELIVERY")
+    publish("delivery.status", delivery_id=delivery_id, order_id=row["Order_ID"], agent_id=row["Agent_ID"],
+            previous=row["Status"], status=status)
+    return jsonify(data={"Delivery_ID": delivery_id, "Status": status})
+
+# -------- Coupons --------
+@api_v1.get("/coupons/validate")
+def validate_coupon():
+    """?code=SAVE10[&subtotal=24.50] -- whether the code is usable now, and the discount it would give."""
+    try:
+        subtotal = Decimal(request.args.get("subtotal") or "0")
+    except ArithmeticError:
+        return _error("subtotal must be a number", 400)
+    if not subtotal.is_finite() or subtotal < 0:
+        return _error("subtotal must be a non-negative number", 400)
+    with get_conn() as conn:
+        try:
+            coupon = coupon_index.lookup(conn, request.args.get("code"))
+        except CouponError as e:
+            return jsonify(data={"valid": False, "reason": str(e)})
+    discount = discount_amount(subtotal, coupon)
+    return jsonify(data={"valid": True, "code": coupon.code, "discount_percent": float(coupon.discount),
+                         "expiry_date": coupon.expiry_date, "discount": float(discount),
+                         "total": float(subtotal - discount)})
+
+# -------- Analytics --------
+def _report_range():
+    start, end = request.args.get("start"), request.args.get("end")
+    default_start, default_end = default_range()
+    for value in (start, end):
+        if value:
+            try:
+                datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                raise ValueError("start and end must be YYYY-MM-DD")
+    return start or default_start, end or default_end
+
+@api_v1.get("/analytics/revenue")
+def analytics_revenue():
+    """Daily revenue (?by=day, optional restaurant_id) or totals per restaurant (?by=restaurant)."""
+    try:
+        start, end = _report_range()
+    except ValueError as e:
+        return _error(str(e), 400)
+    with get_conn(readonly=True) as conn:
+        if request.args.get("by") == "restaurant":
+            rows = revenue_by_restaurant(conn, start, end, limit=page_size(request.args.get("limit")))
+        else:
+            rows = revenue_by_day(conn, start, end, request.args.get("restaurant_id", type=int))
+    return _cacheable({"start": start, "end": end, "data": [_clean(r) for r in rows]})
+
+@api_v1.get("/analytics/top_items")
+def analytics_top_items():
+    try:
+        start, end = _report_range()
+    except ValueError as e:
+        return _error(str(e), 400)
+    with get_conn(readonly=True) as conn:
+        rows = top_items(conn, start, end, request.args.get("restaurant_id", type=int),
+                         limit=page_size(request.args.get("limit"), default=10))
+    return _cacheable({"start": start, "end": end, "data": [_clean(r) for r in rows]})
+
+# -------- Dispatch --------
+def _ping(data, agent_id=None):
+    """One JSON ping -> (agent_id, lat, lon, seen); "timestamp" (epoch seconds) is optional."""
+    agent_id, lat, lon = validate_ping(agent_id if agent_id is not None else data.get("agent_id"),
+                                       data.get("latitude"), data.get("longitude"))
+    now = time.time()
+    try:
+        seen = float(data.get("timestamp") or now)
+    except (TypeError, ValueError):
+        raise ValueError("timestamp must be epoch seconds")
+    return agent_id, lat, lon, min(seen, now)
+
+def _queue_pings(pings, errors=()):
+    try:
+        accepted = location_batcher.submit(pings) if pings else 0
+    except Backpressure as e:
+        resp = jsonify(error=str(e))
+        resp.status_code = 503
+        resp.headers["Retry-After"] = str(e.retry_after)
+        return resp
+    return jsonify(accepted=accepted, errors=list(errors)), 202
+
+@api_v1.post("/delivery_agents/<int:agent_id>/location")
+def update_location(agent_id):
+    """Rider position ping: {"latitude": 12.97, "longitude": 77.59}. Written asynchronously."""
+    try:
+        ping = _ping(_body(), agent_id)
+    except ValueError as e:
+        return _error(str(e), 400)
+    return _queue_pings([ping])
+
+@api_v1.post("/locations")
+def ingest_locations():
+    """
+    A single ping {"agent_id", "latitude", "longitude", "timestamp"?} or a batch
+    ({"pings": [...]} or a bare list). Invalid entries are reported by index, the rest are queued.
+    """
+    data = request.get_json(silent=True)
+    if isinstance(data, dict) and "pings" in data:
+        data = data["pings"]
+    entries = data if isinstance(data, list) else [data or {}]
+    pings, errors = [], []
+    for i, entry in enumerate(entries):
+        try:
+            pings.append(_ping(entry if isinstance(entry, dict) else {}))
+        except ValueError as e:
+            errors.append({"index": i, "error": str(e)})
+    if not pings and errors:
+        return jsonify(error="no valid pings", errors=errors), 400
+    return _queue_pings(pings, errors)
+
+@api_v1.get("/dispatch/nearest")
+def nearest_agent():
+    """Nearest idle agent to ?latitude=&longitude= (no reservation is made)."""
+    try:
+        lat, lon = validate_point(request.args.get("latitude"), request.args.get("longitude"))
+    except ValueError as e:
+        return _error(str(e), 400)
+    with get_conn() as conn:
+        dispatcher.refresh(conn)
+    found = dispatcher.nearest(lat, lon)
+    if found is None:
+        return _error("no idle agent nearby", 404)
+    return jsonify(data={"Agent_ID": found[0], "distance_km": round(found[1], 3)})
+
+@api_v1.errorhandler(Exception)
+def _api_exception(e):
+    if hasattr(e, "code") and hasattr(e, "description"):  # werkzeug HTTPException
+        return _error(e.description, e.code)
+    print(f"Error in API route: {e}")
+    traceback.print_exc()
+    return _error("Internal server error", 500)  # details stay in the log
@@ -1,41 +1,155 @@
 # app.py
-from flask import Flask, render_template, request, redirect, url_for, flash
+from flask import Flask, Response, render_template, request, redirect, url_for, flash, jsonify, session
 from datetime import datetime
 from threading import Lock
+import io
+import os
 import sqlite3
+import time
 import traceback
 
-from db import get_conn, ensure_schema, insert_sample_data
+import click
+
+from analytics import default_range, forget, rebuild, revenue_by_day, revenue_by_restaurant, top_items, touch_order
+from db import (MYSQL_REPLICA_URLS, READ_YOUR_WRITES_SECONDS, get_conn, ensure_schema, insert_sample_data,
+                pin_reads_to_primary, pool_stats, transaction)
+from orders import OrderError, place_order, recompute_total
+from coupons import normalize_code, parse_discount, parse_expiry_date, parse_max_redemptions
+from stats import dashboard_stats
+from pagination import Keyset, fetch_page, page_size
+from api import api_v1
+from cache import ReadThroughCache, cache_stats, invalidate
+from page_cache import cached_page, skip_page_cache
+import metrics
+from export import DATASETS, FORMATS, ExportError, stream_export
+from dispatch import dispatcher
+from events import broker, publish, sse_stream
+from jobs import Worker, job_counts
+from tasks import after_delivery_update, queue_assignment
+from search import KINDS as SEARCH_KINDS, SEARCH_DEFAULT_LIMIT, search
+from importer import ENTITIES, IMPORT_CHUNK_SIZE, ImportDataError, format_for, import_records, read_records
 
 app = Flask(__name__)
 app.secret_key = "dev-secret-change-me"  # set SECRET_KEY in prod
+app.register_blueprint(api_v1)
 
 # -------- Health (for Render) --------
 @app.get("/health")
 def health():
     return "OK", 200
 
-# -------- Ensure schema once per worker (Flask 3.x safe) --------
+@app.get("/health/pool")
+def health_pool():
+    return jsonify(pool_stats())
+
+@app.get("/health/cache")
+def health_cache():
+    return jsonify(cache_stats())
+
+@app.get("/health/jobs")
+def health_jobs():
+    with get_conn() as conn:
+        return jsonify(job_counts(conn))
+
+# -------- Metrics (Prometheus text format, per worker) --------
+@app.get("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.before_request
+def _metrics_begin():
+    metrics.begin_request(request.endpoint or "unmatched")
+
+@app.after_request
+def _metrics_end(response):
+    metrics.end_request(response.status_code)
+    return response
+
+@app.teardown_request
+def _metrics_teardown(exc):
+    metrics.end_request(500)  # no-op unless after_request was skipped by an error
+
+# -------- Read/write splitting --------
+# List pages and GET API calls read from a replica when MYSQL_REPLICA_URLS is set.
+# A client that just wrote -- any POST/PUT/PATCH/DELETE, or one of the GET .../delete/
+# links -- reads from the primary for READ_YOUR_WRITES_SECONDS (tracked in its session
+# cookie), so the page it is redirected to after "Add" already shows the new row.
+def _is_write():
+    return request.method not in ("GET", "HEAD", "OPTIONS") or (request.endpoint or "").startswith("delete_")
+
+@app.before_request
+def _route_reads():
+    pin_reads_to_primary(_is_write() or session.get("wrote_until", 0) > time.time())
+
+@app.after_request
+def _remember_write(response):
+    if MYSQL_REPLICA_URLS and _is_write():
+        session["wrote_until"] = time.time() + READ_YOUR_WRITES_SECONDS
+    return response
+
+@metrics.register_collector
+def _pool_and_cache_gauges():
+    for key, value in pool_stats().items():
+        if isinstance(value, (int, float)):
+            yield f"db_pool_{key}", f"Connection pool {key}", value
+    for name, counters in cache_stats().items():
+        for key, value in counters.items():
+            yield f"cache_{name}_{key}", f"Cache {name} {key}", value
+
+# -------- Schema bootstrap (startup, not per request) --------
+# gunicorn runs init_db() once in the master (see gunicorn.conf.py); `flask init-db`
+# and `python app.py` do the same. The before_request fallback below only covers
+# servers started without either, and removes itself as soon as the schema is ready.
+SCHEMA_RETRY_SECONDS = float(os.getenv("SCHEMA_RETRY_SECONDS", "30"))
 _schema_ready = False
 _schema_lock = Lock()
+_schema_retry_at = 0.0
 
-@app.before_request
-def _ensure_schema_once():
+def init_db():
+    """Create/upgrade the schema and insert sample data if the database is empty."""
     global _schema_ready
-    if not _schema_ready:
-        with _schema_lock:
-            if not _schema_ready:
-                try:
-                    with get_conn() as conn:
-                        ensure_schema(conn)
-                        # Insert sample data if database is empty
-                        insert_sample_data(conn)
-                    _schema_ready = True
-                except Exception as e:
-                    print(f"Schema initialization error: {e}")
-                    traceback.print_exc()
-                    # don't block requests if schema init fails
-                    pass
+    with _schema_lock:
+        if not _schema_ready:
+            with get_conn() as conn:
+                ensure_schema(conn)
+                # Insert sample data if database is empty
+                insert_sample_data(conn)
+            _schema_ready = True
+    _drop_schema_fallback()
+
+@app.cli.command("init-db")
+def init_db_command():
+    """Create or upgrade the database schema."""
+    init_db()
+    print("Database schema is up to date.")
+
+@app.before_request
+def _ensure_schema_fallback():
+    global _schema_retry_at
+    if _schema_ready:
+        _drop_schema_fallback()
+        return
+    if time.monotonic() < _schema_retry_at:
+        return
+    # never make user traffic queue behind another thread's init
+    if not _schema_lock.acquire(blocking=False):
+        return
+    try:
+        _schema_retry_at = time.monotonic() + SCHEMA_RETRY_SECONDS
+    finally:
+        _schema_lock.release()
+    try:
+        init_db()
+    except Exception as e:
+        print(f"Schema initialization error: {e}")
+        traceback.print_exc()
+        # don't block requests if schema init fails; retried after SCHEMA_RETRY_SECONDS
+
+def _drop_schema_fallback():
+    # Rebind rather than mutate: Flask may be iterating the current list.
+    funcs = app.before_request_funcs.get(None, [])
+    if _ensure_schema_fallback in funcs:
+        app.before_request_funcs[None] = [f for f in funcs if f is not _ensure_schema_fallback]
 
 # -------- Helpers --------
 def _data():
@@ -44,6 +158,28 @@ def _data():
         return request.get_json(silent=True) or {}
     return request.form
 
+def _wants_json():
+    """True when the client asked for JSON (?format=json or Accept: application/json)."""
+    if request.args.get("format") == "json":
+        return True
+    return request.accept_mimetypes.best_match(["text/html", "application/json"]) == "application/json"
+
+def _page_args():
+    """Keyset pagination arguments from the query string (?after= / ?before= / ?limit=)."""
+    return {
+        "after": request.args.get("after"),
+        "before": request.args.get("before"),
+        "limit": page_size(request.args.get("limit")),
+    }
+
+def _listing(template, page, **context):
+    """Render one page of a listing as HTML, or as JSON with next/prev cursors."""
+    if page is None:
+        skip_page_cache()  # the query failed; don't keep serving an empty listing
+    if _wants_json():
+        return jsonify(rows=page.rows if page else [], page=page.to_dict() if page else None)
+    return render_template(template, page=page, **context)
+
 def _parse_date(value, fmt="%Y-%m-%d"):
     if not value:
         return None
@@ -59,6 +195,22 @@ def _commit(conn):
     except Exception:
         pass
 
+# -------- Cached lookup data (menus change rarely) --------
+menu_cache = ReadThroughCache("menu", ("RESTAURANT", "FOOD_ITEM"))
+customer_cache = ReadThroughCache("customers", ("CUSTOMER",))
+
+def _fetchall(cur, query, params=None):
+    cur.execute(query, params)
+    return cur.fetchall()
+
+def _restaurant_options(cur):
+    return menu_cache.get("restaurant_options", lambda: _fetchall(
+        cur, "SELECT Restaurant_ID, Name FROM RESTAURANT ORDER BY Name"))
+
+def _customer_options(cur):
+    return customer_cache.get("customer_options", lambda: _fetchall(
+        cur, "SELECT Customer_ID, Name FROM CUSTOMER ORDER BY Name"))
+
 def _lazy_create_coupon(conn):
     """If COUPON table is missing (SQLite partial init), create it quickly."""
     ddl = """
@@ -82,23 +234,9 @@ def home():
     stats = {}
     latest_orders = []
     try:
-        with get_conn() as conn:
+        with get_conn(readonly=True) as conn:
+            stats = dashboard_stats.get(conn)
             with conn.cursor() as cur:
-                cur.execute("SELECT COUNT(*) AS c FROM RESTAURANT")
-                row = cur.fetchone(); stats["restaurants"] = (row["c"] if isinstance(row, dict) else row[0]) if row else 0
-
-                cur.execute("SELECT COUNT(*) AS c FROM CUSTOMER")
-                row = cur.fetchone(); stats["customers"] = (row["c"] if isinstance(row, dict) else row[0]) if row else 0
-
-                cur.execute("SELECT COUNT(*) AS c FROM FOOD_ITEM")
-                row = cur.fetchone(); stats["food_items"] = (row["c"] if isinstance(row, dict) else row[0]) if row else 0
-
-                cur.execute("SELECT COUNT(*) AS c FROM ORDERS")
-                row = cur.fetchone(); stats["orders"] = (row["c"] if isinstance(row, dict) else row[0]) if row else 0
-
-                cur.execute("SELECT COUNT(*) AS c FROM DELIVERY_AGENT")
-                row = cur.fetchone(); stats["agents"] = (row["c"] if isinstance(row, dict) else row[0]) if row else 0
-
                 cur.execute("""
                     SELECT o.Order_ID, c.Name AS customer, r.Name AS restaurant, o.Order_Date, o.Total_Amount
                     FROM ORDERS o
@@ -114,13 +252,16 @@ def home():
     return render_template("home.html", stats=stats, latest_orders=latest_orders)
 
 # ---------- Restaurants ----------
+RESTAURANT_KEYSET = Keyset(("Name", "Name"), ("Restaurant_ID", "Restaurant_ID"))
+
 @app.route("/restaurants")
+@cached_page("RESTAURANT")
 def restaurants():
     try:
-        with get_conn() as conn:
+        with get_conn(readonly=True) as conn:
             with conn.cursor() as cur:
                 # Fetch restaurants and alias columns to match template expectations
-                cur.execute("""
+                page = fetch_page(cur, """
                     SELECT 
                         Restaurant_ID,
                         Name,
@@ -128,16 +269,14 @@ def restaurants():
                         Phone AS Contact_Number,
                         Opening_Hours,
                         NULL AS Rating
-                    FROM RESTAURANT 
-                    ORDER BY Name
-                """)
-                rows = cur.fetchall()
+                    FROM RESTAURANT
+                """, RESTAURANT_KEYSET, **_page_args())
     except Exception as e:
         print(f"Error in restaurants route: {e}")
         traceback.print_exc()
-        rows = []
+        page = None
     # FIXED: Pass as 'restaurants' not 'rows'
-    return render_template("restaurants.html", restaurants=rows)
+    return _listing("restaurants.html", page, restaurants=page.rows if page else [])
 
 # POST shim so templates that post to /restaurants still work
 @app.route("/restaurants", methods=["POST"])
@@ -165,6 +304,7 @@ def add_restaurant():
                     (name, address, phone, opening_hours),
                 )
             _commit(conn)
+        invalidate("RESTAURANT")
         flash("Restaurant added successfully", "success")
     except Exception as e:
         print(f"Error adding restaurant: {e}")
@@ -175,10 +315,11 @@ def add_restaurant():
 @app.route("/restaurants/delete/<int:restaurant_id>")
 def delete_restaurant(restaurant_id):
     try:
-        with get_conn() as conn:
+        with get_conn() as conn, transaction(conn):
+            forget(conn, restaurant_id=restaurant_id)
             with conn.cursor() as cur:
                 cur.execute("DELETE FROM RESTAURANT WHERE Restaurant_ID = %s", (restaurant_id,))
-            _commit(conn)
+        invalidate("RESTAURANT")
         flash("Restaurant deleted", "success")
     except Exception as e:
         print(f"Error deleting restaurant: {e}")
@@ -187,13 +328,16 @@ def delete_restaurant(restaurant_id):
     return redirect(url_for("restaurants"))
 
 # ---------- Customers ----------
+CUSTOMER_KEYSET = Keyset(("Name", "Name"), ("Customer_ID", "Customer_ID"))
+
 @app.route("/customers")
+@cached_page("CUSTOMER")
 def customers():
     try:
-        with get_conn() as conn:
+        with get_conn(readonly=True) as conn:
             with conn.cursor() as cur:
                 # Alias columns to match template expectations
-                cur.execute("""
+                page = fetch_page(cur, """
                     SELECT 
                         Customer_ID,
                         Name,
@@ -201,16 +345,14 @@ def customers():
                         Phone AS Phone_Number,
                         Address,
                         'Customer' AS User_Type
-                    FROM CUSTOMER 
-                    ORDER BY Name
-                """)
-                rows = cur.fetchall()
+                    FROM CUSTOMER
+                """, CUSTOMER_KEYSET, **_page_args())
     except Exception as e:
         print(f"Error in customers route: {e}")
         traceback.print_exc()
-        rows = []
+        page = None
     # FIXED: Pass as 'customers' not 'rows'
-    return render_template("customers.html", customers=rows)
+    return _listing("customers.html", page, customers=page.rows if page else [])
 
 @app.route("/customers", methods=["POST"])
 def customers_post():
@@ -236,6 +378,7 @@ def add_customer():
                     (name, email, phone, address),
                 )
             _commit(conn)
+        invalidate("CUSTOMER")
         flash("Customer added successfully", "success")
     except Exception as e:
         print(f"Error adding customer: {e}")
@@ -250,6 +393,7 @@ def delete_customer(customer_id):
             with conn.cursor() as cur:
                 cur.execute("DELETE FROM CUSTOMER WHERE Customer_ID = %s", (customer_id,))
             _commit(conn)
+        invalidate("CUSTOMER")
         flash("Customer deleted", "success")
     except Exception as e:
         print(f"Error deleting customer: {e}")
@@ -258,17 +402,20 @@ def delete_customer(customer_id):
     return redirect(url_for("customers"))
 
 # ---------- Food Items ----------
+FOOD_ITEM_KEYSET = Keyset(("r.Name", "Restaurant"), ("f.Name", "Name"), ("f.Item_ID", "Food_ID"))
+
 @app.route("/food_items")
+@cached_page("FOOD_ITEM", "RESTAURANT")
 def food_items():
     try:
-        with get_conn() as conn:
+        with get_conn(readonly=True) as conn:
             with conn.cursor() as cur:
                 # FIXED: Fetch restaurants for dropdown
-                cur.execute("SELECT Restaurant_ID, Name FROM RESTAURANT ORDER BY Name")
-                restaurants = cur.fetchall()
-                
+                restaurants = _restaurant_options(cur)
+
                 # Alias columns to match template expectations
-                cur.execute("""
+                args = _page_args()
+                page = menu_cache.get(("food_items", args["after"], args["before"], args["limit"]), lambda: fetch_page(cur, """
                     SELECT 
                         f.Item_ID AS Food_ID,
                         f.Name,
@@ -279,16 +426,14 @@ def food_items():
                         f.Restaurant_ID
                     FROM FOOD_ITEM f
                     JOIN RESTAURANT r ON f.Restaurant_ID = r.Restaurant_ID
-                    ORDER BY r.Name, f.Name
-                """)
-                rows = cur.fetchall()
+                """, FOOD_ITEM_KEYSET, **args))
     except Exception as e:
         print(f"Error in food_items route: {e}")
         traceback.print_exc()
-        rows = []
+        page = None
         restaurants = []
     # FIXED: Pass as 'items' not 'rows', and include 'restaurants' for dropdown
-    return render_template("food_items.html", items=rows, restaurants=restaurants)
+    return _listing("food_items.html", page, items=page.rows if page else [], restaurants=restaurants)
 
 @app.route("/food_items", methods=["POST"])
 def food_items_post():
@@ -320,6 +465,7 @@ def add_food_item():
                     (name, price, restaurant_id),
                 )
             _commit(conn)
+        invalidate("FOOD_ITEM")
         flash("Food item added successfully", "success")
     except Exception as e:
         print(f"Error adding food item: {e}")
@@ -330,10 +476,11 @@ def add_food_item():
 @app.route("/food_items/delete/<int:item_id>")
 def delete_food_item(item_id):
     try:
-        with get_conn() as conn:
+        with get_conn() as conn, transaction(conn):
+            forget(conn, item_id=item_id)
             with conn.cursor() as cur:
                 cur.execute("DELETE FROM FOOD_ITEM WHERE Item_ID = %s", (item_id,))
-            _commit(conn)
+        invalidate("FOOD_ITEM")
         flash("Food item deleted", "success")
     except Exception as e:
         print(f"Error deleting food item: {e}")
@@ -342,20 +489,19 @@ def delete_food_item(item_id):
     return redirect(url_for("food_items"))
 
 # ---------- Orders ----------
+ORDER_KEYSET = Keyset(("o.Order_Date", "Order_Date"), ("o.Order_ID", "Order_ID"), descending=True)
+
 @app.route("/orders")
 def orders():
     try:
-        with get_conn() as conn:
+        with get_conn(readonly=True) as conn:
             with conn.cursor() as cur:
                 # FIXED: Fetch customers and restaurants for dropdown
-                cur.execute("SELECT Customer_ID, Name FROM CUSTOMER ORDER BY Name")
-                customers = cur.fetchall()
-                
-                cur.execute("SELECT Restaurant_ID, Name FROM RESTAURANT ORDER BY Name")
-                restaurants = cur.fetchall()
-                
+                customers = _customer_options(cur)
+                restaurants = _restaurant_options(cur)
+
                 # Alias columns to match template expectations
-                cur.execute("""
+                page = fetch_page(cur, """
                     SELECT 
                         o.Order_ID,
                         o.Order_Date,
@@ -369,17 +515,15 @@ def orders():
                     FROM ORDERS o
                     LEFT JOIN CUSTOMER c ON o.Customer_ID = c.Customer_ID
                     LEFT JOIN RESTAURANT r ON o.Restaurant_ID = r.Restaurant_ID
-                    ORDER BY o.Order_Date DESC
-                """)
-                rows = cur.fetchall()
+                """, ORDER_KEYSET, **_page_args())
     except Exception as e:
         print(f"Error in orders route: {e}")
         traceback.print_exc()
-        rows = []
+        page = None
         customers = []
         restaurants = []
     # FIXED: Pass as 'orders' not 'rows', and include dropdowns
-    return render_template("orders.html", orders=rows, customers=customers, restaurants=restaurants)
+    return _listing("orders.html", page, orders=page.rows if page else [], customers=customers, restaurants=restaurants)
 
 @app.route("/orders", methods=["POST"])
 def orders_post():
@@ -402,12 +546,26 @@ def add_order():
             return redirect(url_for("orders"))
 
         with get_conn() as conn:
-            with conn.cursor() as cur:
-                cur.execute("""
-                    INSERT INTO ORDERS (Customer_ID, Restaurant_ID, Order_Date, Total_Amount, Agent_ID)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (customer_id, restaurant_id, order_date, total_amount, agent_id))
-            _commit(conn)
+            assigned = None
+            if not agent_id:
+                agent_id = assigned = dispatcher.assign(conn, restaurant_id)
+            try:
+                with transaction(conn):
+                    with conn.cursor() as cur:
+                        cur.execute("""
+                            INSERT INTO ORDERS (Customer_ID, Restaurant_ID, Order_Date, Total_Amount, Agent_ID)
+                            VALUES (%s, %s, %s, %s, %s)
+                        """, (customer_id, restaurant_id, order_date, total_amount, agent_id))
+                        order_id = cur.lastrowid
+                    if not agent_id:
+                        queue_assignment(conn, order_id)
+                    touch_order(conn, order_date=order_date, restaurant_id=restaurant_id)
+            except Exception:
+                if assigned is not None:
+                    dispatcher.release(assigned)  # the rider never got this order
+                raise
+        publish("order.created", order_id=order_id, customer_id=customer_id, restaurant_id=restaurant_id,
+                agent_id=agent_id, total=total_amount)
         flash("Order added successfully", "success")
     except Exception as e:
         print(f"Error adding order: {e}")
@@ -415,13 +573,60 @@ def add_order():
         flash(f"Error adding order: {str(e)}", "error")
     return redirect(url_for("orders"))
 
+@app.route("/orders/place", methods=["POST"])
+def place_order_route():
+    """
+    Create an order with all its items at once. JSON body:
+      {"customer_id": 1, "restaurant_id": 2, "agent_id": 3, "order_date": "2024-11-01",
+       "coupon_code": "SAVE10", "items": [{"item_id": 4, "quantity": 2}, ...]}
+    Form posts send parallel item_id / quantity fields.
+    """
+    data = _data()
+    customer_id = data.get("customer_id") or data.get("cust_id")
+    restaurant_id = data.get("restaurant_id") or data.get("rest_id")
+    agent_id = data.get("agent_id") or None
+    coupon_code = data.get("coupon_code") or data.get("coupon") or None
+    order_date_obj = _parse_date(data.get("order_date"))
+    order_date = order_date_obj.strftime("%Y-%m-%d %H:%M:%S") if order_date_obj else None
+    if request.is_json:
+        items = data.get("items") or []
+    else:
+        items = list(zip(request.form.getlist("item_id"), request.form.getlist("quantity")))
+
+    try:
+        if not customer_id or not restaurant_id:
+            raise OrderError("Customer and Restaurant are required")
+        with get_conn() as conn:
+            order_id, total, agent_id = place_order(conn, customer_id, restaurant_id, items,
+                                                    agent_id=agent_id, order_date=order_date, coupon_code=coupon_code)
+    except OrderError as e:
+        if request.is_json:
+            return jsonify(error=str(e)), 400
+        flash(str(e), "error")
+        return redirect(url_for("orders"))
+    except Exception as e:
+        print(f"Error placing order: {e}")
+        traceback.print_exc()
+        if request.is_json:
+            return jsonify(error="Error placing order"), 500  # details stay in the log
+        flash(f"Error placing order: {str(e)}", "error")
+        return redirect(url_for("orders"))
+
+    publish("order.created", order_id=order_id, customer_id=customer_id, restaurant_id=restaurant_id,
+            agent_id=agent_id, total=total)
+    if request.is_json:
+        return jsonify(order_id=order_id, total=float(total)), 201
+    flash(f"Order #{order_id} placed, total {total}", "success")
+    return redirect(url_for("order_details", order_id=order_id))
+
 @app.route("/orders/delete/<int:order_id>")
 def delete_order(order_id):
     try:
-        with get_conn() as conn:
+        with get_conn() as conn, transaction(conn):
+            touch_order(conn, order_id)
             with conn.cursor() as cur:
                 cur.execute("DELETE FROM ORDERS WHERE Order_ID = %s", (order_id,))
-            _commit(conn)
+        publish("order.deleted", order_id=order_id)
         flash("Order deleted", "success")
     except Exception as e:
         print(f"Error deleting order: {e}")
@@ -433,39 +638,61 @@ def delete_order(order_id):
 @app.route("/order_details/<int:order_id>")
 def order_details(order_id):
     try:
-        with get_conn() as conn:
+        with get_conn(readonly=True) as conn:
             with conn.cursor() as cur:
                 cur.execute("""
-                    SELECT od.*, f.Name AS Food_Name
+                    SELECT o.Order_ID, o.Restaurant_ID, o.Total_Amount, r.Name AS restaurant
+                    FROM ORDERS o
+                    LEFT JOIN RESTAURANT r ON o.Restaurant_ID = r.Restaurant_ID
+                    WHERE o.Order_ID = %s
+                """, (order_id,))
+                order = cur.fetchone() or {"Order_ID": order_id}
+
+                cur.execute("""
+                    SELECT od.*, f.Name AS Food_Name, f.Name AS item, f.Price
                     FROM ORDER_DETAIL od
                     JOIN FOOD_ITEM f ON od.Item_ID = f.Item_ID
                     WHERE od.Order_ID = %s
                 """, (order_id,))
                 rows = cur.fetchall()
+
+                # Menu of this order's restaurant for the "add item" dropdown
+                restaurant_id = order.get("Restaurant_ID")
+                food = menu_cache.get(("restaurant_menu", restaurant_id), lambda: _fetchall(
+                    cur, "SELECT Item_ID AS Food_ID, Name, Price FROM FOOD_ITEM WHERE Restaurant_ID = %s ORDER BY Name",
+                    (restaurant_id,)))
     except Exception as e:
         print(f"Error in order_details route: {e}")
         traceback.print_exc()
-        rows = []
-    return render_template("order_details.html", rows=rows, order_id=order_id)
+        rows, food, order = [], [], {"Order_ID": order_id}
+    return render_template("order_details.html", rows=rows, details=rows, order=order, food=food,
+                           total=order.get("Total_Amount"), order_id=order_id)
+
+# POST shim so the form on the order page works
+@app.route("/order_details/<int:order_id>", methods=["POST"])
+def order_details_post(order_id):
+    return add_order_detail(order_id)
 
 @app.route("/order_details/add/<int:order_id>", methods=["POST"])
 def add_order_detail(order_id):
     try:
         data = _data()
-        item_id = data.get("item_id")
+        item_id = data.get("item_id") or data.get("food_id")
         quantity = data.get("quantity") or 1
 
         if not item_id:
             flash("Item is required", "error")
             return redirect(url_for("order_details", order_id=order_id))
 
-        with get_conn() as conn:
+        with get_conn() as conn, transaction(conn):
             with conn.cursor() as cur:
                 cur.execute("""
                     INSERT INTO ORDER_DETAIL (Order_ID, Item_ID, Quantity)
                     VALUES (%s, %s, %s)
                 """, (order_id, item_id, quantity))
-            _commit(conn)
+                recompute_total(cur, order_id)
+            touch_order(conn, order_id)
+        publish("order_detail.added", order_id=order_id, item_id=item_id, quantity=quantity)
         flash("Item added to order", "success")
     except Exception as e:
         print(f"Error adding order detail: {e}")
@@ -476,10 +703,12 @@ def add_order_detail(order_id):
 @app.route("/order_details/delete/<int:order_id>/<int:item_id>")
 def delete_order_detail(order_id, item_id):
     try:
-        with get_conn() as conn:
+        with get_conn() as conn, transaction(conn):
             with conn.cursor() as cur:
                 cur.execute("DELETE FROM ORDER_DETAIL WHERE Order_ID = %s AND Item_ID = %s", (order_id, item_id))
-            _commit(conn)
+                recompute_total(cur, order_id)
+            touch_order(conn, order_id)
+        publish("order_detail.removed", order_id=order_id, item_id=item_id)
         flash("Item removed from order", "success")
     except Exception as e:
         print(f"Error deleting order detail: {e}")
@@ -488,19 +717,22 @@ def delete_order_detail(order_id, item_id):
     return redirect(url_for("order_details", order_id=order_id))
 
 # ---------- Delivery Agents ----------
+AGENT_KEYSET = Keyset(("Name", "Name"), ("Agent_ID", "Agent_ID"))
+
 @app.route("/delivery_agents")
+@cached_page("DELIVERY_AGENT")
 def delivery_agents():
     try:
-        with get_conn() as conn:
+        with get_conn(readonly=True) as conn:
             with conn.cursor() as cur:
-                cur.execute("SELECT * FROM DELIVERY_AGENT ORDER BY Name")
-                rows = cur.fetchall()
+                page = fetch_page(cur, "SELECT * FROM DELIVERY_AGENT", AGENT_KEYSET, **_page_args())
     except Exception as e:
         print(f"Error in delivery_agents route: {e}")
         traceback.print_exc()
-        rows = []
+        page = None
+    rows = page.rows if page else []
     # FIXED: Pass as 'agents' to match common naming
-    return render_template("delivery_agents.html", rows=rows, agents=rows)
+    return _listing("delivery_agents.html", page, rows=rows, agents=rows)
 
 @app.route("/delivery_agents", methods=["POST"])
 def delivery_agents_post():
@@ -521,6 +753,7 @@ def add_delivery_agent():
             with conn.cursor() as cur:
                 cur.execute("INSERT INTO DELIVERY_AGENT (Name, Phone) VALUES (%s, %s)", (name, phone))
             _commit(conn)
+        invalidate("DELIVERY_AGENT")
         flash("Delivery agent added successfully", "success")
     except Exception as e:
         print(f"Error adding delivery agent: {e}")
@@ -535,6 +768,7 @@ def delete_delivery_agent(agent_id):
             with conn.cursor() as cur:
                 cur.execute("DELETE FROM DELIVERY_AGENT WHERE Agent_ID = %s", (agent_id,))
             _commit(conn)
+        invalidate("DELIVERY_AGENT")
         flash("Delivery agent deleted", "success")
     except Exception as e:
         print(f"Error deleting delivery agent: {e}")
@@ -543,24 +777,26 @@ def delete_delivery_agent(agent_id):
     return redirect(url_for("delivery_agents"))
 
 # ---------- Deliveries ----------
+# Deliveries without a date (API/import rows) sort after all dated ones.
+DELIVERY_KEYSET = Keyset(("d.Delivery_Date", "Delivery_Date"), ("d.Delivery_ID", "Delivery_ID"), descending=True,
+                         nullable=True)
+
 @app.route("/deliveries")
 def deliveries():
     try:
-        with get_conn() as conn:
+        with get_conn(readonly=True) as conn:
             with conn.cursor() as cur:
-                cur.execute("""
+                page = fetch_page(cur, """
                     SELECT d.*, a.Name AS Agent_Name, o.Order_Date
                     FROM DELIVERY d
                     JOIN DELIVERY_AGENT a ON d.Agent_ID = a.Agent_ID
                     JOIN ORDERS o ON d.Order_ID = o.Order_ID
-                    ORDER BY d.Delivery_Date DESC
-                """)
-                rows = cur.fetchall()
+                """, DELIVERY_KEYSET, **_page_args())
     except Exception as e:
         print(f"Error in deliveries route: {e}")
         traceback.print_exc()
-        rows = []
-    return render_template("deliveries.html", rows=rows)
+        page = None
+    return _listing("deliveries.html", page, rows=page.rows if page else [])
 
 @app.route("/deliveries", methods=["POST"])
 def deliveries_post():
@@ -576,17 +812,31 @@ def add_delivery():
         delivery_date = delivery_date_obj.strftime("%Y-%m-%d")  # Convert to string
         status = (data.get("status") or "").strip()
 
-        if not order_id or not agent_id:
-            flash("Order and Agent are required", "error")
+        if not order_id:
+            flash("Order is required", "error")
             return redirect(url_for("deliveries"))
 
         with get_conn() as conn:
-            with conn.cursor() as cur:
-                cur.execute("""
-                    INSERT INTO DELIVERY (Order_ID, Agent_ID, Delivery_Date, Status)
-                    VALUES (%s, %s, %s, %s)
-                """, (order_id, agent_id, delivery_date, status))
-            _commit(conn)
+            assigned = None
+            if not agent_id:
+                agent_id, assigned = _agent_for_order(conn, order_id)
+            if not agent_id:
+                flash("No delivery agent given and no idle agent near the restaurant", "error")
+                return redirect(url_for("deliveries"))
+            try:
+                with transaction(conn):
+                    with conn.cursor() as cur:
+                        cur.execute("""
+                            INSERT INTO DELIVERY (Order_ID, Agent_ID, Delivery_Date, Status)
+                            VALUES (%s, %s, %s, %s)
+                        """, (order_id, agent_id, delivery_date, status))
+                        delivery_id = cur.lastrowid
+                    after_delivery_update(conn, status)
+            except Exception:
+                if assigned is not None:
+                    dispatcher.release(assigned)  # the rider never got this delivery
+                raise
+        publish("delivery.created", delivery_id=delivery_id, order_id=order_id, agent_id=agent_id, status=status)
         flash("Delivery recorded successfully", "success")
     except Exception as e:
         print(f"Error adding delivery: {e}")
@@ -594,6 +844,21 @@ def add_delivery():
         flash(f"Error adding delivery: {str(e)}", "error")
     return redirect(url_for("deliveries"))
 
+def _agent_for_order(conn, order_id):
+    """
+    (agent_id, reserved): the order's rider if it has one, else the nearest idle agent
+    to its restaurant, which the dispatcher then holds (`reserved`, to release on failure).
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT Restaurant_ID, Agent_ID FROM ORDERS WHERE Order_ID = %s", (order_id,))
+        order = cur.fetchone()
+    if not order:
+        return None, None
+    if order["Agent_ID"]:
+        return order["Agent_ID"], None
+    reserved = dispatcher.assign(conn, order["Restaurant_ID"])
+    return reserved, reserved
+
 @app.route("/deliveries/delete/<int:delivery_id>")
 def delete_delivery(delivery_id):
     try:
@@ -601,6 +866,7 @@ def delete_delivery(delivery_id):
             with conn.cursor() as cur:
                 cur.execute("DELETE FROM DELIVERY WHERE Delivery_ID = %s", (delivery_id,))
             _commit(conn)
+        publish("delivery.deleted", delivery_id=delivery_id)
         flash("Delivery deleted", "success")
     except Exception as e:
         print(f"Error deleting delivery: {e}")
@@ -609,23 +875,26 @@ def delete_delivery(delivery_id):
     return redirect(url_for("deliveries"))
 
 # ---------- Coupons ----------
+COUPON_KEYSET = Keyset(("Code", "Code"))
+
 @app.route("/coupons")
+@cached_page("COUPON", "COUPON_REDEMPTION")
 def coupons():
     try:
-        with get_conn() as conn:
+        with get_conn(readonly=True) as conn:
             with conn.cursor() as cur:
                 try:
-                    cur.execute("SELECT * FROM COUPON ORDER BY Code")
+                    page = fetch_page(cur, "SELECT * FROM COUPON", COUPON_KEYSET, **_page_args())
                 except Exception:
                     # If schema init was partial, create COUPON lazily and retry
                     _lazy_create_coupon(conn)
-                    cur.execute("SELECT * FROM COUPON ORDER BY Code")
-                rows = cur.fetchall()
+                    page = fetch_page(cur, "SELECT * FROM COUPON", COUPON_KEYSET, **_page_args())
     except Exception as e:
         print(f"Error in coupons route: {e}")
         traceback.print_exc()
-        rows = []
-    return render_template("coupons.html", rows=rows)
+        page = None
+    rows = page.rows if page else []
+    return _listing("coupons.html", page, rows=rows, coupons=rows)
 
 @app.route("/coupons", methods=["POST"])
 def coupons_post():
@@ -635,19 +904,28 @@ def coupons_post():
 def add_coupon():
     try:
         data = _data()
-        code = (data.get("code") or "").strip()
+        code = normalize_code(data.get("code"))
         discount = (data.get("discount") or data.get("amount") or "").strip()
-        expiry_date = (data.get("expiry_date") or data.get("expires") or "").strip() or None
+        expiry_date = (data.get("expiry_date") or data.get("expires") or data.get("valid_until") or "").strip() or None
+        max_redemptions = (data.get("max_redemptions") or "").strip() or None
 
         if not code or not discount:
             flash("Code and Discount are required", "error")
             return redirect(url_for("coupons"))
 
+        try:
+            discount = parse_discount(discount)
+            expiry_date = expiry_date and parse_expiry_date(expiry_date)
+            max_redemptions = max_redemptions and parse_max_redemptions(max_redemptions)
+        except ValueError as e:
+            flash(str(e), "error")
+            return redirect(url_for("coupons"))
+
         with get_conn() as conn:
             with conn.cursor() as cur:
                 try:
-                    cur.execute("INSERT INTO COUPON (Code, Discount, Expiry_Date) VALUES (%s, %s, %s)",
-                                (code, discount, expiry_date))
+                    cur.execute("INSERT INTO COUPON (Code, Discount, Expiry_Date, Max_Redemptions) VALUES (%s, %s, %s, %s)",
+                                (code, discount, expiry_date, max_redemptions))
                 except Exception as e:
                     # If the table was missing, create and retry once
                     if isinstance(e, sqlite3.OperationalError) and "no such table" in str(e).lower():
@@ -657,6 +935,7 @@ def add_coupon():
                     else:
                         raise
             _commit(conn)
+        invalidate("COUPON")
         flash("Coupon added successfully", "success")
     except Exception as e:
         print(f"Error adding coupon: {e}")
@@ -671,6 +950,7 @@ def delete_coupon(coupon_id):
             with conn.cursor() as cur:
                 cur.execute("DELETE FROM COUPON WHERE Coupon_ID = %s", (coupon_id,))
             _commit(conn)
+        invalidate("COUPON")
         flash("Coupon deleted", "success")
     except Exception as e:
         print(f"Error deleting coupon: {e}")
@@ -678,5 +958,146 @@ def delete_coupon(coupon_id):
         flash(f"Error deleting coupon: {str(e)}", "error")
     return redirect(url_for("coupons"))
 
+# ---------- Analytics ----------
+@app.get("/analytics")
+def analytics():
+    """Revenue per day / restaurant and top items from the rollup tables (?start=&end=&restaurant_id=)."""
+    default_start, default_end = default_range()
+    start = _parse_date(request.args.get("start"))
+    end = _parse_date(request.args.get("end"))
+    start = start.strftime("%Y-%m-%d") if start else default_start
+    end = end.strftime("%Y-%m-%d") if end else default_end
+    restaurant_id = request.args.get("restaurant_id", type=int)
+    daily, restaurants_rank, items, restaurants = [], [], [], []
+    try:
+        with get_conn(readonly=True) as conn:
+            daily = revenue_by_day(conn, start, end, restaurant_id)
+            restaurants_rank = revenue_by_restaurant(conn, start, end)
+            items = top_items(conn, start, end, restaurant_id)
+            with conn.cursor() as cur:
+                restaurants = _restaurant_options(cur)
+    except Exception as e:
+        print(f"Error in analytics route: {e}")
+        traceback.print_exc()
+        flash(f"Error loading analytics: {str(e)}", "error")
+    return render_template("analytics.html", start=start, end=end, restaurant_id=restaurant_id,
+                           daily=daily, restaurants_rank=restaurants_rank, items=items, restaurants=restaurants)
+
+@app.cli.command("analytics-rebuild")
+@click.option("--start", help="first day (YYYY-MM-DD); default: first order")
+@click.option("--end", help="last day (YYYY-MM-DD); default: last order")
+def analytics_rebuild_command(start, end):
+    """Recompute the daily sales rollups from ORDERS/ORDER_DETAIL."""
+    init_db()
+    t0 = time.perf_counter()
+    with get_conn() as conn:
+        days = rebuild(conn, start, end)
+    click.echo(f"Rebuilt {days} day(s) of rollups in {time.perf_counter() - t0:.1f}s")
+
+# ---------- Search ----------
+@app.get("/search")
+def search_route():
+    """Type-ahead search: ?q=chick tik&type=items|restaurants&limit=10 (ranked, every word matched as a prefix)."""
+    kind = request.args.get("type")
+    if kind and kind not in SEARCH_KINDS:
+        return jsonify(error=f"type must be one of {', '.join(SEARCH_KINDS)}"), 400
+    limit = request.args.get("limit", SEARCH_DEFAULT_LIMIT, type=int)
+    try:
+        with get_conn(readonly=True) as conn:
+            results = search(conn, request.args.get("q", ""), (kind,) if kind else SEARCH_KINDS, limit)
+    except Exception as e:
+        print(f"Error in search route: {e}")
+        traceback.print_exc()
+        return jsonify(error="search failed"), 500
+    return jsonify(q=request.args.get("q", ""), **results)
+
+# ---------- Background jobs ----------
+@app.cli.command("jobs-worker")
+@click.option("--threads", type=click.IntRange(min=1), default=None, help="default: JOB_WORKER_THREADS")
+@click.option("--once", is_flag=True, help="exit when no job is due instead of polling forever")
+def jobs_worker_command(threads, once):
+    """Run queued background jobs (see jobs.py)."""
+    init_db()
+    worker = Worker(threads) if threads else Worker()
+    try:
+        worker.run(once=once)
+    except KeyboardInterrupt:
+        worker.stop()
+
+# ---------- Live events ----------
+@app.get("/events")
+def events():
+    """
+    Server-Sent Events feed of order, order_detail and delivery changes.
+    ?types=order,delivery limits the feed; reconnecting clients send Last-Event-ID.
+    """
+    types = {t for t in request.args.get("types", "").split(",") if t}
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    last_id = int(last_id) if last_id and last_id.isdigit() else None
+    return Response(sse_stream(broker, types, last_id), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# ---------- Export ----------
+@app.get("/export/<dataset>.<fmt>")
+def export(dataset, fmt):
+    """Stream a whole table as CSV or JSONL, optionally filtered with ?start=YYYY-MM-DD&end=YYYY-MM-DD."""
+    try:
+        chunks = stream_export(dataset, fmt, request.args.get("start"), request.args.get("end"))
+    except ExportError as e:
+        return jsonify(error=str(e)), 400
+    return Response(chunks, mimetype=FORMATS[fmt],
+                    headers={"Content-Disposition": f"attachment; filename={dataset}.{fmt}"})
+
+@app.cli.command("export")
+@click.argument("dataset", type=click.Choice(list(DATASETS)))
+@click.option("--format", "fmt", type=click.Choice(list(FORMATS)), default="csv")
+@click.option("--start", help="first day to include (YYYY-MM-DD)")
+@click.option("--end", help="last day to include (YYYY-MM-DD)")
+@click.option("--output", "-o", type=click.File("w"), default="-", help="file to write (default: stdout)")
+def export_command(dataset, fmt, start, end, output):
+    """Stream DATASET to a CSV or JSONL file."""
+    try:
+        for chunk in stream_export(dataset, fmt, start, end):
+            output.write(chunk)
+    except ExportError as e:
+        raise click.UsageError(str(e))
+
+# ---------- Import ----------
+@app.post("/import/<entity>")
+def import_data(entity):
+    """Bulk-load an uploaded CSV/JSONL file (form field "file"); returns the import report."""
+    upload = request.files.get("file")
+    if upload is None:
+        return jsonify(error="upload a CSV or JSONL file in the 'file' field"), 400
+    fmt = request.form.get("format") or request.args.get("format") or format_for(upload.filename)
+    chunk_size = request.form.get("chunk_size", request.args.get("chunk_size", IMPORT_CHUNK_SIZE), type=int)
+    try:
+        stream = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", newline="")
+        with get_conn() as conn:
+            report = import_records(conn, entity, read_records(stream, fmt), max(1, chunk_size))
+    except ImportDataError as e:
+        return jsonify(error=str(e)), 400
+    except UnicodeDecodeError:
+        return jsonify(error="file must be UTF-8 encoded"), 400
+    return jsonify(report.to_dict())
+
+@app.cli.command("import-data")
+@click.argument("entity", type=click.Choice(list(ENTITIES)))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]), help="default: from the file extension")
+@click.option("--chunk-size", type=click.IntRange(min=1), default=IMPORT_CHUNK_SIZE, show_default=True)
+def import_command(entity, path, fmt, chunk_size):
+    """Bulk-load ENTITY rows from a CSV or JSONL file."""
+    init_db()
+    with open(path, encoding="utf-8-sig", newline="") as f, get_conn() as conn:
+        report = import_records(conn, entity, read_records(f, fmt or format_for(path)), chunk_size)
+    summary = report.to_dict()
+    for error in summary["errors"]:
+        click.echo(f"line {error['line']}: {error['error']}", err=True)
+    click.echo(f"{summary['inserted']} of {summary['rows_read']} rows imported into {entity} "
+               f"in {summary['seconds']}s ({summary['rows_per_second']} rows/s), "
+               f"{summary['skipped']} already present, {summary['failed']} failed")
+
 if __name__ == "__main__":
+    init_db()
     app.run(debug=True)
\ No newline at end of file
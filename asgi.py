@@ -0,0 +1,277 @@
+# asgi.py
+"""
+ASGI entry point for an asyncio server (requirements-asgi.txt):
+
+    uvicorn asgi:app --host 0.0.0.0 --port $PORT --workers 2
+
+The hot read endpoints below are coroutines on aiodb, so one process keeps
+hundreds of them in flight while they wait on the database. They record the same
+/metrics request counters and latency histograms as the Flask routes they stand in
+for. Every other request goes to the regular Flask app (app.py) on a thread pool
+(ASGI_WSGI_THREADS), so both entry points serve the same site and the same responses.
+
+An /events stream holds a thread for its whole life (up to EVENTS_STREAM_SECONDS),
+so streams get their own pool of ASGI_SSE_STREAMS threads and never starve the
+pool above. A stream over that cap ends at once with a `retry:` hint, and the
+browser's EventSource reconnects later.
+"""
+import asyncio
+import os
+import re
+import sys
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from tempfile import SpooledTemporaryFile
+from urllib.parse import parse_qs
+
+from werkzeug.http import generate_etag, parse_etags, quote_etag
+
+import aiodb
+import metrics
+import search
+from api import RESOURCES, _ITEMS_SQL, _clean
+from app import app as flask_app, init_db
+from db import MYSQL_REPLICA_URLS, pin_reads_to_primary
+
+ASGI_WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", "32"))
+ASGI_SSE_STREAMS = int(os.getenv("ASGI_SSE_STREAMS", "64"))
+SSE_BUSY_RETRY_MS = 15000
+
+sse_turned_away = metrics.Counter("asgi_sse_turned_away_total", "/events streams ended at once: ASGI_SSE_STREAMS open")
+
+# =========================
+# Responses
+# =========================
+async def _respond(send, status, body, content_type="application/json", headers=()):
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode()),
+                            *headers]})
+    await send({"type": "http.response.body", "body": body})
+
+async def _json(send, scope, status, payload, cacheable=False):
+    """Serialized like Flask's jsonify; cacheable responses get an ETag and 304s like api._cacheable."""
+    body = (flask_app.json.dumps(payload, separators=(",", ":")) + "\n").encode()
+    if not cacheable or status != 200:
+        return await _respond(send, status, body)
+    etag = generate_etag(body)
+    if parse_etags(_header(scope, b"if-none-match")).contains(etag):
+        await send({"type": "http.response.start", "status": 304, "headers": [(b"etag", quote_etag(etag).encode())]})
+        return await send({"type": "http.response.body", "body": b""})
+    await _respond(send, status, body, headers=[(b"etag", quote_etag(etag).encode())])
+
+def _header(scope, name):
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+def _replica_ok(scope) -> bool:
+    """False while the client is inside its read-your-writes window (see app._route_reads)."""
+    if not MYSQL_REPLICA_URLS:
+        return True
+    cookie = SimpleCookie(_header(scope, b"cookie") or "").get(flask_app.config["SESSION_COOKIE_NAME"])
+    if cookie is None:
+        return True
+    try:
+        session = flask_app.session_interface.get_signing_serializer(flask_app).loads(cookie.value)
+    except Exception:
+        return True
+    return session.get("wrote_until", 0) <= time.time()
+
+# =========================
+# Async handlers
+# =========================
+async def health(scope, send, query):
+    await _respond(send, 200, b"OK", "text/html; charset=utf-8")
+
+async def search_route(scope, send, query):
+    kind = query.get("type")
+    if kind and kind not in search.KINDS:
+        return await _json(send, scope, 400, {"error": f"type must be one of {', '.join(search.KINDS)}"})
+    try:
+        limit = max(1, min(search.SEARCH_MAX_LIMIT, int(query.get("limit", search.SEARCH_DEFAULT_LIMIT))))
+    except ValueError:
+        limit = search.SEARCH_DEFAULT_LIMIT
+    kinds = (kind,) if kind else search.KINDS
+    q = query.get("q", "")
+    terms = search._terms(q)
+    if not terms:
+        return await _json(send, scope, 200, {"q": q, **{k: [] for k in kinds}})
+    sqlite = aiodb.backend().startswith("sqlite")
+    readonly = _replica_ok(scope)
+    pin_reads_to_primary(not readonly)  # lets search_cache store what a pinned read loads
+
+    async def load():
+        rows = await asyncio.gather(*(aiodb.fetchall(*search.statement(k, terms, sqlite, limit), readonly=readonly)
+                                      for k in kinds))
+        return dict(zip(kinds, rows))
+    results = await search.search_cache.aget((sqlite, tuple(terms), kinds, limit), load)
+    await _json(send, scope, 200, {"q": q, **results})
+
+async def order_items(scope, send, query, order_id):
+    rows = await aiodb.fetchall(_ITEMS_SQL, (int(order_id),), readonly=_replica_ok(scope))
+    await _json(send, scope, 200, {"data": [_clean(r) for r in rows]}, cacheable=True)
+
+def _get_resource(res):
+    async def get(scope, send, query, obj_id):
+        row = await aiodb.fetchone(f"{res.select} WHERE {res.pk} = %s", (int(obj_id),), readonly=_replica_ok(scope))
+        if row is None:
+            return await _json(send, scope, 404, {"error": f"{res.name} {obj_id} not found"})
+        await _json(send, scope, 200, {"data": _clean(row)}, cacheable=True)
+    return get
+
+# (path, Flask endpoint it stands in for -- the /metrics route label -- handler)
+ROUTES = [
+    (re.compile(r"/health"), "health", health),
+    (re.compile(r"/search"), "search_route", search_route),
+    (re.compile(r"/api/v1/orders/(?P<order_id>\d+)/items"), "api_v1.list_order_items", order_items),
+] + [(re.compile(rf"/api/v1/{res.name}/(?P<obj_id>\d+)"), f"api_v1.get_{res.name}", _get_resource(res))
+     for res in RESOURCES]
+
+async def _run_async(route, handler, scope, send, query, kwargs):
+    started, status = time.perf_counter(), [None]
+    queries = aiodb.count_queries()
+    head = scope["method"] == "HEAD"
+
+    async def send_and_record(message):
+        if message["type"] == "http.response.start":
+            status[0] = message["status"]
+        elif head:
+            message = dict(message, body=b"")  # headers (and Content-Length) as for GET, no body
+        await send(message)
+    try:
+        await handler(scope, send_and_record, query, **kwargs)
+    except Exception as e:
+        print(f"Error in async route {scope['path']}: {e}")
+        traceback.print_exc()
+        if status[0] is None:  # otherwise the response has begun and can only be cut short
+            await _json(send_and_record, scope, 500, {"error": "Internal server error"})
+    finally:
+        metrics.observe_request(route, status[0] or 500, time.perf_counter() - started, queries[0])
+
+# =========================
+# Everything else: the Flask app on a thread pool
+# =========================
+_wsgi_executor = None
+_sse_executor = None
+_sse_open = 0
+
+def _environ(scope, body):
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1] or 80),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "REMOTE_ADDR": (scope.get("client") or ("", 0))[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        "wsgi.errors": sys.stderr,  # a text stream: Flask logs unhandled exceptions here
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for key, value in scope["headers"]:
+        name = key.decode("latin-1").upper().replace("-", "_")
+        if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            name = f"HTTP_{name}"
+        value = value.decode("latin-1")
+        environ[name] = f"{environ[name]},{value}" if name in environ else value
+    return environ
+
+def _run_wsgi(environ, send_sync):
+    started = []
+
+    def start_response(status, headers, exc_info=None):
+        started[:] = [{"type": "http.response.start", "status": int(status.split(" ", 1)[0]),
+                       "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]}]
+
+    result = flask_app(environ, start_response)
+    try:
+        for chunk in result:  # streamed as produced (exports, /events)
+            if started:
+                send_sync(started.pop())
+            if chunk:
+                send_sync({"type": "http.response.body", "body": chunk, "more_body": True})
+        if started:
+            send_sync(started.pop())
+        send_sync({"type": "http.response.body", "body": b""})
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+
+def _executor(sse):
+    global _wsgi_executor, _sse_executor
+    if sse:
+        if _sse_executor is None:
+            _sse_executor = ThreadPoolExecutor(max_workers=ASGI_SSE_STREAMS, thread_name_prefix="sse")
+        return _sse_executor
+    if _wsgi_executor is None:
+        _wsgi_executor = ThreadPoolExecutor(max_workers=ASGI_WSGI_THREADS, thread_name_prefix="wsgi")
+    return _wsgi_executor
+
+async def _wsgi(scope, receive, send):
+    global _sse_open
+    sse = scope["path"] == "/events"
+    if sse and _sse_open >= ASGI_SSE_STREAMS:
+        sse_turned_away.inc()
+        return await _respond(send, 200, f"retry: {SSE_BUSY_RETRY_MS}\n\n".encode(), "text/event-stream")
+    loop = asyncio.get_running_loop()
+
+    def send_sync(message):
+        asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+    with SpooledTemporaryFile(max_size=1024 * 1024) as body:
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body.write(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body.seek(0)
+        if sse:
+            _sse_open += 1  # only touched on the event loop, no lock needed
+        try:
+            await loop.run_in_executor(_executor(sse), _run_wsgi, _environ(scope, body), send_sync)
+        finally:
+            if sse:
+                _sse_open -= 1
+
+# =========================
+# ASGI application
+# =========================
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, init_db)
+            except Exception as e:
+                # requests fall back to retrying from app._ensure_schema_fallback
+                print(f"Schema initialization error: {e}")
+            print(f"ASGI app ready (database access: {aiodb.backend()})")
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await aiodb.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+    if scope["method"] in ("GET", "HEAD"):
+        for pattern, route, handler in ROUTES:
+            match = pattern.fullmatch(scope["path"])
+            if match:
+                query = {k: v[-1] for k, v in parse_qs(scope["query_string"].decode("latin-1")).items()}
+                return await _run_async(route, handler, scope, send, query, match.groupdict())
+    await _wsgi(scope, receive, send)
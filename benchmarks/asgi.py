@@ -0,0 +1,114 @@
+# benchmarks/asgi.py
+"""
+Throughput of the gunicorn (gthread) deployment vs the ASGI one (uvicorn asgi:app).
+
+Starts each server in turn on a fresh SQLite database -- or on MYSQL_URL if it is
+set, which is where the async mode pays off -- then keeps --concurrency keep-alive
+clients requesting each --path for --seconds.
+
+    python benchmarks/asgi.py --concurrency 200 --seconds 10
+    MYSQL_URL=mysql://... python benchmarks/asgi.py --path /api/v1/orders/1 --path /search?q=chi
+"""
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _percentile(sorted_values, pct):
+    k = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+def _servers(args):
+    bind = f"127.0.0.1:{args.port}"
+    return {
+        "gunicorn": ["gunicorn", "-c", "gunicorn.conf.py", "--workers", str(args.workers),
+                     "--threads", str(args.threads), "--bind", bind, "app:app"],
+        "uvicorn": ["uvicorn", "asgi:app", "--workers", str(args.workers), "--host", "127.0.0.1",
+                    "--port", str(args.port), "--no-access-log"],
+    }
+
+def _wait_ready(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not come up")
+
+async def _client(port, path, deadline, latencies, errors):
+    request = f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n".encode()
+    reader = writer = None
+    while time.monotonic() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            t = time.perf_counter()
+            writer.write(request)
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            await reader.readexactly(length)
+            if not head.startswith(b"HTTP/1.1 200"):
+                errors.append(head.split(b"\r\n", 1)[0])
+            latencies.append((time.perf_counter() - t) * 1e3)
+            if b"connection: close" in head.lower():
+                writer.close()
+                writer = None
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+            errors.append(repr(e))
+            if writer is not None:
+                writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+async def _drive(port, path, concurrency, seconds):
+    latencies, errors = [], []
+    deadline = time.monotonic() + seconds
+    await asyncio.gather(*(_client(port, path, deadline, latencies, errors) for _ in range(concurrency)))
+    return sorted(latencies), errors
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--path", action="append", help="default: /api/v1/orders/1 and /search?q=chi")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=16, help="gunicorn gthread threads per worker")
+    parser.add_argument("--port", type=int, default=8799)
+    args = parser.parse_args()
+    paths = args.path or ["/api/v1/orders/1", "/search?q=chi"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, SQLITE_PATH=os.path.join(tmp, "bench.db"))
+        print(f"{args.workers} workers, {args.concurrency} concurrent clients, "
+              f"{'MySQL' if env.get('MYSQL_URL') else 'SQLite'}")
+        for name, cmd in _servers(args).items():
+            proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                    start_new_session=True)
+            try:
+                _wait_ready(args.port)
+                for path in paths:
+                    latencies, errors = asyncio.run(_drive(args.port, path, args.concurrency, args.seconds))
+                    if not latencies:
+                        print(f"{name:9} {path:24} no responses ({len(errors)} errors)")
+                        continue
+                    print(f"{name:9} {path:24} {len(latencies) / args.seconds:8.0f} req/s  "
+                          f"p50 {_percentile(latencies, 50):7.1f} ms  p99 {_percentile(latencies, 99):7.1f} ms  "
+                          f"errors {len(errors)}")
+            finally:
+                os.killpg(proc.pid, signal.SIGTERM)
+                proc.wait(timeout=30)
+
+if __name__ == "__main__":
+    main()
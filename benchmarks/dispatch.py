@@ -0,0 +1,87 @@
+# benchmarks/dispatch.py
+"""
+Nearest-idle-rider lookup latency with many riders online.
+
+Riders are scattered uniformly over a --km x --km city, --busy of them are on a
+delivery. Every lookup is checked against a brute-force scan of all riders.
+
+    python benchmarks/dispatch.py --riders 10000 --lookups 20000
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dispatch import Dispatcher, haversine_km  # noqa: E402
+
+CENTER = (12.9716, 77.5946)
+
+def _percentile(sorted_values, pct):
+    k = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+def _random_point(rng, km):
+    dlat = km / 111.2
+    dlon = dlat / math.cos(math.radians(CENTER[0]))
+    return (CENTER[0] + rng.uniform(-dlat / 2, dlat / 2), CENTER[1] + rng.uniform(-dlon / 2, dlon / 2))
+
+def _brute_force(riders, busy, lat, lon, max_km):
+    best = None
+    for agent_id, (alat, alon) in riders.items():
+        if agent_id in busy:
+            continue
+        km = haversine_km(lat, lon, alat, alon)
+        if km <= max_km and (best is None or km < best[1]):
+            best = (agent_id, km)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--riders", type=int, default=10000)
+    parser.add_argument("--km", type=float, default=30, help="side of the square city")
+    parser.add_argument("--busy", type=float, default=0.6, help="fraction of riders on a delivery")
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--cell-deg", type=float, default=0.01)
+    parser.add_argument("--verify", type=int, default=500, help="lookups checked against a brute-force scan")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    dispatcher = Dispatcher(cell_deg=args.cell_deg)
+    riders = {a: _random_point(rng, args.km) for a in range(1, args.riders + 1)}
+    busy = frozenset(a for a in riders if rng.random() < args.busy)
+
+    t0 = time.perf_counter()
+    now = time.time()
+    for agent_id, (lat, lon) in riders.items():
+        dispatcher.ping(agent_id, lat, lon, now)
+    ingest = time.perf_counter() - t0
+    dispatcher._busy = busy  # what refresh() would load from DELIVERY/ORDERS
+
+    points = [_random_point(rng, args.km) for _ in range(args.lookups)]
+    for lat, lon in points[:args.verify]:
+        got, want = dispatcher.nearest(lat, lon), _brute_force(riders, busy, lat, lon, 15)
+        assert (got and got[0]) == (want and want[0]), (got, want)
+
+    latencies = []
+    for lat, lon in points:
+        t = time.perf_counter()
+        dispatcher.nearest(lat, lon)
+        latencies.append((time.perf_counter() - t) * 1e6)
+    latencies.sort()
+
+    t = time.perf_counter()
+    for lat, lon in points[:200]:
+        _brute_force(riders, busy, lat, lon, 15)
+    brute = (time.perf_counter() - t) / 200 * 1e6
+
+    print(f"{args.riders} riders, {len(busy)} busy, {args.km:g} km city, cell {args.cell_deg} deg")
+    print(f"ingest      : {ingest / args.riders * 1e6:8.2f} us/ping")
+    print(f"grid lookup : p50 {_percentile(latencies, 50):8.1f} us  p99 {_percentile(latencies, 99):8.1f} us")
+    print(f"brute force : avg {brute:8.1f} us")
+
+if __name__ == "__main__":
+    main()
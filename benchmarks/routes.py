@@ -0,0 +1,240 @@
+# benchmarks/routes.py
+"""
+Seed a SQLite database and measure per-route latency through the Flask test client.
+
+    # small default run
+    python benchmarks/routes.py --out /tmp/bench.json
+    # production-sized data set, 4 worker processes, compare with the previous run
+    python benchmarks/routes.py --restaurants 10000 --orders 1000000 --details-per-order 5 \\
+        --db /tmp/bench.db --workers 4 --requests 500 --baseline /tmp/bench.json --out /tmp/bench2.json
+
+The database is only seeded when --db does not exist yet, so large data sets can be reused.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CHUNK = 10000
+
+# =========================
+# Seeding
+# =========================
+def _chunks(rows, size=CHUNK):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _bulk_insert(conn, sql, rows):
+    from db import transaction
+    count = 0
+    for batch in _chunks(rows):
+        with transaction(conn), conn.cursor() as cur:
+            cur.executemany(sql, batch)
+        count += len(batch)
+    return count
+
+def seed(args):
+    import db
+    rng = random.Random(42)
+    n_items = args.restaurants * args.items_per_restaurant
+    started = time.perf_counter()
+    with db.get_conn() as conn:
+        db.ensure_schema(conn)
+        _bulk_insert(conn, "INSERT INTO RESTAURANT (Name, Address, Phone, Opening_Hours) VALUES (%s, %s, %s, %s)",
+                     ((f"Restaurant {i:06d}", f"{i} Main St", "555-0100", "10:00-22:00")
+                      for i in range(args.restaurants)))
+        _bulk_insert(conn, "INSERT INTO CUSTOMER (Name, Email, Phone, Address) VALUES (%s, %s, %s, %s)",
+                     ((f"Customer {i:07d}", f"c{i}@example.com", "555-1000", f"{i} Park Ave")
+                      for i in range(args.customers)))
+        _bulk_insert(conn, "INSERT INTO DELIVERY_AGENT (Name, Phone) VALUES (%s, %s)",
+                     ((f"Agent {i:05d}", "555-2000") for i in range(args.agents)))
+        _bulk_insert(conn, "INSERT INTO FOOD_ITEM (Name, Price, Restaurant_ID) VALUES (%s, %s, %s)",
+                     ((f"Dish {i % args.items_per_restaurant:03d}", round(5 + (i % 40) * 0.5, 2),
+                       1 + i // args.items_per_restaurant) for i in range(n_items)))
+
+        def orders():
+            for i in range(args.orders):
+                day = 1 + i % 365
+                yield (1 + rng.randrange(args.customers), 1 + rng.randrange(args.restaurants),
+                       f"2024-{1 + (day - 1) // 31 % 12:02d}-{1 + (day - 1) % 28:02d} {i % 24:02d}:{i % 60:02d}:00",
+                       round(rng.uniform(5, 120), 2), 1 + rng.randrange(args.agents))
+        _bulk_insert(conn, "INSERT INTO ORDERS (Customer_ID, Restaurant_ID, Order_Date, Total_Amount, Agent_ID) "
+                           "VALUES (%s, %s, %s, %s, %s)", orders())
+
+        def details():
+            for order_id in range(1, args.orders + 1):
+                # items of one restaurant; distinct per order (PK is Order_ID, Item_ID)
+                base = rng.randrange(args.restaurants) * args.items_per_restaurant
+                picks = rng.sample(range(args.items_per_restaurant), min(args.details_per_order, args.items_per_restaurant))
+                for k in picks:
+                    yield (order_id, base + k + 1, 1 + rng.randrange(3))
+        _bulk_insert(conn, "INSERT INTO ORDER_DETAIL (Order_ID, Item_ID, Quantity) VALUES (%s, %s, %s)", details())
+
+        _bulk_insert(conn, "INSERT INTO DELIVERY (Order_ID, Agent_ID, Delivery_Date, Status) VALUES (%s, %s, %s, %s)",
+                     ((1 + rng.randrange(args.orders), 1 + rng.randrange(args.agents),
+                       f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}", "Delivered")
+                      for i in range(args.orders // 2)))
+        conn.execute("ANALYZE")
+    return round(time.perf_counter() - started, 2)
+
+# =========================
+# Request plan
+# =========================
+def _plan(args):
+    """(name, method, path factory, payload factory) per benchmarked route."""
+    def rid(rng): return 1 + rng.randrange(args.restaurants)
+    def cart(rng):
+        restaurant = rid(rng)
+        first = (restaurant - 1) * args.items_per_restaurant + 1
+        return {"customer_id": 1 + rng.randrange(args.customers), "restaurant_id": restaurant,
+                "items": [{"item_id": first + k, "quantity": 1 + rng.randrange(3)} for k in range(3)]}
+    return [
+        ("GET /", "GET", lambda rng: "/", None),
+        ("GET /orders", "GET", lambda rng: "/orders", None),
+        ("GET /restaurants", "GET", lambda rng: "/restaurants", None),
+        ("GET /customers", "GET", lambda rng: "/customers", None),
+        ("GET /food_items", "GET", lambda rng: "/food_items", None),
+        ("GET /deliveries", "GET", lambda rng: "/deliveries", None),
+        ("GET /order_details/<id>", "GET", lambda rng: f"/order_details/{1 + rng.randrange(args.orders)}", None),
+        ("GET /api/v1/orders", "GET", lambda rng: "/api/v1/orders", None),
+        ("POST /orders/add", "FORM", lambda rng: "/orders/add",
+         lambda rng: {"customer_id": 1 + rng.randrange(args.customers), "restaurant_id": rid(rng), "total_amount": "10"}),
+        ("POST /orders/place", "JSON", lambda rng: "/orders/place", cart),
+    ]
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+def _drive(job):
+    """Run every route `requests` times in one process; returns {route: (latencies_ms, errors, wall_s)}."""
+    args, worker_id = job
+    from app import app, init_db
+    init_db()
+    client = app.test_client()
+    rng = random.Random(1000 + worker_id)
+    results = {}
+    for name, method, path, payload in _plan(args):
+        for _ in range(args.warmup):
+            _call(client, method, path(rng), payload(rng) if payload else None)
+        latencies, errors = [], 0
+        wall = time.perf_counter()
+        for _ in range(args.requests):
+            url, body = path(rng), payload(rng) if payload else None
+            t0 = time.perf_counter()
+            status = _call(client, method, url, body)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            if status >= 400:
+                errors += 1
+        results[name] = (latencies, errors, time.perf_counter() - wall)
+    return results
+
+def _call(client, method, url, body):
+    if method == "GET":
+        return client.get(url).status_code
+    if method == "FORM":
+        return client.post(url, data=body).status_code
+    return client.post(url, json=body).status_code
+
+def summarize(per_worker, workers):
+    summary = {}
+    for name in per_worker[0]:
+        latencies = sorted(l for w in per_worker for l in w[name][0])
+        errors = sum(w[name][1] for w in per_worker)
+        wall = max(w[name][2] for w in per_worker)
+        summary[name] = {
+            "requests": len(latencies),
+            "errors": errors,
+            "p50_ms": round(_percentile(latencies, 50), 3),
+            "p95_ms": round(_percentile(latencies, 95), 3),
+            "p99_ms": round(_percentile(latencies, 99), 3),
+            "throughput_rps": round(len(latencies) / wall, 1) if wall else None,
+        }
+    return summary
+
+def _print(summary, baseline=None):
+    header = f"{'route':28} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'errors':>7}"
+    if baseline:
+        header += f" {'p50 vs base':>12}"
+    print(header)
+    for name, r in summary.items():
+        line = f"{name:28} {r['p50_ms']:9.3f} {r['p95_ms']:9.3f} {r['p99_ms']:9.3f} {r['throughput_rps']:9.1f} {r['errors']:7d}"
+        base = (baseline or {}).get(name)
+        if base and base.get("p50_ms"):
+            line += f" {100 * (r['p50_ms'] - base['p50_ms']) / base['p50_ms']:+11.1f}%"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", help="SQLite file to use (seeded if missing); default: a temp file")
+    parser.add_argument("--restaurants", type=int, default=200)
+    parser.add_argument("--items-per-restaurant", type=int, default=20)
+    parser.add_argument("--customers", type=int, default=2000)
+    parser.add_argument("--agents", type=int, default=100)
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--details-per-order", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per route per worker")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=1, help="processes driving the app concurrently")
+    parser.add_argument("--out", help="write results as JSON to this path")
+    parser.add_argument("--baseline", help="previous --out file to compare p50 against")
+    args = parser.parse_args()
+
+    tmp = None
+    if not args.db:
+        tmp = tempfile.TemporaryDirectory()
+        args.db = os.path.join(tmp.name, "bench.db")
+    os.environ["SQLITE_PATH"] = args.db
+    os.environ.pop("MYSQL_URL", None)
+
+    seed_seconds = None
+    if not os.path.exists(args.db):
+        print(f"Seeding {args.db} ...", file=sys.stderr)
+        seed_seconds = seed(args)
+        print(f"Seeded in {seed_seconds}s", file=sys.stderr)
+
+    jobs = [(args, i) for i in range(args.workers)]
+    if args.workers == 1:
+        per_worker = [_drive(jobs[0])]
+    else:
+        with multiprocessing.get_context("fork").Pool(args.workers) as pool:
+            per_worker = pool.map(_drive, jobs)
+    summary = summarize(per_worker, args.workers)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f).get("routes")
+    _print(summary, baseline)
+
+    if args.out:
+        report = {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")},
+            "seed_seconds": seed_seconds,
+            "routes": summary,
+        }
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    if tmp:
+        tmp.cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/row_path.py
+"""
+Microbenchmark of the SQLite compatibility cursor's fetch path.
+
+"legacy" reproduces the previous implementation (sqlite3.Row rows converted with
+{k: row[k] for k in row.keys()} and %s -> ? conversion on every execute);
+"current" is db._SQLiteCompatCursor.
+
+    python benchmarks/row_path.py --rows 5000 --repeat 50
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import _SQLiteCompatCursor  # noqa: E402
+
+QUERY = """
+    SELECT o.Order_ID, o.Order_Date, c.Name AS customer, 'Pending' AS Order_Status,
+           o.Total_Amount, o.Customer_ID, o.Restaurant_ID, o.Agent_ID
+    FROM ORDERS o LEFT JOIN CUSTOMER c ON o.Customer_ID = c.Customer_ID
+    WHERE o.Order_ID > %s
+    ORDER BY o.Order_ID LIMIT %s
+"""
+
+def _legacy_row(row):
+    if row is None:
+        return None
+    if isinstance(row, sqlite3.Row):
+        return {k: row[k] for k in row.keys()}
+    return row
+
+def legacy_fetch(conn, rows):
+    conn.row_factory = sqlite3.Row
+    cur = conn.cursor()
+    cur.execute(QUERY.replace("%s", "?"), (0, rows))
+    return [_legacy_row(r) for r in cur.fetchall()]
+
+def current_fetch(conn, rows):
+    conn.row_factory = None
+    cur = _SQLiteCompatCursor(conn.cursor())
+    cur.execute(QUERY, (0, rows))
+    return cur.fetchall()
+
+def build(rows):
+    conn = sqlite3.connect(":memory:")
+    conn.executescript("""
+        CREATE TABLE CUSTOMER (Customer_ID INTEGER PRIMARY KEY, Name TEXT);
+        CREATE TABLE ORDERS (Order_ID INTEGER PRIMARY KEY, Customer_ID INTEGER, Restaurant_ID INTEGER,
+                             Order_Date TEXT, Total_Amount NUMERIC, Agent_ID INTEGER);
+    """)
+    conn.executemany("INSERT INTO CUSTOMER VALUES (?, ?)", [(i, f"Customer {i}") for i in range(1, 101)])
+    conn.executemany("INSERT INTO ORDERS VALUES (?, ?, ?, ?, ?, ?)",
+                     [(i, 1 + i % 100, 1 + i % 7, "2024-11-01 12:00:00", 19.99, 1 + i % 5) for i in range(1, rows + 1)])
+    return conn
+
+def bench(fn, conn, rows, repeat):
+    fn(conn, rows)  # warm up
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn(conn, rows)
+    return (time.perf_counter() - t0) / repeat
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    conn = build(args.rows)
+    assert legacy_fetch(conn, args.rows) == current_fetch(conn, args.rows)
+    legacy = bench(legacy_fetch, conn, args.rows, args.repeat)
+    current = bench(current_fetch, conn, args.rows, args.repeat)
+    print(f"{args.rows} rows x {args.repeat}")
+    print(f"legacy : {legacy * 1000:8.2f} ms/query  {legacy / args.rows * 1e6:6.2f} us/row")
+    print(f"current: {current * 1000:8.2f} ms/query  {current / args.rows * 1e6:6.2f} us/row")
+    print(f"speedup: {legacy / current:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# benchmarks/search.py
+"""
+Type-ahead search latency over a large menu (SQLite FTS5 backend).
+
+Loads --items generated dish names spread over --restaurants restaurants (the FTS
+triggers index them as they are inserted), then times search() for prefixes typed
+one keystroke at a time against the LIKE '%...%' scan it replaces.
+
+    python benchmarks/search.py --items 1000000 --queries 2000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+import search  # noqa: E402
+
+STYLES = ["Spicy", "Crispy", "Smoked", "Grilled", "Butter", "Garlic", "Tandoori", "Masala", "Honey", "Classic",
+          "Roasted", "Stuffed", "Creamy", "Tangy", "Peri Peri", "Schezwan", "Lemon", "Pepper", "Herb", "Cheesy"]
+DISHES = ["Chicken", "Paneer", "Mushroom", "Prawn", "Mutton", "Veg", "Egg", "Fish", "Tofu", "Corn",
+          "Potato", "Lamb", "Beef", "Pork", "Chickpea", "Spinach", "Cauliflower", "Okra", "Duck", "Crab"]
+FORMS = ["Tikka", "Biryani", "Curry", "Wrap", "Burger", "Pizza", "Noodles", "Fried Rice", "Kebab", "Soup",
+         "Salad", "Sandwich", "Momos", "Dosa", "Roll", "Bowl", "Pasta", "Tacos", "Platter", "Skewers"]
+
+LIKE_SQL = """
+    SELECT f.Item_ID, f.Name, f.Price, f.Restaurant_ID
+    FROM FOOD_ITEM f
+    WHERE f.Name LIKE %s
+    ORDER BY f.Name
+    LIMIT %s
+"""
+
+def _percentile(sorted_values, pct):
+    k = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+def _name(rng):
+    return f"{rng.choice(STYLES)} {rng.choice(DISHES)} {rng.choice(FORMS)} #{rng.randint(1, 999)}"
+
+def seed(conn, rng, items, restaurants, batch=20000):
+    with db.transaction(conn), conn.cursor() as cur:
+        cur.executemany("INSERT INTO RESTAURANT (Name, Address, Phone) VALUES (%s, %s, %s)",
+                        [(f"Kitchen {r}", f"{r} MG Road", "") for r in range(restaurants)])
+        cur.execute("SELECT MIN(Restaurant_ID) AS first FROM RESTAURANT WHERE Name LIKE 'Kitchen %'")
+        first = cur.fetchone()["first"]
+    for start in range(0, items, batch):
+        with db.transaction(conn), conn.cursor() as cur:
+            cur.executemany("INSERT INTO FOOD_ITEM (Name, Price, Restaurant_ID) VALUES (%s, %s, %s)",
+                            [(_name(rng), rng.randint(50, 500), first + rng.randrange(restaurants))
+                             for _ in range(min(batch, items - start))])
+
+def _keystrokes(rng, n):
+    """Prefixes as a user types them: 'ch', 'chi', ..., 'chicken t', 'chicken ti', ..."""
+    out = []
+    while len(out) < n:
+        words = f"{rng.choice(DISHES)} {rng.choice(FORMS)}".lower().split()
+        typed = ""
+        for word in words:
+            for k in range(2, len(word) + 1):
+                out.append((typed + word[:k]).strip())
+            typed += word + " "
+    return out[:n]
+
+def _time(fn, queries):
+    latencies = []
+    for q in queries:
+        t = time.perf_counter()
+        fn(q)
+        latencies.append((time.perf_counter() - t) * 1e3)
+    latencies.sort()
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=1000000)
+    parser.add_argument("--restaurants", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--like-queries", type=int, default=50, help="the LIKE scan is slow; time fewer of them")
+    parser.add_argument("--limit", type=int, default=search.SEARCH_DEFAULT_LIMIT)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        db.SQLITE_PATH = os.path.join(tmp, "bench.db")
+        db.reset_pool()
+        with db.get_conn() as conn:
+            db.ensure_schema(conn)
+            t0 = time.perf_counter()
+            seed(conn, rng, args.items, args.restaurants)
+            load = time.perf_counter() - t0
+
+            queries = _keystrokes(rng, args.queries)
+            # _search skips the result cache, so every keystroke hits the index
+            fts = _time(lambda q: search._search(conn, True, search._terms(q), ("items",), args.limit), queries)
+
+            def like(q):
+                with conn.cursor() as cur:
+                    cur.execute(LIKE_SQL, ("%" + q + "%", args.limit))
+                    cur.fetchall()
+            scan = _time(like, queries[:args.like_queries])
+        db.reset_pool()
+
+    print(f"{args.items} menu items, {args.restaurants} restaurants")
+    print(f"load + index : {load:8.1f} s ({args.items / load:,.0f} rows/s)")
+    print(f"fts5 search  : p50 {_percentile(fts, 50):8.2f} ms  p99 {_percentile(fts, 99):8.2f} ms")
+    print(f"LIKE scan    : p50 {_percentile(scan, 50):8.2f} ms  p99 {_percentile(scan, 99):8.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# benchmarks/sqlite_profile.py
+"""
+Concurrent read/write throughput of the SQLite backend under each SQLITE_PROFILE.
+
+Each worker process plays a gunicorn worker: it loops for --seconds, either reading
+the first page of /orders or placing a 3-item order in one transaction.
+
+    python benchmarks/sqlite_profile.py --workers 4 --seconds 5 --write-ratio 0.2
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+from orders import place_order  # noqa: E402
+
+READ_SQL = """
+    SELECT o.Order_ID, o.Order_Date, c.Name AS customer, r.Name AS restaurant, o.Total_Amount
+    FROM ORDERS o
+    LEFT JOIN CUSTOMER c ON o.Customer_ID = c.Customer_ID
+    LEFT JOIN RESTAURANT r ON o.Restaurant_ID = r.Restaurant_ID
+    ORDER BY o.Order_Date DESC, o.Order_ID DESC
+    LIMIT 50
+"""
+
+def _use(path, profile):
+    db.SQLITE_PATH, db.SQLITE_PROFILE = path, profile
+    db.reset_pool()
+
+def seed(path, profile, orders):
+    _use(path, profile)
+    with db.get_conn() as conn:
+        db.ensure_schema(conn)
+        db.insert_sample_data(conn)
+        with db.transaction(conn), conn.cursor() as cur:
+            cur.executemany(
+                "INSERT INTO ORDERS (Customer_ID, Restaurant_ID, Order_Date, Total_Amount) VALUES (%s, %s, %s, %s)",
+                [(1 + i % 8, 1 + i % 5, f"2024-{1 + i % 12:02d}-{1 + i % 28:02d} 12:00:00", 10.0) for i in range(orders)],
+            )
+
+def worker(args):
+    path, profile, seconds, write_ratio, seed_value = args
+    _use(path, profile)
+    rng = random.Random(seed_value)
+    reads = writes = locked = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            with db.get_conn() as conn:
+                if rng.random() < write_ratio:
+                    restaurant = rng.randint(1, 5)
+                    first_item = (restaurant - 1) * 3 + 1
+                    place_order(conn, rng.randint(1, 8), restaurant,
+                                [(first_item + k, rng.randint(1, 3)) for k in range(3)])
+                    writes += 1
+                else:
+                    with conn.cursor() as cur:
+                        cur.execute(READ_SQL)
+                        cur.fetchall()
+                    reads += 1
+        except sqlite3.OperationalError as e:
+            if "locked" not in str(e):
+                raise
+            locked += 1
+    return reads, writes, locked
+
+def run(profile, workers, seconds, write_ratio, orders):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        seed(path, profile, orders)
+        ctx = multiprocessing.get_context("fork")
+        with ctx.Pool(workers) as pool:
+            results = pool.map(worker, [(path, profile, seconds, write_ratio, i) for i in range(workers)])
+    reads, writes, locked = (sum(col) for col in zip(*results))
+    return {
+        "profile": profile,
+        "reads_per_s": round(reads / seconds, 1),
+        "writes_per_s": round(writes / seconds, 1),
+        "locked_errors": locked,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--orders", type=int, default=20000, help="orders seeded before the run")
+    parser.add_argument("--busy-timeout-ms", type=int, default=None,
+                        help="override SQLITE_BUSY_TIMEOUT_MS for both profiles")
+    args = parser.parse_args()
+    if args.busy_timeout_ms is not None:
+        db.SQLITE_BUSY_TIMEOUT_MS = args.busy_timeout_ms
+
+    results = [run(p, args.workers, args.seconds, args.write_ratio, args.orders) for p in ("compat", "production")]
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+# cache.py
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; only FileVersions (CACHE_SYNC_DIR) needs it
+    fcntl = None
+
+from db import READ_YOUR_WRITES_SECONDS, replica_reads
+
+CACHE_TTL = float(os.getenv("CACHE_TTL", "60"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "256"))
+# Set to a directory (e.g. /tmp/restaurant-cache) so every gunicorn worker on the
+# host sees invalidations immediately; otherwise other workers catch up after CACHE_TTL.
+CACHE_SYNC_DIR = os.getenv("CACHE_SYNC_DIR")
+
+# =========================
+# Table version counters
+# =========================
+class LocalVersions:
+    """Per-table version counters visible to this process only."""
+    def __init__(self):
+        self._versions = {}
+        self._bumped_at = {}
+        self._lock = threading.Lock()
+
+    def get(self, table) -> int:
+        return self._versions.get(table, 0)
+
+    def age(self, table) -> float:
+        """Seconds since the table's last bump (inf if never)."""
+        bumped_at = self._bumped_at.get(table)
+        return math.inf if bumped_at is None else time.time() - bumped_at
+
+    def bump(self, table):
+        with self._lock:
+            self._versions[table] = self._versions.get(table, 0) + 1
+            self._bumped_at[table] = time.time()
+
+class FileVersions:
+    """
+    Version counters shared by all processes on the host. Each table's file holds
+    one 8-byte counter: bump() increments it in place under an exclusive flock(),
+    get() is a single pread() on a descriptor kept open per table.
+    """
+    def __init__(self, directory):
+        if fcntl is None:
+            raise RuntimeError("CACHE_SYNC_DIR needs a POSIX system (fcntl)")
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._fds = {}
+        self._lock = threading.Lock()
+
+    def _path(self, table):
+        return os.path.join(self.directory, f"{table}.version")
+
+    def _fd(self, table):
+        fd = self._fds.get(table)
+        if fd is None:
+            with self._lock:
+                fd = self._fds.get(table)
+                if fd is None:
+                    fd = self._fds[table] = os.open(self._path(table), os.O_RDWR | os.O_CREAT, 0o644)
+        return fd
+
+    @staticmethod
+    def _read(fd) -> int:
+        return int.from_bytes(os.pread(fd, 8, 0).ljust(8, b"\0"), "little")
+
+    def get(self, table) -> int:
+        return self._read(self._fd(table))
+
+    def age(self, table) -> float:
+        st = os.fstat(self._fd(table))
+        return time.time() - st.st_mtime if st.st_size else math.inf
+
+    def bump(self, table):
+        # A fresh descriptor each time: flock() on one shared with forked workers
+        # would not keep them out.
+        fd = os.open(self._path(table), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            os.pwrite(fd, ((self._read(fd) + 1) % 2 ** 64).to_bytes(8, "little"), 0)
+        finally:
+            os.close(fd)  # releases the lock
+
+table_versions = FileVersions(CACHE_SYNC_DIR) if CACHE_SYNC_DIR else LocalVersions()
+
+def invalidate(*tables):
+    """Mark tables as changed; every cache entry derived from them is dropped on next read."""
+    for table in tables:
+        table_versions.bump(table)
+
+# =========================
+# Read-through cache
+# =========================
+_caches = []
+
+class ReadThroughCache:
+    """
+    Bounded LRU cache with a TTL whose entries are derived from `tables`.
+    An entry is only served while the versions of those tables are unchanged.
+
+    With read replicas, a load in a context that reads from them (db.replica_reads)
+    within READ_YOUR_WRITES_SECONDS of a write to `tables` is returned but not stored:
+    the stamp already includes that write while a lagging replica may not, and storing
+    would keep the old rows under the new version -- even for clients whose reads are
+    pinned to the primary.
+    """
+    def __init__(self, name, tables, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL, versions=None):
+        self.name = name
+        self.tables = tuple(tables)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._versions = versions or table_versions
+        self._entries = OrderedDict()  # key -> (value, version stamp, expires_at)
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "unsettled": 0}
+        _caches.append(self)
+
+    def get(self, key, loader):
+        stamp, hit, value = self.lookup(key)
+        if hit:
+            return value
+        value = loader()
+        self.store(key, value, stamp)
+        return value
+
+    async def aget(self, key, loader):
+        """get() for coroutines (asgi.py): `loader` is an async callable."""
+        stamp, hit, value = self.lookup(key)
+        if hit:
+            return value
+        value = await loader()
+        self.store(key, value, stamp)
+        return value
+
+    def lookup(self, key):
+        """(stamp, hit, value); pass the stamp to store() after loading a miss."""
+        # Stamp before loading: a write that lands mid-load bumps the version,
+        # so the possibly stale value is never served afterwards.
+        stamp = tuple(self._versions.get(t) for t in self.tables)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == stamp and entry[2] > now:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return stamp, True, entry[0]
+            self._counters["misses"] += 1
+        return stamp, False, None
+
+    def store(self, key, value, stamp):
+        if not self._settled():
+            with self._lock:
+                self._counters["unsettled"] += 1
+            return
+        with self._lock:
+            self._entries[key] = (value, stamp, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def _settled(self) -> bool:
+        """False while a replica read may still predate the last write to our tables."""
+        if not replica_reads():
+            return True
+        return all(self._versions.age(t) >= READ_YOUR_WRITES_SECONDS for t in self.tables)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._counters, size=len(self._entries), max_entries=self.max_entries)
+
+def cache_stats() -> dict:
+    return {c.name: c.stats() for c in _caches}
@@ -0,0 +1,158 @@
+# coupons.py
+"""
+Checkout-time coupons.
+
+COUPON.Discount is a percentage of the order's item total; Expiry_Date is the last
+day a code can be used (NULL = never expires) and Max_Redemptions caps how many
+orders may use it (NULL = unlimited).
+
+Each worker keeps the active codes in a CouponIndex, so validating a code at
+checkout is a dict lookup. The index reloads when the COUPON table version changes
+(add/delete routes call invalidate("COUPON")) or after COUPON_INDEX_TTL, and checks
+expiry on every lookup, so a code stops working at midnight without a reload.
+
+Redemption is a single conditional UPDATE -- increment only while under the cap and
+not expired -- issued as the last statement of the order's transaction, so a hot
+code's row is locked only for the commit, never across a read-modify-write.
+"""
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import date, datetime
+from decimal import Decimal
+
+from cache import table_versions
+from metrics import Counter
+
+COUPON_INDEX_TTL = float(os.getenv("COUPON_INDEX_TTL", "60"))
+
+coupon_redemptions = Counter("coupon_redemptions_total", "Coupon redemption attempts at checkout", ("outcome",))
+
+Coupon = namedtuple("Coupon", "coupon_id code discount expiry_date max_redemptions")
+
+class CouponError(ValueError):
+    """The code is unknown, expired or used up."""
+
+def normalize_code(code) -> str:
+    return (code or "").strip().upper()
+
+def _today() -> str:
+    return datetime.utcnow().strftime("%Y-%m-%d")
+
+def _day(value):
+    if isinstance(value, (date, datetime)):
+        return value.strftime("%Y-%m-%d")
+    return str(value)[:10] if value else None
+
+def parse_discount(value) -> float:
+    """COUPON.Discount from user input: a percentage in (0, 100]. Raises ValueError."""
+    try:
+        discount = float(value)
+    except (TypeError, ValueError):
+        discount = None
+    if discount is None or not 0 < discount <= 100:  # also rejects NaN
+        raise ValueError("Discount must be a percentage between 0 and 100")
+    return discount
+
+def parse_max_redemptions(value) -> int:
+    """COUPON.Max_Redemptions from user input: a whole number >= 0. Raises ValueError."""
+    text = str(value).strip()
+    if not (text.isascii() and text.isdigit()):  # also rejects "-1", "2.5" and JSON true
+        raise ValueError("Max redemptions must be a whole number")
+    return int(text)
+
+def parse_expiry_date(value) -> str:
+    """COUPON.Expiry_Date from user input: YYYY-MM-DD. Raises ValueError."""
+    try:
+        return datetime.strptime(str(value).strip(), "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise ValueError("Expiry date must be YYYY-MM-DD")
+
+def discount_amount(subtotal, coupon) -> Decimal:
+    return (Decimal(subtotal) * coupon.discount / 100).quantize(Decimal("0.01"))
+
+# =========================
+# In-memory index
+# =========================
+class CouponIndex:
+    """Active codes for this worker: {CODE: Coupon}."""
+    def __init__(self, ttl=COUPON_INDEX_TTL, versions=None):
+        self.ttl = ttl
+        self._versions = versions or table_versions
+        self._codes = {}
+        self._exhausted = set()  # Coupon_IDs that hit their cap since the last load
+        self._stamp = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self, conn):
+        # Stamp before reading, like ReadThroughCache: a write during the load forces another.
+        stamp = self._versions.get("COUPON")
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT Coupon_ID, Code, Discount, Expiry_Date, Max_Redemptions, Redemption_Count
+                FROM COUPON
+                WHERE Expiry_Date IS NULL OR Expiry_Date >= %s
+            """, (_today(),))
+            rows = cur.fetchall()
+        codes, exhausted = {}, set()
+        for r in rows:
+            try:
+                # clamped: rows written before parse_discount existed must not make a total negative
+                discount = min(max(Decimal(str(r["Discount"])), Decimal(0)), Decimal(100))
+                cap = None if r["Max_Redemptions"] is None else int(r["Max_Redemptions"])
+            except (TypeError, ValueError, ArithmeticError) as e:
+                # a row saved before the parse_* checks existed; one bad code must not disable the rest
+                print(f"Skipping coupon {r['Code']!r} (Coupon_ID {r['Coupon_ID']}): {e}")
+                continue
+            coupon = Coupon(int(r["Coupon_ID"]), r["Code"], discount, _day(r["Expiry_Date"]), cap)
+            codes[normalize_code(r["Code"])] = coupon
+            if cap is not None and int(r["Redemption_Count"] or 0) >= cap:
+                exhausted.add(coupon.coupon_id)
+        with self._lock:
+            self._codes, self._exhausted = codes, exhausted
+            self._stamp, self._expires_at = stamp, time.monotonic() + self.ttl
+
+    def _fresh(self) -> bool:
+        return self._stamp == self._versions.get("COUPON") and time.monotonic() < self._expires_at
+
+    def lookup(self, conn, code, today=None) -> Coupon:
+        """The usable coupon for `code`; raises CouponError otherwise."""
+        if not self._fresh():
+            self._load(conn)
+        key = normalize_code(code)
+        coupon = self._codes.get(key)
+        if coupon is None:
+            raise CouponError(f"Unknown or expired coupon {key}")
+        if coupon.expiry_date is not None and coupon.expiry_date < (today or _today()):
+            raise CouponError(f"Coupon {key} expired on {coupon.expiry_date}")
+        if coupon.coupon_id in self._exhausted:
+            raise CouponError(f"Coupon {key} has been fully redeemed")
+        return coupon
+
+    def mark_exhausted(self, coupon_id):
+        with self._lock:
+            self._exhausted.add(coupon_id)
+
+    def stats(self) -> dict:
+        return {"codes": len(self._codes), "exhausted": len(self._exhausted)}
+
+coupon_index = CouponIndex()
+
+# =========================
+# Redemption
+# =========================
+def redeem(cur, coupon):
+    """Count one use of `coupon` on the caller's transaction; raises CouponError if it is used up or expired."""
+    cur.execute("""
+        UPDATE COUPON SET Redemption_Count = Redemption_Count + 1
+        WHERE Coupon_ID = %s
+          AND (Max_Redemptions IS NULL OR Redemption_Count < Max_Redemptions)
+          AND (Expiry_Date IS NULL OR Expiry_Date >= %s)
+    """, (coupon.coupon_id, _today()))
+    if cur.rowcount != 1:
+        coupon_redemptions.inc(1, "rejected")
+        coupon_index.mark_exhausted(coupon.coupon_id)
+        raise CouponError(f"Coupon {normalize_code(coupon.code)} is no longer available")
+    coupon_redemptions.inc(1, "redeemed")
@@ -0,0 +1,448 @@
+# dispatch.py
+"""
+Nearest-idle-rider assignment.
+
+Rider positions live in RIDER_LOCATION; each process mirrors the recent ones in a
+uniform lat/lon grid (GridIndex) so a lookup only touches the cells around the
+pickup point. The mirror is refreshed incrementally (rows with a newer
+Last_Updated) at most every DISPATCH_REFRESH_SECONDS, which is also how pings
+received by other gunicorn workers become visible here.
+
+A rider is idle when their position is fresher than DISPATCH_STALE_SECONDS and
+they have neither an open DELIVERY (status not in DONE_STATUSES) nor a recent
+order without a DELIVERY row yet.
+"""
+import atexit
+import math
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import sqlite3
+
+import pymysql
+
+from db import get_conn, is_sqlite_conn, transaction
+from metrics import Counter, Histogram, register_collector
+
+DISPATCH_CELL_DEG = float(os.getenv("DISPATCH_CELL_DEG", "0.01"))  # ~1.1 km of latitude
+DISPATCH_MAX_KM = float(os.getenv("DISPATCH_MAX_KM", "15"))
+DISPATCH_STALE_SECONDS = float(os.getenv("DISPATCH_STALE_SECONDS", "300"))
+DISPATCH_REFRESH_SECONDS = float(os.getenv("DISPATCH_REFRESH_SECONDS", "2"))
+# An assigned rider stays busy this long while no DELIVERY row exists for the order.
+DISPATCH_HOLD_SECONDS = float(os.getenv("DISPATCH_HOLD_SECONDS", "1800"))
+# Each refresh re-reads this much before the watermark, so pings that another
+# worker's LocationBatcher writes late (stamped with their receive time) are not missed.
+DISPATCH_REFRESH_OVERLAP_SECONDS = float(os.getenv("DISPATCH_REFRESH_OVERLAP_SECONDS", "10"))
+
+# Location ingestion (LocationBatcher)
+LOCATION_FLUSH_SECONDS = float(os.getenv("LOCATION_FLUSH_SECONDS", "1"))
+LOCATION_FLUSH_BATCH = int(os.getenv("LOCATION_FLUSH_BATCH", "2000"))
+LOCATION_MAX_PENDING = int(os.getenv("LOCATION_MAX_PENDING", "50000"))
+
+DONE_STATUSES = ("Delivered", "Cancelled")
+EARTH_RADIUS_KM = 6371.0088
+_KM_PER_DEG = math.pi * EARTH_RADIUS_KM / 180
+_TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def haversine_km(lat1, lon1, lat2, lon2) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((p2 - p1) / 2) ** 2
+         + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def utc_timestamp(value) -> float:
+    """RIDER_LOCATION.Last_Updated (UTC, str or datetime) -> epoch seconds."""
+    if isinstance(value, str):
+        value = datetime.strptime(value[:19], _TS_FORMAT)
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+def utc_text(ts) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime(_TS_FORMAT)
+
+# =========================
+# Spatial index
+# =========================
+class GridIndex:
+    """Agents bucketed into cell_deg x cell_deg cells. Not thread-safe; Dispatcher locks around it."""
+    def __init__(self, cell_deg=DISPATCH_CELL_DEG):
+        self.cell = cell_deg
+        self._cells = {}   # (row, col) -> {agent_id: (lat, lon)}
+        self._agents = {}  # agent_id -> (cell, lat, lon, seen)
+
+    def __len__(self):
+        return len(self._agents)
+
+    def _key(self, lat, lon):
+        return math.floor(lat / self.cell), math.floor(lon / self.cell)
+
+    def upsert(self, agent_id, lat, lon, seen):
+        old = self._agents.get(agent_id)
+        if old is not None and old[3] > seen:
+            return  # out-of-order ping
+        key = self._key(lat, lon)
+        if old is not None and old[0] != key:
+            self._drop_from_cell(agent_id, old[0])
+        self._cells.setdefault(key, {})[agent_id] = (lat, lon)
+        self._agents[agent_id] = (key, lat, lon, seen)
+
+    def remove(self, agent_id):
+        old = self._agents.pop(agent_id, None)
+        if old is not None:
+            self._drop_from_cell(agent_id, old[0])
+
+    def _drop_from_cell(self, agent_id, key):
+        bucket = self._cells.get(key)
+        if bucket is not None:
+            bucket.pop(agent_id, None)
+            if not bucket:
+                del self._cells[key]
+
+    def seen(self, agent_id):
+        entry = self._agents.get(agent_id)
+        return entry[3] if entry else None
+
+    def prune(self, older_than):
+        for agent_id in [a for a, entry in self._agents.items() if entry[3] < older_than]:
+            self.remove(agent_id)
+
+    def nearest(self, lat, lon, accept, max_km=DISPATCH_MAX_KM):
+        """
+        (agent_id, km) of the closest agent for which accept(agent_id) is true, or None.
+        Walks rings of cells outwards and stops once no unvisited cell can be closer
+        than the best match so far.
+        """
+        row0, col0 = self._key(lat, lon)
+        # a cell's longitude width shrinks with cos(latitude); use the narrower side as the bound
+        cell_km = self.cell * _KM_PER_DEG * max(0.01, math.cos(math.radians(min(89.0, abs(lat) + self.cell))))
+        max_ring = int(max_km / cell_km) + 1
+        best, best_km = None, max_km
+        for ring in range(max_ring + 1):
+            if best is not None and (ring - 1) * cell_km >= best_km:
+                break
+            for key in self._ring(row0, col0, ring):
+                bucket = self._cells.get(key)
+                if not bucket:
+                    continue
+                for agent_id, (alat, alon) in bucket.items():
+                    km = haversine_km(lat, lon, alat, alon)
+                    if km <= best_km and accept(agent_id):
+                        best, best_km = agent_id, km
+        return (best, best_km) if best is not None else None
+
+    @staticmethod
+    def _ring(row0, col0, ring):
+        if ring == 0:
+            yield row0, col0
+            return
+        for col in range(col0 - ring, col0 + ring + 1):
+            yield row0 - ring, col
+            yield row0 + ring, col
+        for row in range(row0 - ring + 1, row0 + ring):
+            yield row, col0 - ring
+            yield row, col0 + ring
+
+# =========================
+# Location writes
+# =========================
+def _upsert_sql(conn):
+    if is_sqlite_conn(conn):
+        return ("INSERT INTO RIDER_LOCATION (Agent_ID, Latitude, Longitude, Last_Updated) VALUES (%s, %s, %s, %s) "
+                "ON CONFLICT (Agent_ID) DO UPDATE SET Latitude = excluded.Latitude, "
+                "Longitude = excluded.Longitude, Last_Updated = excluded.Last_Updated")
+    return ("INSERT INTO RIDER_LOCATION (Agent_ID, Latitude, Longitude, Last_Updated) VALUES (%s, %s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE Latitude = VALUES(Latitude), "
+            "Longitude = VALUES(Longitude), Last_Updated = VALUES(Last_Updated)")
+
+def save_locations(conn, pings):
+    """
+    Upsert [(agent_id, lat, lon, epoch seconds), ...] into RIDER_LOCATION (caller commits).
+    The time is when the server received the ping: Last_Updated drives other workers'
+    refresh watermark, so a client clock running behind must not date rows into the past.
+    """
+    with conn.cursor() as cur:
+        cur.executemany(_upsert_sql(conn), [(a, lat, lon, utc_text(ts)) for a, lat, lon, ts in pings])
+
+def validate_point(latitude, longitude):
+    """Coerce and range-check a position; raises ValueError."""
+    try:
+        lat, lon = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        raise ValueError("latitude and longitude must be numbers")
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError("latitude/longitude out of range")
+    return lat, lon
+
+def validate_ping(agent_id, latitude, longitude):
+    try:
+        agent_id = int(agent_id)
+    except (TypeError, ValueError):
+        raise ValueError("agent_id must be an integer")
+    return (agent_id,) + validate_point(latitude, longitude)
+
+# =========================
+# Dispatcher
+# =========================
+class Dispatcher:
+    def __init__(self, cell_deg=DISPATCH_CELL_DEG, refresh_seconds=DISPATCH_REFRESH_SECONDS,
+                 stale_seconds=DISPATCH_STALE_SECONDS, hold_seconds=DISPATCH_HOLD_SECONDS):
+        self.index = GridIndex(cell_deg)
+        self.refresh_seconds = refresh_seconds
+        self.stale_seconds = stale_seconds
+        self.hold_seconds = hold_seconds
+        self._busy = frozenset()  # from the database, replaced on every refresh
+        self._held = {}           # agent_id -> expiry (monotonic), assigned by this process
+        self._watermark = None    # newest Last_Updated mirrored so far
+        self._next_refresh = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def ping(self, agent_id, lat, lon, seen=None):
+        """Apply a position to the local index (the caller persists it)."""
+        with self._lock:
+            self.index.upsert(agent_id, lat, lon, seen or time.time())
+
+    def forget(self, agent_id):
+        with self._lock:
+            self.index.remove(agent_id)
+
+    def refresh(self, conn, force=False):
+        if not force and time.monotonic() < self._next_refresh:
+            return
+        if not self._refresh_lock.acquire(blocking=force):
+            return  # another thread is refreshing; use what we have
+        try:
+            self._refresh(conn)
+            self._next_refresh = time.monotonic() + self.refresh_seconds
+        finally:
+            self._refresh_lock.release()
+
+    def _refresh(self, conn):
+        now = time.time()
+        if self._watermark:
+            since = utc_text(utc_timestamp(self._watermark) - DISPATCH_REFRESH_OVERLAP_SECONDS)
+        else:
+            since = utc_text(now - self.stale_seconds)
+        with conn.cursor() as cur:
+            cur.execute("SELECT Agent_ID, Latitude, Longitude, Last_Updated FROM RIDER_LOCATION "
+                        "WHERE Last_Updated >= %s", (since,))
+            locations = cur.fetchall()
+            # any open delivery, however old its date (IX_Delivery_Status covers this)
+            cur.execute(f"""
+                SELECT DISTINCT Agent_ID FROM DELIVERY
+                WHERE Status IS NULL OR Status NOT IN ({", ".join(["%s"] * len(DONE_STATUSES))})
+            """, DONE_STATUSES)
+            busy = {r["Agent_ID"] for r in cur.fetchall()}
+            # IX_Orders_Date keeps this one to recent rows
+            cur.execute("""
+                SELECT o.Agent_ID FROM ORDERS o
+                WHERE o.Order_Date >= %s AND o.Agent_ID IS NOT NULL
+                  AND NOT EXISTS (SELECT 1 FROM DELIVERY d WHERE d.Order_ID = o.Order_ID)
+            """, (utc_text(now - self.hold_seconds),))
+            busy.update(r["Agent_ID"] for r in cur.fetchall())
+        with self._lock:
+            for r in locations:
+                if r["Latitude"] is None or r["Longitude"] is None:
+                    continue
+                seen = utc_timestamp(r["Last_Updated"])
+                self.index.upsert(int(r["Agent_ID"]), float(r["Latitude"]), float(r["Longitude"]), seen)
+                stamp = utc_text(seen)
+                if self._watermark is None or stamp > self._watermark:
+                    self._watermark = stamp
+            self.index.prune(now - self.stale_seconds)
+            self._busy = frozenset(int(a) for a in busy)
+        if self._watermark is None:
+            self._watermark = utc_text(now - self.stale_seconds)
+
+    def _idle_check(self):
+        fresh_after = time.time() - self.stale_seconds
+        now = time.monotonic()
+        busy, held, seen = self._busy, self._held, self.index.seen
+
+        def accept(agent_id):
+            if agent_id in busy or held.get(agent_id, 0) > now:
+                return False
+            return (seen(agent_id) or 0) >= fresh_after
+        return accept
+
+    def nearest(self, lat, lon, max_km=DISPATCH_MAX_KM):
+        """(agent_id, km) of the nearest idle agent, or None. Does not reserve."""
+        with self._lock:
+            return self.index.nearest(lat, lon, self._idle_check(), max_km)
+
+    def claim(self, lat, lon, max_km=DISPATCH_MAX_KM):
+        """Like nearest(), but holds the agent so the next call picks someone else."""
+        with self._lock:
+            found = self.index.nearest(lat, lon, self._idle_check(), max_km)
+            if found:
+                now = time.monotonic()
+                self._held = {a: t for a, t in self._held.items() if t > now}
+                self._held[found[0]] = now + self.hold_seconds
+        return found
+
+    def release(self, agent_id):
+        with self._lock:
+            self._held.pop(agent_id, None)
+
+    def assign(self, conn, restaurant_id):
+        """Nearest idle agent for an order from restaurant_id, or None (no coordinates / nobody nearby)."""
+        with conn.cursor() as cur:
+            cur.execute("SELECT Latitude, Longitude FROM RESTAURANT WHERE Restaurant_ID = %s", (restaurant_id,))
+            row = cur.fetchone()
+        if not row or row["Latitude"] is None or row["Longitude"] is None:
+            return None
+        self.refresh(conn)
+        found = self.claim(float(row["Latitude"]), float(row["Longitude"]))
+        return found[0] if found else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"tracked": len(self.index), "busy": len(self._busy), "held": len(self._held),
+                    "watermark": self._watermark}
+
+dispatcher = Dispatcher()
+
+# =========================
+# Batched location ingestion
+# =========================
+location_pings = Counter("location_pings_total", "Rider location pings by outcome", ("outcome",))
+location_flush_lag = Histogram("location_flush_lag_seconds",
+                               "Age of the oldest pending ping when its batch was committed")
+location_flush_rows = Histogram("location_flush_rows", "Rows upserted per flush",
+                                buckets=(1, 10, 100, 500, 1000, 2000, 5000, 10000, 50000))
+
+class Backpressure(Exception):
+    """Too many pings are waiting to be written; the client should retry later."""
+    def __init__(self, retry_after):
+        super().__init__(f"location backlog full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+class LocationBatcher:
+    """
+    Coalesces pings per Agent_ID in memory (newest wins) and writes them with one
+    upsert batch every LOCATION_FLUSH_SECONDS from a background thread, so a
+    rider pinging every few seconds costs one row write per flush, not per ping.
+    The client's timestamp orders pings; the row is stamped with the receive time.
+    submit() raises Backpressure once LOCATION_MAX_PENDING agents are waiting.
+    """
+    def __init__(self, flush_seconds=LOCATION_FLUSH_SECONDS, max_pending=LOCATION_MAX_PENDING,
+                 batch_size=LOCATION_FLUSH_BATCH, index=dispatcher):
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.index = index
+        self._pending = {}    # agent_id -> (lat, lon, seen, received)
+        self._oldest = None   # monotonic time the oldest pending ping arrived
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.last_flush = None
+
+    def submit(self, pings):
+        """Queue [(agent_id, lat, lon, seen), ...]; returns how many were accepted."""
+        self._ensure_thread()
+        with self._lock:
+            new_agents = len({p[0] for p in pings} - self._pending.keys())
+            if len(self._pending) + new_agents > self.max_pending:
+                location_pings.inc(len(pings), "rejected")
+                raise Backpressure(max(1, round(self.flush_seconds)))
+            if not self._pending:
+                self._oldest = time.monotonic()
+            coalesced, received = 0, time.time()
+            for agent_id, lat, lon, seen in pings:
+                current = self._pending.get(agent_id)
+                if current is not None:
+                    coalesced += 1
+                    if current[2] > seen:
+                        continue
+                self._pending[agent_id] = (lat, lon, seen, received)
+            full = len(self._pending) >= self.batch_size
+        for agent_id, lat, lon, seen in pings:
+            self.index.ping(agent_id, lat, lon, seen)
+        location_pings.inc(len(pings) - coalesced, "accepted")
+        if coalesced:
+            location_pings.inc(coalesced, "coalesced")
+        if full:
+            self._wake.set()
+        return len(pings)
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def flush(self) -> int:
+        """Write everything pending now; returns the number of rows upserted."""
+        with self._flush_lock:
+            with self._lock:
+                batch, oldest = self._pending, self._oldest
+                self._pending, self._oldest = {}, None
+            if not batch:
+                return 0
+            rows = [(agent_id, lat, lon, received) for agent_id, (lat, lon, _, received) in batch.items()]
+            try:
+                written = self._write(rows)
+            except Exception as e:
+                print(f"Error flushing rider locations: {e}")
+                self._requeue(batch, oldest)
+                return 0
+            location_flush_lag.observe(time.monotonic() - oldest)
+            location_flush_rows.observe(written)
+            self.last_flush = time.time()
+            return written
+
+    def _write(self, rows):
+        with get_conn() as conn:
+            try:
+                with transaction(conn):
+                    save_locations(conn, rows)
+                return len(rows)
+            except (sqlite3.IntegrityError, pymysql.err.IntegrityError):
+                pass
+            # an unknown Agent_ID broke the batch: write the rest one by one
+            written = 0
+            for row in rows:
+                try:
+                    with transaction(conn):
+                        save_locations(conn, [row])
+                    written += 1
+                except (sqlite3.IntegrityError, pymysql.err.IntegrityError):
+                    location_pings.inc(1, "unknown_agent")
+                    self.index.forget(row[0])
+            return written
+
+    def _requeue(self, batch, oldest):
+        """Put a failed batch back without overwriting newer pings that arrived meanwhile."""
+        with self._lock:
+            for agent_id, entry in batch.items():
+                current = self._pending.get(agent_id)
+                if current is None or current[2] < entry[2]:
+                    self._pending[agent_id] = entry
+            if self._pending:
+                self._oldest = min(t for t in (oldest, self._oldest) if t is not None)
+
+    def _ensure_thread(self):
+        # gunicorn forks after import, so start (or restart) the flusher per process
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._pending, self._oldest = {}, None
+            self._thread = threading.Thread(target=self._run, name="location-flusher", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            self.flush()
+
+location_batcher = LocationBatcher()
+atexit.register(location_batcher.flush)
+
+@register_collector
+def _location_gauges():
+    yield "location_pending_agents", "Agents with a ping waiting to be flushed", location_batcher.pending()
@@ -0,0 +1,212 @@
+# events.py
+"""
+Live order/delivery events for dashboards, streamed as Server-Sent Events at /events.
+
+Routes call publish() after their write commits. The broker fans events out to
+the subscriber queues of this process; how events get from one worker to the
+others is up to the backend (EVENTS_BACKEND):
+
+  local  - in-process only; fine for a single worker or the dev server
+  db     - events are appended to EVENT_LOG and every worker polls it, so all
+           workers see all events (and reconnecting clients can resume via
+           Last-Event-ID)
+
+Other backends (e.g. Redis pub/sub) can be added with register_backend().
+Delivery is best effort: a subscriber whose queue is full drops events.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from db import get_conn
+
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "local")
+EVENTS_POLL_SECONDS = float(os.getenv("EVENTS_POLL_SECONDS", "0.5"))
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "1000"))
+EVENTS_KEEP = int(os.getenv("EVENTS_KEEP", "10000"))  # EVENT_LOG rows kept for resuming clients
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+# Streams end after this long and the browser reconnects, so a worker thread is never held forever.
+EVENTS_STREAM_SECONDS = float(os.getenv("EVENTS_STREAM_SECONDS", "300"))
+
+class Event:
+    __slots__ = ("id", "type", "data")
+
+    def __init__(self, id, type, data):
+        self.id, self.type, self.data = id, type, data
+
+    def encode(self) -> str:
+        return f"id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.data, default=str)}\n\n"
+
+# =========================
+# Backends
+# =========================
+class LocalBackend:
+    """Events never leave the process."""
+    def __init__(self):
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def start(self, deliver):
+        self._deliver = deliver
+
+    def publish(self, type, data):
+        with self._lock:
+            self._next_id += 1
+            event = Event(self._next_id, type, data)
+        self._deliver(event)
+
+    def since(self, last_id):
+        return []  # no history to replay
+
+class DatabaseBackend:
+    """EVENT_LOG as a shared append-only log; one poller thread per process delivers new rows."""
+    def __init__(self, poll_seconds=EVENTS_POLL_SECONDS, keep=EVENTS_KEEP):
+        self.poll_seconds = poll_seconds
+        self.keep = keep
+        self._last_id = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self, deliver):
+        self._deliver = deliver
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._last_id = None
+            self._thread = threading.Thread(target=self._run, name="event-poller", daemon=True)
+            self._thread.start()
+
+    def publish(self, type, data):
+        with get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("INSERT INTO EVENT_LOG (Event_Type, Payload, Created_At) VALUES (%s, %s, %s)",
+                            (type, json.dumps(data, default=str), datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")))
+            conn.commit()
+
+    def since(self, last_id):
+        with get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT Event_ID, Event_Type, Payload FROM EVENT_LOG WHERE Event_ID > %s "
+                            "ORDER BY Event_ID LIMIT %s", (last_id, self.keep))
+                rows = cur.fetchall()
+        return [Event(r["Event_ID"], r["Event_Type"], json.loads(r["Payload"])) for r in rows]
+
+    def _run(self):
+        polls = 0
+        while True:
+            try:
+                if self._last_id is None:
+                    self._last_id = self._max_id()  # only events published from now on
+                for event in self.since(self._last_id):
+                    self._last_id = event.id
+                    self._deliver(event)
+                polls += 1
+                if polls % 600 == 0:
+                    self._prune()
+            except Exception as e:
+                print(f"Error polling EVENT_LOG: {e}")
+            time.sleep(self.poll_seconds)
+
+    def _max_id(self):
+        with get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT MAX(Event_ID) AS m FROM EVENT_LOG")
+                row = cur.fetchone()
+        return (row or {}).get("m") or 0
+
+    def _prune(self):
+        with get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM EVENT_LOG WHERE Event_ID <= %s", (self._last_id - self.keep,))
+            conn.commit()
+
+BACKENDS = {"local": LocalBackend, "db": DatabaseBackend}
+
+def register_backend(name, factory):
+    """factory() -> object with start(deliver), publish(type, data) and since(last_id)."""
+    BACKENDS[name] = factory
+
+# =========================
+# Broker
+# =========================
+class EventBroker:
+    def __init__(self, backend=None):
+        self._backend = backend
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            if EVENTS_BACKEND not in BACKENDS:
+                raise ValueError(f"Unknown EVENTS_BACKEND {EVENTS_BACKEND!r}; expected one of {', '.join(BACKENDS)}")
+            self._backend = BACKENDS[EVENTS_BACKEND]()
+        return self._backend
+
+    def publish(self, type, **data):
+        """Broadcast an event; never raises into the calling route."""
+        try:
+            self.backend.start(self._fanout)
+            self.backend.publish(type, data)
+        except Exception as e:
+            print(f"Error publishing event {type}: {e}")
+
+    def _fanout(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                self.dropped += 1
+
+    def subscribe(self, last_id=None):
+        """A queue receiving every event from now on (plus missed ones after last_id, if the backend keeps history)."""
+        self.backend.start(self._fanout)
+        q = queue.Queue(maxsize=EVENTS_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add(q)
+        if last_id is not None:
+            for event in self.backend.since(last_id)[:EVENTS_QUEUE_SIZE]:
+                q.put_nowait(event)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def stats(self) -> dict:
+        return {"backend": EVENTS_BACKEND, "subscribers": len(self._subscribers), "dropped": self.dropped}
+
+broker = EventBroker()
+publish = broker.publish
+
+def sse_stream(broker, types=(), last_id=None, seconds=None):
+    """
+    text/event-stream chunks for one client; types filters on the part before the dot ("order", "delivery").
+    Ends after `seconds` (default EVENTS_STREAM_SECONDS).
+    """
+    q = broker.subscribe(last_id)
+    deadline = time.monotonic() + (EVENTS_STREAM_SECONDS if seconds is None else seconds)
+    last_sent = 0
+    try:
+        yield "retry: 3000\n\n"
+        while time.monotonic() < deadline:
+            try:
+                event = q.get(timeout=min(EVENTS_HEARTBEAT_SECONDS, max(0.01, deadline - time.monotonic())))
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            if event.id <= last_sent:
+                continue  # replayed and polled copies of the same event
+            last_sent = event.id
+            if not types or event.type.split(".")[0] in types:
+                yield event.encode()
+    finally:
+        broker.unsubscribe(q)
@@ -0,0 +1,144 @@
+# export.py
+"""
+Streaming CSV/JSONL export of orders, order details, deliveries and payments.
+
+Rows are read with an unbuffered server-side cursor on MySQL (SSDictCursor) and
+incremental fetchmany() on SQLite, and written out one batch at a time, so memory
+use does not grow with the size of the export.
+"""
+import csv
+import io
+import json
+import os
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import pymysql
+
+from db import get_conn, is_sqlite_conn
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# name -> (SELECT ... FROM ..., date column for ?start/?end, ORDER BY)
+# Each ORDER BY follows an index so MySQL can stream without a filesort.
+DATASETS = {
+    "orders": (
+        "SELECT o.Order_ID, o.Customer_ID, o.Restaurant_ID, o.Order_Date, o.Total_Amount, o.Agent_ID FROM ORDERS o",
+        "o.Order_Date", "o.Order_Date, o.Order_ID",
+    ),
+    "order_details": (
+        """SELECT od.Order_ID, od.Item_ID, f.Name AS Item_Name, f.Price, od.Quantity, o.Order_Date
+           FROM ORDER_DETAIL od
+           JOIN FOOD_ITEM f ON od.Item_ID = f.Item_ID
+           JOIN ORDERS o ON od.Order_ID = o.Order_ID""",
+        "o.Order_Date", "od.Order_ID, od.Item_ID",
+    ),
+    "deliveries": (
+        "SELECT d.Delivery_ID, d.Order_ID, d.Agent_ID, d.Delivery_Date, d.Status FROM DELIVERY d",
+        "d.Delivery_Date", "d.Delivery_Date, d.Delivery_ID",
+    ),
+    "payments": (
+        "SELECT p.Payment_ID, p.Order_ID, p.Amount, p.Payment_Method, p.Payment_Date FROM PAYMENT p",
+        "p.Payment_Date", "p.Payment_ID",
+    ),
+}
+
+FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+class ExportError(ValueError):
+    """Unknown dataset/format or a malformed date filter."""
+
+def _parse_day(value, name):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise ExportError(f"{name} must be YYYY-MM-DD")
+
+def build_query(dataset, start=None, end=None):
+    """SQL and params for one dataset; start and end are inclusive YYYY-MM-DD days."""
+    if dataset not in DATASETS:
+        raise ExportError(f"unknown dataset {dataset!r}; expected one of {', '.join(DATASETS)}")
+    select, date_col, order_by = DATASETS[dataset]
+    start, end = _parse_day(start, "start"), _parse_day(end, "end")
+    where, params = [], []
+    if start:
+        where.append(f"{date_col} >= %s")
+        params.append(start.isoformat())
+    if end:
+        where.append(f"{date_col} < %s")
+        params.append((end + timedelta(days=1)).isoformat())
+    sql = select + (" WHERE " + " AND ".join(where) if where else "") + f" ORDER BY {order_by}"
+    return sql, tuple(params)
+
+def _plain(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+def stream_export(dataset, fmt="csv", start=None, end=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Generator of text chunks (one per batch of rows). Validates arguments eagerly,
+    holds one connection for the life of the stream.
+    """
+    if fmt not in FORMATS:
+        raise ExportError(f"unknown format {fmt!r}; expected csv or jsonl")
+    sql, params = build_query(dataset, start, end)
+    return _stream(sql, params, fmt, batch_size)
+
+def _stream(sql, params, fmt, batch_size):
+    with get_conn(readonly=True) as conn:
+        sqlite = is_sqlite_conn(conn)
+        reset_timeout = False
+        if sqlite:
+            cur = conn.cursor()
+        else:
+            # a slow client must not trip the server's write timeout mid-stream
+            with conn.cursor() as setup:
+                setup.execute("SET SESSION net_write_timeout = 3600")
+            reset_timeout = True
+            cur = conn.cursor(pymysql.cursors.SSDictCursor)
+        try:
+            cur.execute(sql, params)
+            columns = [d[0] for d in cur.description]
+            buf = io.StringIO()
+            writer = csv.writer(buf) if fmt == "csv" else None
+            if writer:
+                writer.writerow(columns)
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    if writer:
+                        writer.writerow([_plain(row[c]) for c in columns])
+                    else:
+                        buf.write(json.dumps({c: _plain(row[c]) for c in columns}, separators=(",", ":")))
+                        buf.write("\n")
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+            if buf.tell():
+                yield buf.getvalue()
+        except GeneratorExit:
+            # Client went away: closing an unbuffered MySQL cursor would first read
+            # every remaining row, so drop the connection instead.
+            if not sqlite:
+                conn.discard()
+                reset_timeout = False
+            raise
+        finally:
+            try: cur.close()
+            except Exception: pass
+            if reset_timeout:
+                # the connection goes back to the pool; the next borrower gets the server default
+                try:
+                    with conn.cursor() as reset:
+                        reset.execute("SET SESSION net_write_timeout = DEFAULT")
+                except Exception:
+                    conn.discard()
@@ -0,0 +1,23 @@
+# gunicorn.conf.py
+# Schema/bootstrap runs once in the master before workers are forked, so the
+# first user request on a fresh worker doesn't pay for DDL and sample-data inserts.
+
+import os
+
+def on_starting(server):
+    from app import init_db
+    try:
+        init_db()
+    except Exception as e:
+        # workers fall back to retrying from app._ensure_schema_fallback
+        server.log.error(f"Schema initialization error: {e}")
+
+def post_fork(server, worker):
+    # connections opened by the master during init_db must not be shared with workers
+    from db import reset_pool
+    reset_pool()
+
+# /events holds a connection open per dashboard, so serve requests from threads
+# instead of one-request-at-a-time sync workers.
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", "16"))
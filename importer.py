@@ -0,0 +1,234 @@
+# importer.py
+"""
+Bulk import of restaurants, food items and customers from CSV or JSONL.
+
+Records are streamed from the file, validated one by one, and inserted in
+chunks of IMPORT_CHUNK_SIZE rows with one executemany per transaction. If a
+chunk fails in the database (e.g. a foreign key), its rows are retried one at
+a time so only the offending rows are reported and the rest still land.
+
+A row whose natural key (e.g. a food item's restaurant and name) is already in
+the table, or earlier in the same file, is skipped rather than inserted again,
+so re-running an import after a partial failure only adds what is missing.
+"""
+import csv
+import json
+import os
+import sqlite3
+import time
+
+import pymysql
+
+from cache import invalidate
+from db import transaction
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+MAX_REPORTED_ERRORS = 1000
+
+_DB_ERRORS = (sqlite3.DatabaseError, pymysql.err.MySQLError)
+
+class ImportDataError(ValueError):
+    """Unknown entity or file format."""
+
+# =========================
+# Row validation
+# =========================
+def _text(record, *keys, required=False, label=None):
+    for key in keys:
+        value = record.get(key)
+        if value not in (None, ""):
+            return str(value).strip()
+    if required:
+        raise ValueError(f"{label or keys[0]} is required")
+    return None
+
+def _coordinate(record, key, limit):
+    value = _text(record, key, "lat" if key == "latitude" else "lng")
+    if value is None:
+        return None
+    try:
+        value = float(value)
+    except ValueError:
+        raise ValueError(f"{key} must be a number")
+    if not -limit <= value <= limit:
+        raise ValueError(f"{key} out of range")
+    return value
+
+def _restaurant(record, ctx):
+    return (_text(record, "name", "restaurant_name", required=True),
+            _text(record, "address", "location"),
+            _text(record, "phone", "contact_number"),
+            _text(record, "opening_hours", "hours"),
+            _coordinate(record, "latitude", 90),
+            _coordinate(record, "longitude", 180))
+
+def _customer(record, ctx):
+    return (_text(record, "name", "customer_name", required=True),
+            _text(record, "email"),
+            _text(record, "phone"),
+            _text(record, "address"))
+
+def _food_item(record, ctx):
+    name = _text(record, "name", "item_name", required=True)
+    price = _text(record, "price", required=True)
+    try:
+        price = float(price)
+    except ValueError:
+        raise ValueError("price must be a number")
+    if price < 0:
+        raise ValueError("price must not be negative")
+    restaurant_id = _text(record, "restaurant_id")
+    if restaurant_id is None:
+        restaurant = _text(record, "restaurant", "restaurant_name", required=True, label="restaurant_id or restaurant")
+        restaurant_id = ctx.restaurant_ids().get(restaurant)
+        if restaurant_id is None:
+            raise ValueError(f"unknown restaurant {restaurant!r}")
+    try:
+        restaurant_id = int(restaurant_id)
+    except ValueError:
+        raise ValueError("restaurant_id must be an integer")
+    return (name, price, restaurant_id)
+
+# entity -> (table, columns in validator order, natural key columns, validator)
+ENTITIES = {
+    "restaurants": ("RESTAURANT", ("Name", "Address", "Phone", "Opening_Hours", "Latitude", "Longitude"),
+                    ("Name", "Address"), _restaurant),
+    "customers": ("CUSTOMER", ("Name", "Email", "Phone", "Address"), ("Name", "Email", "Phone"), _customer),
+    "food_items": ("FOOD_ITEM", ("Name", "Price", "Restaurant_ID"), ("Restaurant_ID", "Name"), _food_item),
+}
+
+class _Context:
+    """Lookups shared by all rows of one import (loaded on first use)."""
+    def __init__(self, conn):
+        self._conn = conn
+        self._restaurants = None
+        self._keys = None
+
+    def seen(self, table, key_columns, key) -> bool:
+        """True if `key` is already in the table or earlier in this import; remembers it otherwise."""
+        if self._keys is None:
+            with self._conn.cursor() as cur:
+                cur.execute(f"SELECT {', '.join(key_columns)} FROM {table}")
+                self._keys = {tuple(r[c] for c in key_columns) for r in cur.fetchall()}
+        if key in self._keys:
+            return True
+        self._keys.add(key)
+        return False
+
+    def restaurant_ids(self):
+        if self._restaurants is None:
+            with self._conn.cursor() as cur:
+                cur.execute("SELECT Restaurant_ID, Name FROM RESTAURANT ORDER BY Restaurant_ID DESC")
+                # lowest id wins for duplicate names
+                self._restaurants = {r["Name"]: r["Restaurant_ID"] for r in cur.fetchall()}
+        return self._restaurants
+
+# =========================
+# Readers
+# =========================
+def read_records(stream, fmt):
+    """Yield (line_number, record dict or exception) from a text stream."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, {(k or "").strip().lower(): v for k, v in record.items()}
+    elif fmt == "jsonl":
+        for line_no, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_no, ValueError(f"invalid JSON: {e}")
+                continue
+            if not isinstance(record, dict):
+                yield line_no, ValueError("each line must be a JSON object")
+                continue
+            yield line_no, {str(k).lower(): v for k, v in record.items()}
+    else:
+        raise ImportDataError(f"unknown format {fmt!r}; expected csv or jsonl")
+
+def format_for(filename, default="csv"):
+    ext = os.path.splitext(filename or "")[1].lower().lstrip(".")
+    return {"csv": "csv", "jsonl": "jsonl", "ndjson": "jsonl"}.get(ext, default)
+
+# =========================
+# Import
+# =========================
+class ImportReport:
+    def __init__(self, entity):
+        self.entity = entity
+        self.rows_read = 0
+        self.inserted = 0
+        self.skipped = 0  # already in the table (or earlier in the file)
+        self.error_count = 0
+        self.errors = []  # (line, message), first MAX_REPORTED_ERRORS only
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    def error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    def to_dict(self) -> dict:
+        return {
+            "entity": self.entity,
+            "rows_read": self.rows_read,
+            "inserted": self.inserted,
+            "skipped": self.skipped,
+            "failed": self.error_count,
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": round(self.inserted / self.seconds, 1) if self.seconds else None,
+            "errors": [{"line": line, "error": message} for line, message in self.errors],
+        }
+
+def import_records(conn, entity, records, chunk_size=IMPORT_CHUNK_SIZE):
+    if entity not in ENTITIES:
+        raise ImportDataError(f"unknown entity {entity!r}; expected one of {', '.join(ENTITIES)}")
+    table, columns, key_columns, validate = ENTITIES[entity]
+    insert_sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    key_at = [columns.index(c) for c in key_columns]
+    ctx = _Context(conn)
+    report = ImportReport(entity)
+    batch = []
+    for line_no, record in records:
+        report.rows_read += 1
+        if isinstance(record, Exception):
+            report.error(line_no, str(record))
+            continue
+        try:
+            values = validate(record, ctx)
+        except ValueError as e:
+            report.error(line_no, str(e))
+            continue
+        if ctx.seen(table, key_columns, tuple(values[i] for i in key_at)):
+            report.skipped += 1
+            continue
+        batch.append((line_no, values))
+        if len(batch) >= chunk_size:
+            _flush(conn, insert_sql, batch, report)
+            batch = []
+    if batch:
+        _flush(conn, insert_sql, batch, report)
+    report.seconds = time.perf_counter() - report.started
+    if report.inserted:
+        invalidate(table)
+    return report
+
+def _flush(conn, insert_sql, batch, report):
+    try:
+        with transaction(conn), conn.cursor() as cur:
+            cur.executemany(insert_sql, [values for _, values in batch])
+        report.inserted += len(batch)
+        return
+    except _DB_ERRORS:
+        pass
+    # Chunk rolled back: find the bad rows without losing the good ones.
+    for line_no, values in batch:
+        try:
+            with conn.cursor() as cur:
+                cur.execute(insert_sql, values)
+            report.inserted += 1
+        except _DB_ERRORS as e:
+            report.error(line_no, str(e))
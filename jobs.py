@@ -0,0 +1,227 @@
+# jobs.py
+"""
+Database-backed job queue for work that should not run inside a request.
+
+Routes call enqueue(conn, "task_name", payload) on their own connection, so the
+job row commits (or rolls back) together with the write that caused it. A
+worker process (`flask jobs-worker`) claims due jobs with a conditional UPDATE
+-- only one worker sees rowcount 1 for a given job -- and runs them on a thread
+pool. A claim is a lease: if the worker dies, the job becomes claimable again
+once Locked_Until passes (JOB_VISIBILITY_SECONDS). Failures are retried with
+exponential backoff until Max_Attempts, then left as 'failed' with Last_Error.
+
+Tasks are plain functions registered with @task("name"); they receive
+(conn, payload) and may raise RetryLater to be retried without it counting as an error.
+"""
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from db import get_conn
+from metrics import Counter, Histogram
+
+JOB_WORKER_THREADS = int(os.getenv("JOB_WORKER_THREADS", "4"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+JOB_VISIBILITY_SECONDS = int(os.getenv("JOB_VISIBILITY_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "5"))
+JOB_KEEP_DONE_HOURS = float(os.getenv("JOB_KEEP_DONE_HOURS", "24"))
+
+_TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+jobs_processed = Counter("jobs_processed_total", "Jobs run by this worker", ("task", "outcome"))
+job_latency = Histogram("job_seconds", "Job run time", labelnames=("task",))
+
+class RetryLater(Exception):
+    """Raised by a task that cannot make progress yet; the job is rescheduled."""
+    def __init__(self, message="retry later", delay=None):
+        super().__init__(message)
+        self.delay = delay
+
+def _ts(seconds_from_now=0.0) -> str:
+    return (datetime.utcnow() + timedelta(seconds=seconds_from_now)).strftime(_TS_FORMAT)
+
+# =========================
+# Task registry
+# =========================
+TASKS = {}
+
+def task(name):
+    def register(fn):
+        TASKS[name] = fn
+        return fn
+    return register
+
+# =========================
+# Producer side
+# =========================
+def enqueue(conn, name, payload=None, delay=0, max_attempts=JOB_MAX_ATTEMPTS):
+    """Insert a job on the caller's connection (the caller commits). Returns the Job_ID."""
+    now = _ts()
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO JOB (Task, Payload, Status, Attempts, Max_Attempts, Run_At, Created_At)
+            VALUES (%s, %s, 'queued', 0, %s, %s, %s)
+        """, (name, _payload(payload), max_attempts, _ts(delay) if delay else now, now))
+        return cur.lastrowid
+
+def enqueue_once(conn, name, payload=None, delay=0, max_attempts=JOB_MAX_ATTEMPTS):
+    """enqueue() unless an identical job is still waiting to run; returns the new or existing Job_ID."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT Job_ID FROM JOB WHERE Status = 'queued' AND Task = %s AND Payload = %s LIMIT 1",
+                    (name, _payload(payload)))
+        row = cur.fetchone()
+    if row:
+        return row["Job_ID"]
+    return enqueue(conn, name, payload, delay, max_attempts)
+
+def _payload(payload) -> str:
+    return json.dumps(payload or {}, default=str, sort_keys=True)
+
+def job_counts(conn) -> dict:
+    with conn.cursor() as cur:
+        cur.execute("SELECT Status, COUNT(*) AS n FROM JOB GROUP BY Status")
+        return {r["Status"]: int(r["n"]) for r in cur.fetchall()}
+
+# =========================
+# Worker side
+# =========================
+def claim(conn, worker_id, limit):
+    """Lease up to `limit` due jobs for worker_id; returns their rows."""
+    now = _ts()
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT Job_ID FROM JOB
+            WHERE (Status = 'queued' AND Run_At <= %s) OR (Status = 'running' AND Locked_Until < %s)
+            ORDER BY Run_At, Job_ID
+            LIMIT %s
+        """, (now, now, limit))
+        candidates = [r["Job_ID"] for r in cur.fetchall()]
+        claimed = []
+        for job_id in candidates:
+            cur.execute("""
+                UPDATE JOB SET Status = 'running', Locked_By = %s, Locked_Until = %s, Attempts = Attempts + 1
+                WHERE Job_ID = %s
+                  AND ((Status = 'queued' AND Run_At <= %s) OR (Status = 'running' AND Locked_Until < %s))
+            """, (worker_id, _ts(JOB_VISIBILITY_SECONDS), job_id, now, now))
+            if cur.rowcount == 1:
+                claimed.append(job_id)
+        conn.commit()
+        if not claimed:
+            return []
+        placeholders = ", ".join(["%s"] * len(claimed))
+        cur.execute(f"SELECT Job_ID, Task, Payload, Attempts, Max_Attempts FROM JOB WHERE Job_ID IN ({placeholders})",
+                    tuple(claimed))
+        return cur.fetchall()
+
+def prune(conn):
+    """Drop finished jobs older than JOB_KEEP_DONE_HOURS (failed ones are kept for inspection)."""
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM JOB WHERE Status = 'done' AND Finished_At < %s", (_ts(-JOB_KEEP_DONE_HOURS * 3600),))
+    conn.commit()
+
+def _finish(conn, job, worker_id, error=None, retry_delay=None):
+    """Mark a leased job done, rescheduled or failed; a lost lease (another worker took over) is a no-op."""
+    with conn.cursor() as cur:
+        if error is None:
+            cur.execute("""
+                UPDATE JOB SET Status = 'done', Locked_Until = NULL, Finished_At = %s, Last_Error = NULL
+                WHERE Job_ID = %s AND Locked_By = %s AND Status = 'running'
+            """, (_ts(), job["Job_ID"], worker_id))
+        elif retry_delay is not None:
+            cur.execute("""
+                UPDATE JOB SET Status = 'queued', Locked_Until = NULL, Run_At = %s, Last_Error = %s
+                WHERE Job_ID = %s AND Locked_By = %s AND Status = 'running'
+            """, (_ts(retry_delay), error[:2000], job["Job_ID"], worker_id))
+        else:
+            cur.execute("""
+                UPDATE JOB SET Status = 'failed', Locked_Until = NULL, Finished_At = %s, Last_Error = %s
+                WHERE Job_ID = %s AND Locked_By = %s AND Status = 'running'
+            """, (_ts(), error[:2000], job["Job_ID"], worker_id))
+    conn.commit()
+
+def run_job(job, worker_id):
+    name = job["Task"]
+    attempts, max_attempts = int(job["Attempts"]), int(job["Max_Attempts"])
+    backoff = JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+    t0 = time.perf_counter()
+    with get_conn() as conn:
+        try:
+            fn = TASKS.get(name)
+            if fn is None:
+                attempts = max_attempts  # not retryable in this deployment
+                raise LookupError(f"Unknown task {name!r}")
+            fn(conn, json.loads(job["Payload"] or "{}"))
+            conn.commit()
+        except RetryLater as e:
+            conn.rollback()
+            outcome = "retry" if attempts < max_attempts else "failed"
+            _finish(conn, job, worker_id, str(e), (e.delay or backoff) if attempts < max_attempts else None)
+        except Exception as e:
+            conn.rollback()
+            print(f"Error in job {job['Job_ID']} ({name}), attempt {attempts}/{max_attempts}: {e}")
+            traceback.print_exc()
+            outcome = "retry" if attempts < max_attempts else "failed"
+            _finish(conn, job, worker_id, f"{type(e).__name__}: {e}", backoff if attempts < max_attempts else None)
+        else:
+            outcome = "done"
+            _finish(conn, job, worker_id)
+    jobs_processed.inc(1, name, outcome)
+    job_latency.observe(time.perf_counter() - t0, name)
+    return outcome
+
+class Worker:
+    def __init__(self, threads=JOB_WORKER_THREADS, poll_seconds=JOB_POLL_SECONDS):
+        self.threads = threads
+        self.poll_seconds = poll_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._slots = threading.BoundedSemaphore(threads)
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self, once=False):
+        """Claim and run jobs until stop() (or, with once=True, until nothing is due)."""
+        print(f"Job worker {self.worker_id} started with {self.threads} threads")
+        next_prune = 0.0
+        with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="job") as pool:
+            while not self._stop.is_set():
+                if time.monotonic() >= next_prune:
+                    next_prune = time.monotonic() + 3600
+                    try:
+                        with get_conn() as conn:
+                            prune(conn)
+                    except Exception as e:
+                        print(f"Error pruning jobs: {e}")
+                free = 0
+                while self._slots.acquire(blocking=False):
+                    free += 1
+                try:
+                    with get_conn() as conn:
+                        jobs = claim(conn, self.worker_id, free) if free else []
+                except Exception as e:
+                    print(f"Error claiming jobs: {e}")
+                    jobs = []
+                for _ in range(free - len(jobs)):
+                    self._slots.release()
+                for job in jobs:
+                    pool.submit(self._run_one, job)
+                if once and not jobs and free == self.threads:
+                    break
+                if not jobs:
+                    self._stop.wait(self.poll_seconds)
+
+    def _run_one(self, job):
+        try:
+            run_job(job, self.worker_id)
+        except Exception as e:
+            print(f"Error finishing job {job['Job_ID']}: {e}")
+        finally:
+            self._slots.release()
@@ -0,0 +1,214 @@
+# metrics.py
+"""
+In-process metrics with Prometheus text exposition (served at /metrics by app.py).
+
+Every cursor handed out by db.get_conn() is wrapped in InstrumentedCursor, which
+counts queries and fetched rows per route, times each statement, and prints
+statements slower than SLOW_QUERY_MS. Each gunicorn worker keeps its own numbers.
+"""
+import os
+import threading
+import time
+from functools import lru_cache
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+# =========================
+# Metric types
+# =========================
+_registry = []
+_collectors = []
+
+def _fmt_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (extra or [])
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def expose(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_fmt_labels(self.labelnames, labels)} {value}"
+
+class Histogram:
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def expose(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f"{self.name}_bucket{_fmt_labels(self.labelnames, labels, [('le', bound)])} {cumulative}"
+            yield f"{self.name}_bucket{_fmt_labels(self.labelnames, labels, [('le', '+Inf')])} {series[-1]}"
+            yield f"{self.name}_sum{_fmt_labels(self.labelnames, labels)} {series[-2]}"
+            yield f"{self.name}_count{_fmt_labels(self.labelnames, labels)} {series[-1]}"
+
+def register_collector(fn):
+    """fn() -> iterable of (name, help, value) gauges, evaluated at scrape time."""
+    _collectors.append(fn)
+    return fn
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.expose())
+    for fn in _collectors:
+        try:
+            gauges = list(fn())
+        except Exception as e:
+            print(f"Error in metrics collector: {e}")
+            continue
+        for name, help, value in gauges:
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
+
+# =========================
+# Standard metrics
+# =========================
+http_requests = Counter("http_requests_total", "HTTP requests", ("route", "status"))
+http_latency = Histogram("http_request_seconds", "HTTP request latency", labelnames=("route",))
+db_queries = Counter("db_queries_total", "SQL statements executed", ("route", "verb"))
+db_query_latency = Histogram("db_query_seconds", "SQL statement latency", labelnames=("verb",))
+db_rows = Counter("db_rows_fetched_total", "Rows fetched from cursors", ("route",))
+db_queries_per_request = Histogram("db_queries_per_request", "SQL statements per HTTP request",
+                                   buckets=COUNT_BUCKETS, labelnames=("route",))
+db_checkout_latency = Histogram("db_checkout_seconds", "Time to obtain a connection from get_conn()")
+db_slow_queries = Counter("db_slow_queries_total", "Statements slower than SLOW_QUERY_MS", ("route",))
+
+# =========================
+# Request scope
+# =========================
+_scope = threading.local()
+
+def current_route() -> str:
+    return getattr(_scope, "route", None) or "background"
+
+def begin_request(route):
+    _scope.route = route
+    _scope.queries = 0
+    _scope.started = time.perf_counter()
+
+def end_request(status):
+    route = getattr(_scope, "route", None)
+    if route is None:
+        return
+    observe_request(route, status, time.perf_counter() - _scope.started, _scope.queries)
+    _scope.route = None
+
+def observe_request(route, status, seconds, queries):
+    """Record one finished request; asgi.py calls this directly for its coroutine handlers."""
+    http_requests.inc(1, route, str(status))
+    http_latency.observe(seconds, route)
+    db_queries_per_request.observe(queries, route)
+
+# =========================
+# Cursor instrumentation
+# =========================
+@lru_cache(maxsize=1024)
+def _verb(query) -> str:
+    head = query.lstrip().split(None, 1)
+    return head[0].upper() if head else "OTHER"
+
+def _record(query, elapsed):
+    route = current_route()
+    verb = _verb(query)
+    db_queries.inc(1, route, verb)
+    db_query_latency.observe(elapsed, verb)
+    if getattr(_scope, "route", None) is not None:
+        _scope.queries += 1
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        db_slow_queries.inc(1, route)
+        print(f"Slow query ({elapsed * 1000:.1f} ms) [{route}]: {' '.join(query.split())[:500]}")
+
+class InstrumentedCursor:
+    """Wraps a DB-API cursor; times statements and counts rows. Everything else passes through."""
+    def __init__(self, cur):
+        self._cur = cur
+
+    def __enter__(self): return self
+    def __exit__(self, exc_type, exc, tb):
+        try: self._cur.close()
+        except Exception: pass
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+    def execute(self, query, params=None):
+        t0 = time.perf_counter()
+        try:
+            return self._cur.execute(query, params)
+        finally:
+            _record(query, time.perf_counter() - t0)
+
+    def executemany(self, query, seq_of_params):
+        t0 = time.perf_counter()
+        try:
+            return self._cur.executemany(query, seq_of_params)
+        finally:
+            _record(query, time.perf_counter() - t0)
+
+    def fetchone(self):
+        row = self._cur.fetchone()
+        if row is not None:
+            db_rows.inc(1, current_route())
+        return row
+
+    def fetchall(self):
+        rows = self._cur.fetchall()
+        db_rows.inc(len(rows), current_route())
+        return rows
+
+    def fetchmany(self, size=None):
+        rows = self._cur.fetchmany(size) if size else self._cur.fetchmany()
+        db_rows.inc(len(rows), current_route())
+        return rows
+
+def instrument_cursor(cur):
+    return InstrumentedCursor(cur) if METRICS_ENABLED else cur
+
+def observe_checkout(seconds):
+    if METRICS_ENABLED:
+        db_checkout_latency.observe(seconds)
@@ -0,0 +1,123 @@
+# orders.py
+from datetime import datetime
+from decimal import Decimal
+
+from analytics import touch_order
+from cache import invalidate
+from coupons import CouponError, coupon_index, discount_amount, redeem
+from db import transaction
+from dispatch import dispatcher
+from tasks import queue_assignment
+
+class OrderError(ValueError):
+    """The cart was rejected; nothing was written."""
+
+def normalize_items(items) -> dict:
+    """
+    Cart lines -> {Item_ID: Quantity}, merging repeated items.
+    Accepts [{"item_id": 1, "quantity": 2}, ...] or [[1, 2], ...].
+    """
+    cart = {}
+    for line in items or []:
+        if isinstance(line, dict):
+            item_id, quantity = line.get("item_id") or line.get("food_id"), line.get("quantity", 1)
+        else:
+            item_id, quantity = line
+        try:
+            item_id, quantity = int(item_id), int(quantity)
+        except (TypeError, ValueError):
+            raise OrderError(f"Invalid cart line: {line!r}")
+        if quantity < 1:
+            raise OrderError(f"Quantity must be at least 1 for item {item_id}")
+        cart[item_id] = cart.get(item_id, 0) + quantity
+    return cart
+
+def place_order(conn, customer_id, restaurant_id, items, agent_id=None, order_date=None, coupon_code=None):
+    """
+    Insert the ORDERS row and all its ORDER_DETAIL rows in one transaction.
+    Total_Amount is computed from FOOD_ITEM.Price, never taken from the client,
+    less the coupon's percentage when a coupon_code is given (see coupons.py).
+    Without an agent_id the nearest idle rider is assigned (see dispatch.py).
+    Returns (order_id, total, agent_id); agent_id is None while the order waits for a rider.
+    """
+    cart = normalize_items(items)
+    if not cart:
+        raise OrderError("At least one item is required")
+    try:
+        restaurant_id = int(restaurant_id)
+    except (TypeError, ValueError):
+        raise OrderError(f"Invalid restaurant_id: {restaurant_id!r}")
+    order_date = order_date or datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        coupon = coupon_index.lookup(conn, coupon_code) if coupon_code else None
+    except CouponError as e:
+        raise OrderError(str(e))
+
+    assigned = None
+    if not agent_id:
+        agent_id = assigned = dispatcher.assign(conn, restaurant_id)
+    try:
+        order_id, total = _insert_order(conn, cart, customer_id, restaurant_id, agent_id, order_date, coupon)
+    except Exception:
+        if assigned is not None:
+            dispatcher.release(assigned)
+        raise
+    if coupon is not None:
+        invalidate("COUPON_REDEMPTION")  # the coupons page shows redemption counts
+    return order_id, total, agent_id
+
+def _insert_order(conn, cart, customer_id, restaurant_id, agent_id, order_date, coupon=None):
+    with transaction(conn):
+        with conn.cursor() as cur:
+            placeholders = ", ".join(["%s"] * len(cart))
+            cur.execute(
+                f"SELECT Item_ID, Price, Restaurant_ID FROM FOOD_ITEM WHERE Item_ID IN ({placeholders})",
+                tuple(cart),
+            )
+            menu = {int(r["Item_ID"]): r for r in cur.fetchall()}
+
+            missing = sorted(set(cart) - set(menu))
+            if missing:
+                raise OrderError(f"Unknown items: {missing}")
+            foreign = sorted(i for i, r in menu.items() if int(r["Restaurant_ID"]) != restaurant_id)
+            if foreign:
+                raise OrderError(f"Items {foreign} are not sold by restaurant {restaurant_id}")
+
+            total = sum(Decimal(str(menu[i]["Price"])) * q for i, q in cart.items()).quantize(Decimal("0.01"))
+            if coupon is not None:
+                total -= discount_amount(total, coupon)
+
+            cur.execute("""
+                INSERT INTO ORDERS (Customer_ID, Restaurant_ID, Order_Date, Total_Amount, Agent_ID,
+                                    Coupon_ID, Discount_Percent)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, (customer_id, restaurant_id, order_date, float(total), agent_id,
+                  coupon.coupon_id if coupon else None, float(coupon.discount) if coupon else 0))
+            order_id = cur.lastrowid
+            cur.executemany(
+                "INSERT INTO ORDER_DETAIL (Order_ID, Item_ID, Quantity) VALUES (%s, %s, %s)",
+                [(order_id, item_id, quantity) for item_id, quantity in cart.items()],
+            )
+        if not agent_id:
+            queue_assignment(conn, order_id)  # nobody free yet; keep trying off-request
+        touch_order(conn, order_date=order_date, restaurant_id=restaurant_id)
+        if coupon is not None:
+            with conn.cursor() as cur:
+                try:
+                    redeem(cur, coupon)  # last, so the coupon row is locked only until the commit
+                except CouponError as e:
+                    raise OrderError(str(e))
+    return order_id, total
+
+def recompute_total(cur, order_id):
+    """Reset ORDERS.Total_Amount from its ORDER_DETAIL lines and current prices, less the order's coupon discount."""
+    # 100.0: SQLite keeps whole-number prices as integers, and integer / 100 truncates
+    cur.execute("""
+        UPDATE ORDERS SET Total_Amount = ROUND((
+            SELECT COALESCE(SUM(od.Quantity * f.Price), 0)
+            FROM ORDER_DETAIL od
+            JOIN FOOD_ITEM f ON od.Item_ID = f.Item_ID
+            WHERE od.Order_ID = %s
+        ) * (100 - Discount_Percent) / 100.0, 2)
+        WHERE Order_ID = %s
+    """, (order_id, order_id))
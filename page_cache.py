@@ -0,0 +1,77 @@
+# page_cache.py
+"""
+Rendered-output cache for the listing pages.
+
+    @app.route("/restaurants")
+    @cached_page("RESTAURANT")
+    def restaurants(): ...
+
+The first GET of a URL runs the view and keeps the rendered body, its gzip
+encoding (made once, here) and an ETag. Later GETs are served from memory while
+the listed tables' versions are unchanged -- the add_/delete_ routes bump them
+through cache.invalidate() -- so a repeat view costs a dict lookup, and a browser
+revalidating with If-None-Match gets a 304 with no body.
+
+The view runs normally (and nothing is cached) when the session holds flash
+messages, since the page would render and consume them, or when the view marks
+its output as not cacheable with skip_page_cache(), e.g. after a query error.
+With read replicas, a page rendered from a replica soon after a write to its
+tables is served but not kept (ReadThroughCache.store skips it); pages rendered
+for a session pinned to the primary are kept as usual.
+"""
+import gzip
+import hashlib
+import os
+from functools import wraps
+
+from flask import Response, g, make_response, request, session
+
+from cache import ReadThroughCache
+
+PAGE_CACHE_MAX_ENTRIES = int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "256"))
+GZIP_MIN_BYTES = 1024  # smaller bodies aren't worth a Content-Encoding
+
+class _Page:
+    __slots__ = ("body", "gzipped", "etag", "content_type")
+
+    def __init__(self, body, content_type):
+        self.body = body
+        self.content_type = content_type
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.gzipped = gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_BYTES else None
+
+    def respond(self):
+        use_gzip = self.gzipped is not None and request.accept_encodings["gzip"] > 0
+        resp = Response(self.gzipped if use_gzip else self.body, content_type=self.content_type)
+        if use_gzip:
+            resp.headers["Content-Encoding"] = "gzip"
+        resp.set_etag(f"{self.etag}-gz" if use_gzip else self.etag)  # one ETag per representation
+        resp.headers["Cache-Control"] = "no-cache"  # always revalidate; a 304 is cheap
+        resp.vary.add("Accept-Encoding")
+        return resp.make_conditional(request)
+
+def skip_page_cache():
+    """Called by a view whose output must not be cached (it rendered an error state)."""
+    g.skip_page_cache = True
+
+def cached_page(*tables):
+    """Cache a GET view's rendered output until one of `tables` changes."""
+    def decorator(view):
+        cache = ReadThroughCache(f"page_{view.__name__}", tables, max_entries=PAGE_CACHE_MAX_ENTRIES)
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != "GET" or "_flashes" in session:
+                return view(*args, **kwargs)
+            # full_path covers ?after=/?before= cursors and ?format=json; Accept picks HTML vs JSON too
+            key = (request.full_path, request.accept_mimetypes.best_match(["text/html", "application/json"]))
+            stamp, hit, page = cache.lookup(key)
+            if not hit:
+                resp = make_response(view(*args, **kwargs))
+                if resp.status_code != 200 or resp.is_streamed or g.pop("skip_page_cache", False):
+                    return resp
+                page = _Page(resp.get_data(), resp.content_type)
+                cache.store(key, page, stamp)
+            return page.respond()
+        return wrapper
+    return decorator
@@ -0,0 +1,143 @@
+# pagination.py
+import base64
+import json
+import os
+
+DEFAULT_PAGE_SIZE = int(os.getenv("PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "200"))
+
+class Keyset:
+    """
+    Sort key of a listing, e.g. Keyset(("o.Order_Date", "Order_Date"), ("o.Order_ID", "Order_ID"), descending=True).
+    Each column is (SQL expression, key of that value in the fetched row).
+    The last column must be unique so every row has a distinct position.
+
+    nullable=True allows NULLs in the first column. They sort lowest, as in both
+    MySQL and SQLite, and are paged as a segment of their own (see segments()):
+    `x < NULL` would drop them from every later page, and wrapping the column in
+    COALESCE would keep its index out of both the seek and the ORDER BY.
+    """
+    def __init__(self, *columns, descending=False, nullable=False):
+        self.columns = [tuple(c) for c in columns]
+        self.descending = descending
+        self.nullable = nullable
+
+    def order_by(self, reverse=False) -> str:
+        desc = self.descending != reverse
+        return ", ".join(f"{expr} {'DESC' if desc else 'ASC'}" for expr, _ in self.columns)
+
+    def seek(self, values, reverse=False):
+        """
+        WHERE fragment selecting rows strictly after `values` in sort order.
+        Expanded (a < x) OR (a = x AND b < y) form so MySQL can range-scan the index,
+        behind an `a <= x` that lets SQLite do the same instead of sorting an OR of two scans.
+        """
+        return self._seek([expr for expr, _ in self.columns], values, reverse)
+
+    def _seek(self, exprs, values, reverse):
+        op = "<" if self.descending != reverse else ">"
+        clauses, params = [], []
+        for i, expr in enumerate(exprs):
+            parts = [f"{e} = %s" for e in exprs[:i]] + [f"{expr} {op} %s"]
+            clauses.append("(" + " AND ".join(parts) + ")")
+            params.extend(values[:i + 1])
+        if len(exprs) == 1:
+            return clauses[0], params
+        return f"({exprs[0]} {op}= %s AND ({' OR '.join(clauses)}))", [values[0]] + params
+
+    def segments(self, values=None, reverse=False):
+        """
+        [(WHERE fragment or None, params), ...] to query in turn for the rows after
+        `values` (None: from the start). One entry unless the keyset is nullable;
+        then the non-NULL and NULL rows of the first column are separate range scans,
+        taken in the order the walk meets them.
+        """
+        if not self.nullable:
+            return [self.seek(values, reverse) if values is not None else (None, [])]
+        first = self.columns[0][0]
+        null_rows, dated_rows = (f"{first} IS NULL", []), (f"{first} IS NOT NULL", [])
+        if values is not None and values[0] is None:
+            clause, params = self._seek([expr for expr, _ in self.columns[1:]], values[1:], reverse)
+            null_rows = (f"({first} IS NULL AND {clause})", params)
+        elif values is not None:
+            dated_rows = self.seek(values, reverse)  # `first <op> x` already excludes NULLs
+        if self.descending != reverse:  # walking down: dated rows, then the NULLs below them
+            return [null_rows] if values is not None and values[0] is None else [dated_rows, null_rows]
+        return [null_rows, dated_rows] if values is None or values[0] is None else [dated_rows]
+
+    def values(self, row):
+        return [row[key] for _, key in self.columns]
+
+def page_size(value, default=DEFAULT_PAGE_SIZE) -> int:
+    """Parse ?limit=, clamped to 1..MAX_PAGE_SIZE."""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+def encode_cursor(values) -> str:
+    plain = [v if v is None or isinstance(v, (int, float, str)) else str(v) for v in values]
+    raw = json.dumps(plain, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(token):
+    """Return the key values in `token`, or None if it is missing or malformed."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except Exception:
+        return None
+    return values if isinstance(values, list) else None
+
+class Page:
+    def __init__(self, rows, limit, next_cursor=None, prev_cursor=None):
+        self.rows = rows
+        self.limit = limit
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def to_dict(self) -> dict:
+        return {"limit": self.limit, "next": self.next_cursor, "prev": self.prev_cursor}
+
+def fetch_page(cur, select_sql, keyset, params=(), where=None, after=None, before=None, limit=None):
+    """
+    Run `select_sql` (SELECT ... FROM ... JOIN ..., no WHERE/ORDER BY) one page at a time.
+    `after` / `before` are cursors from a previous Page; `where` is an optional extra
+    filter (with its values at the start of `params`).
+    """
+    limit = limit or DEFAULT_PAGE_SIZE
+    after_values = decode_cursor(after)
+    before_values = None if after_values else decode_cursor(before)
+    if after_values is not None and len(after_values) != len(keyset.columns):
+        after_values = None
+    if before_values is not None and len(before_values) != len(keyset.columns):
+        before_values = None
+    backward = before_values is not None
+
+    rows = []
+    for clause, seek_args in keyset.segments(before_values if backward else after_values, reverse=backward):
+        conditions, args = [c for c in (where, clause) if c], list(params) + seek_args
+        sql = select_sql
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += f" ORDER BY {keyset.order_by(reverse=backward)} LIMIT {int(limit) + 1 - len(rows)}"
+        cur.execute(sql, tuple(args))
+        rows += cur.fetchall()
+        if len(rows) > limit:
+            break
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backward:
+        rows.reverse()
+    if not rows:
+        return Page(rows, limit)
+
+    first, last = encode_cursor(keyset.values(rows[0])), encode_cursor(keyset.values(rows[-1]))
+    if backward:
+        return Page(rows, limit, next_cursor=last, prev_cursor=first if has_more else None)
+    return Page(rows, limit, next_cursor=last if has_more else None,
+                prev_cursor=first if after_values is not None else None)
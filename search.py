@@ -0,0 +1,138 @@
+# search.py
+"""
+Ranked, prefix-aware search over menu items and restaurants (GET /search).
+
+SQLite uses the FOOD_ITEM_FTS / RESTAURANT_FTS tables (FTS5, ranked by bm25 with a
+restaurant's name weighted above its address); MySQL uses the FT_Food_Name /
+FT_Restaurant_Text FULLTEXT indexes in boolean mode. Every word of the query must
+start a word of the text, so "chick tik" finds "Chicken Tikka".
+
+InnoDB never indexes words shorter than innodb_ft_min_token_size (3 by default), so on
+MySQL a query with a shorter word falls back to LIKE on word starts: unranked, the
+first matches in key order.
+"""
+import os
+import re
+
+from cache import ReadThroughCache
+from db import is_sqlite_conn
+
+SEARCH_DEFAULT_LIMIT = 10
+SEARCH_MAX_LIMIT = 50
+SEARCH_CANDIDATES = int(os.getenv("SEARCH_CANDIDATES", "1000"))
+SEARCH_MIN_TOKEN = int(os.getenv("SEARCH_MIN_TOKEN", "3"))  # the server's innodb_ft_min_token_size
+KINDS = ("items", "restaurants")
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+search_cache = ReadThroughCache("search", ("RESTAURANT", "FOOD_ITEM"), max_entries=2048)
+
+def _terms(q):
+    return _WORD.findall((q or "").lower())[:8]
+
+def _fts5_query(terms):
+    # quoted so FTS5 operators/column filters in user input stay literal
+    return " ".join(f'"{t}"*' for t in terms)
+
+def _boolean_query(terms):
+    return " ".join(f"+{t}*" for t in terms)
+
+# Only the first SEARCH_CANDIDATES matches (in index order) are ranked: a two-letter
+# prefix can match most of the menu, and scoring all of it costs far more than the
+# keystroke is worth. Selective queries have fewer matches and are ranked exactly.
+_SQLITE_SQL = {
+    "items": """
+        SELECT f.Item_ID, f.Name, f.Price, f.Restaurant_ID, r.Name AS Restaurant, m.Score
+        FROM (SELECT rowid, rank AS Score FROM FOOD_ITEM_FTS WHERE FOOD_ITEM_FTS MATCH %s LIMIT %s) m
+        JOIN FOOD_ITEM f ON f.Item_ID = m.rowid
+        LEFT JOIN RESTAURANT r ON r.Restaurant_ID = f.Restaurant_ID
+        ORDER BY m.Score
+        LIMIT %s
+    """,
+    "restaurants": """
+        SELECT r.Restaurant_ID, r.Name, r.Address, m.Score
+        FROM (SELECT rowid, bm25(RESTAURANT_FTS, 10.0, 1.0) AS Score
+              FROM RESTAURANT_FTS WHERE RESTAURANT_FTS MATCH %s LIMIT %s) m
+        JOIN RESTAURANT r ON r.Restaurant_ID = m.rowid
+        ORDER BY m.Score
+        LIMIT %s
+    """,
+}
+
+_MYSQL_SQL = {
+    "items": """
+        SELECT f.Item_ID, f.Name, f.Price, f.Restaurant_ID, r.Name AS Restaurant, m.Score
+        FROM (SELECT Item_ID, MATCH(Name) AGAINST (%s IN BOOLEAN MODE) AS Score
+              FROM FOOD_ITEM WHERE MATCH(Name) AGAINST (%s IN BOOLEAN MODE) LIMIT %s) m
+        JOIN FOOD_ITEM f ON f.Item_ID = m.Item_ID
+        LEFT JOIN RESTAURANT r ON r.Restaurant_ID = f.Restaurant_ID
+        ORDER BY m.Score DESC
+        LIMIT %s
+    """,
+    "restaurants": """
+        SELECT r.Restaurant_ID, r.Name, r.Address, m.Score
+        FROM (SELECT Restaurant_ID, MATCH(Name, Address) AGAINST (%s IN BOOLEAN MODE) AS Score
+              FROM RESTAURANT WHERE MATCH(Name, Address) AGAINST (%s IN BOOLEAN MODE) LIMIT %s) m
+        JOIN RESTAURANT r ON r.Restaurant_ID = m.Restaurant_ID
+        ORDER BY m.Score DESC
+        LIMIT %s
+    """,
+}
+
+# Fallback for words FULLTEXT cannot see; every word must start a word of one of the columns.
+_LIKE_SQL = {
+    "items": """
+        SELECT f.Item_ID, f.Name, f.Price, f.Restaurant_ID, r.Name AS Restaurant, 0 AS Score
+        FROM FOOD_ITEM f
+        LEFT JOIN RESTAURANT r ON r.Restaurant_ID = f.Restaurant_ID
+        WHERE {where}
+        ORDER BY f.Item_ID
+        LIMIT %s
+    """,
+    "restaurants": """
+        SELECT r.Restaurant_ID, r.Name, r.Address, 0 AS Score
+        FROM RESTAURANT r
+        WHERE {where}
+        ORDER BY r.Restaurant_ID
+        LIMIT %s
+    """,
+}
+_LIKE_COLUMNS = {"items": ("f.Name",), "restaurants": ("r.Name", "r.Address")}
+
+def _like_statement(kind, terms, limit):
+    where, params = [], []
+    for term in terms:
+        escaped = term.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+        ors = []
+        for column in _LIKE_COLUMNS[kind]:
+            ors += [f"{column} LIKE %s ESCAPE '!'", f"{column} LIKE %s ESCAPE '!'"]
+            params += [f"{escaped}%", f"% {escaped}%"]
+        where.append(f"({' OR '.join(ors)})")
+    return _LIKE_SQL[kind].format(where=" AND ".join(where)), (*params, limit)
+
+def search(conn, q, kinds=KINDS, limit=SEARCH_DEFAULT_LIMIT) -> dict:
+    """{kind: [rows, best first]} for each requested kind; empty lists for a query without words."""
+    terms = _terms(q)
+    limit = max(1, min(SEARCH_MAX_LIMIT, int(limit)))
+    if not terms:
+        return {kind: [] for kind in kinds}
+    sqlite = is_sqlite_conn(conn)
+    key = (sqlite, tuple(terms), tuple(kinds), limit)
+    return search_cache.get(key, lambda: _search(conn, sqlite, terms, kinds, limit))
+
+def statement(kind, terms, sqlite, limit):
+    """(sql, params) for one kind of result; also used by the async handler in asgi.py."""
+    if sqlite:
+        return _SQLITE_SQL[kind], (_fts5_query(terms), SEARCH_CANDIDATES, limit)
+    if min(len(t) for t in terms) < SEARCH_MIN_TOKEN:
+        return _like_statement(kind, terms, limit)
+    query = _boolean_query(terms)
+    return _MYSQL_SQL[kind], (query, query, SEARCH_CANDIDATES, limit)
+
+def _search(conn, sqlite, terms, kinds, limit):
+    results = {}
+    with conn.cursor() as cur:
+        for kind in kinds:
+            cur.execute(*statement(kind, terms, sqlite, limit))
+            results[kind] = cur.fetchall()
+    return results
@@ -0,0 +1,65 @@
+# stats.py
+import os
+import time
+from threading import Lock
+
+from db import STATS_TABLES, reads_pinned
+
+# How long a dashboard snapshot is served from memory before re-reading TABLE_STATS.
+DASHBOARD_STATS_TTL = float(os.getenv("DASHBOARD_STATS_TTL", "5"))
+
+# TABLE_STATS row -> key used by home.html
+_STAT_KEYS = {
+    "RESTAURANT": "restaurants",
+    "CUSTOMER": "customers",
+    "FOOD_ITEM": "food_items",
+    "ORDERS": "orders",
+    "DELIVERY_AGENT": "agents",
+}
+
+# Fallback when TABLE_STATS is not maintained: still one round trip, not five.
+_COMBINED_COUNT_SQL = "SELECT " + ", ".join(
+    f"(SELECT COUNT(*) FROM {table}) AS {key}" for table, key in _STAT_KEYS.items()
+)
+
+class DashboardStats:
+    """
+    Per-process TTL cache in front of the TABLE_STATS counters. A request whose reads
+    are pinned to the primary (it just wrote) skips the snapshot, which may have come
+    from a lagging replica, and refreshes it.
+    """
+    def __init__(self, ttl=DASHBOARD_STATS_TTL):
+        self.ttl = ttl
+        self._value = None
+        self._expires = 0.0
+        self._lock = Lock()
+
+    def get(self, conn) -> dict:
+        with self._lock:
+            if self._value is not None and time.monotonic() < self._expires and not reads_pinned():
+                return dict(self._value)
+        value = self._load(conn)
+        with self._lock:
+            self._value, self._expires = value, time.monotonic() + self.ttl
+        return dict(value)
+
+    def invalidate(self):
+        with self._lock:
+            self._value = None
+
+    def _load(self, conn) -> dict:
+        with conn.cursor() as cur:
+            try:
+                cur.execute("SELECT Table_Name, Row_Count FROM TABLE_STATS")
+                rows = cur.fetchall()
+            except Exception:
+                rows = []
+            counts = {r["Table_Name"]: r["Row_Count"] for r in rows}
+            if all(t in counts for t in STATS_TABLES):
+                return {key: int(counts[table]) for table, key in _STAT_KEYS.items()}
+
+            cur.execute(_COMBINED_COUNT_SQL)
+            row = cur.fetchone() or {}
+            return {key: int(row.get(key) or 0) for key in _STAT_KEYS.values()}
+
+dashboard_stats = DashboardStats()
@@ -0,0 +1,70 @@
+# tasks.py
+"""Background tasks run by `flask jobs-worker` (see jobs.py)."""
+import os
+from datetime import datetime, timedelta
+
+from dispatch import DISPATCH_HOLD_SECONDS, DONE_STATUSES, dispatcher
+from events import publish
+from jobs import RetryLater, enqueue, task
+
+WAITING_ORDERS_BATCH = 20
+ASSIGN_RETRY_SECONDS = float(os.getenv("ASSIGN_RETRY_SECONDS", "15"))
+# Keep looking for as long as assign_waiting_orders would still serve the order.
+ASSIGN_MAX_ATTEMPTS = max(1, int(DISPATCH_HOLD_SECONDS // ASSIGN_RETRY_SECONDS))
+
+def _assign(conn, order_id):
+    """Give an unassigned order the nearest idle rider. Returns the agent, None if nobody is free, False if moot."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT o.Agent_ID, o.Restaurant_ID, r.Latitude
+            FROM ORDERS o JOIN RESTAURANT r ON o.Restaurant_ID = r.Restaurant_ID
+            WHERE o.Order_ID = %s
+        """, (order_id,))
+        order = cur.fetchone()
+        if not order or order["Agent_ID"] or order["Latitude"] is None:
+            return False  # deleted, already assigned, or no pickup coordinates to search from
+        agent_id = dispatcher.assign(conn, order["Restaurant_ID"])
+        if agent_id is None:
+            return None
+        cur.execute("UPDATE ORDERS SET Agent_ID = %s WHERE Order_ID = %s AND Agent_ID IS NULL", (agent_id, order_id))
+        if cur.rowcount != 1:
+            dispatcher.release(agent_id)
+            return False
+    conn.commit()
+    publish("order.assigned", order_id=order_id, agent_id=agent_id)
+    return agent_id
+
+def queue_assignment(conn, order_id):
+    """For write routes whose order got no rider (caller commits)."""
+    enqueue(conn, "assign_rider", {"order_id": order_id}, max_attempts=ASSIGN_MAX_ATTEMPTS)
+
+@task("assign_rider")
+def assign_rider(conn, payload):
+    """
+    Queued by queue_assignment(). Retried every ASSIGN_RETRY_SECONDS until a rider
+    is free or DISPATCH_HOLD_SECONDS have passed; then the job fails and the order
+    stays unassigned.
+    """
+    if _assign(conn, int(payload["order_id"])) is None:
+        raise RetryLater(f"no idle rider for order {payload['order_id']}", delay=ASSIGN_RETRY_SECONDS)
+
+@task("assign_waiting_orders")
+def assign_waiting_orders(conn, payload):
+    """A delivery finished, so a rider is free again: serve the oldest unassigned orders first."""
+    since = (datetime.utcnow() - timedelta(seconds=DISPATCH_HOLD_SECONDS)).strftime("%Y-%m-%d %H:%M:%S")
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT Order_ID FROM ORDERS
+            WHERE Order_Date >= %s AND Agent_ID IS NULL
+            ORDER BY Order_Date, Order_ID
+            LIMIT %s
+        """, (since, WAITING_ORDERS_BATCH))
+        waiting = [r["Order_ID"] for r in cur.fetchall()]
+    dispatcher.refresh(conn, force=True)
+    for order_id in waiting:
+        _assign(conn, order_id)
+
+def after_delivery_update(conn, status):
+    """Hook for the delivery write routes (caller commits)."""
+    if status in DONE_STATUSES:
+        enqueue(conn, "assign_waiting_orders")
@@ -0,0 +1,65 @@
+# tests/conftest.py
+"""
+Shared fixtures. The suite runs against a throwaway SQLite file; the settings are
+environment variables read at import time, so they are set before anything imports db.
+"""
+import itertools
+import os
+import tempfile
+
+_TMP = tempfile.mkdtemp(prefix="restaurant-tests-")
+os.environ["SQLITE_PATH"] = os.path.join(_TMP, "test.db")
+for _name in ("MYSQL_URL", "MYSQL_REPLICA_URLS", "CACHE_SYNC_DIR"):
+    os.environ.pop(_name, None)
+
+import pytest
+
+import app as app_module
+from cache import invalidate
+from db import get_conn
+
+_names = itertools.count(1)
+
+@pytest.fixture(scope="session")
+def flask_app():
+    app_module.init_db()
+    app_module.app.config["TESTING"] = True
+    return app_module.app
+
+@pytest.fixture
+def client(flask_app):
+    return flask_app.test_client()
+
+@pytest.fixture
+def conn(flask_app):
+    with get_conn() as conn:
+        yield conn
+
+def fetchone(conn, sql, params=()):
+    with conn.cursor() as cur:
+        cur.execute(sql, params)
+        return cur.fetchone()
+
+@pytest.fixture
+def make_restaurant(conn):
+    """make_restaurant(prices=(15, 4.5)) -> (Restaurant_ID, [Item_ID, ...]) on fresh rows."""
+    def make(prices=(15,), name=None):
+        with conn.cursor() as cur:
+            cur.execute("INSERT INTO RESTAURANT (Name, Address) VALUES (%s, %s)",
+                        (name or f"Test Kitchen {next(_names)}", "1 Test Street"))
+            restaurant_id = cur.lastrowid
+            item_ids = []
+            for price in prices:
+                cur.execute("INSERT INTO FOOD_ITEM (Name, Price, Restaurant_ID) VALUES (%s, %s, %s)",
+                            (f"Dish {next(_names)}", price, restaurant_id))
+                item_ids.append(cur.lastrowid)
+        invalidate("RESTAURANT", "FOOD_ITEM")
+        return restaurant_id, item_ids
+    return make
+
+@pytest.fixture
+def customer_id(conn):
+    with conn.cursor() as cur:
+        cur.execute("INSERT INTO CUSTOMER (Name, Email) VALUES (%s, %s)",
+                    (f"Test Customer {next(_names)}", "test@example.com"))
+        return cur.lastrowid
@@ -0,0 +1,82 @@
+# tests/test_analytics.py
+import pytest
+
+from analytics import rebuild, refresh
+from conftest import fetchone
+from orders import place_order
+
+DAY = "2024-03-15"
+
+def _rollups(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT Restaurant_ID, Order_Count, Revenue FROM DAILY_RESTAURANT_REVENUE WHERE Sales_Date = %s "
+                    "ORDER BY Restaurant_ID", (DAY,))
+        revenue = [(r["Restaurant_ID"], r["Order_Count"], float(r["Revenue"])) for r in cur.fetchall()]
+        cur.execute("SELECT Item_ID, Quantity FROM DAILY_ITEM_SALES WHERE Sales_Date = %s ORDER BY Item_ID", (DAY,))
+        items = [(r["Item_ID"], r["Quantity"]) for r in cur.fetchall()]
+    return revenue, items
+
+@pytest.fixture
+def sales(conn, customer_id, make_restaurant):
+    """Two orders on DAY at one restaurant, rolled up."""
+    restaurant_id, (a, b) = make_restaurant(prices=(10, 3))
+    place_order(conn, customer_id, restaurant_id, [[a, 2], [b, 1]], order_date=f"{DAY} 12:00:00")
+    place_order(conn, customer_id, restaurant_id, [[b, 4]], order_date=f"{DAY} 19:00:00")
+    refresh(conn, DAY, DAY)
+    return restaurant_id, a, b
+
+def _matches_rebuild(conn):
+    kept = _rollups(conn)
+    rebuild(conn, DAY, DAY)
+    return _rollups(conn) == kept
+
+def test_refresh_rolls_up_a_day(conn, sales):
+    restaurant_id, a, b = sales
+    revenue, items = _rollups(conn)
+    assert (restaurant_id, 2, 35.0) in revenue
+    assert (a, 2) in items and (b, 5) in items
+
+@pytest.mark.parametrize("via_api", [False, True])
+def test_deleting_an_item_drops_its_sales(client, conn, sales, via_api):
+    _, a, b = sales
+    if via_api:
+        assert client.delete(f"/api/v1/food_items/{a}").status_code == 204
+    else:
+        client.get(f"/food_items/delete/{a}")
+    items = [item for item, _ in _rollups(conn)[1]]
+    assert a not in items and b in items
+    assert _matches_rebuild(conn)
+
+@pytest.mark.parametrize("via_api", [False, True])
+def test_deleting_a_restaurant_drops_its_rollups(client, conn, sales, via_api):
+    restaurant_id, a, b = sales
+    if via_api:
+        assert client.delete(f"/api/v1/restaurants/{restaurant_id}").status_code == 204
+    else:
+        client.get(f"/restaurants/delete/{restaurant_id}")
+    revenue, items = _rollups(conn)
+    assert restaurant_id not in [r for r, _, _ in revenue]
+    assert not {a, b} & {i for i, _ in items}
+    assert _matches_rebuild(conn)
+
+@pytest.mark.parametrize("limit, rows", [("-3", 1), ("0", 1), ("1", 1), ("nope", 2)])
+def test_top_items_limit_is_clamped(client, sales, limit, rows):
+    restaurant_id, _, _ = sales
+    resp = client.get(f"/api/v1/analytics/top_items?start={DAY}&end={DAY}&restaurant_id={restaurant_id}&limit={limit}")
+    assert resp.status_code == 200
+    assert len(resp.get_json()["data"]) == rows
+
+def test_failed_order_delete_schedules_no_refresh(client, conn, customer_id, make_restaurant):
+    restaurant_id, (item,) = make_restaurant()
+    order_id, _, _ = place_order(conn, customer_id, restaurant_id, [[item, 1]], order_date=f"{DAY} 12:00:00")
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM JOB")
+        cur.execute(f"CREATE TRIGGER test_keep_order BEFORE DELETE ON ORDERS WHEN OLD.Order_ID = {order_id} "
+                    "BEGIN SELECT RAISE(ABORT, 'order is locked'); END")
+    try:
+        client.get(f"/orders/delete/{order_id}")
+    finally:
+        with conn.cursor() as cur:
+            cur.execute("DROP TRIGGER test_keep_order")
+    assert fetchone(conn, "SELECT COUNT(*) AS n FROM ORDERS WHERE Order_ID = %s", (order_id,))["n"] == 1
+    assert fetchone(conn, "SELECT COUNT(*) AS n FROM JOB")["n"] == 0
@@ -0,0 +1,63 @@
+# tests/test_api.py
+import pytest
+
+import api
+from conftest import fetchone
+
+def test_unexpected_error_is_not_leaked(client, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("no such column: Secret_Column")
+    monkeypatch.setattr(api, "top_items", broken)
+    resp = client.get("/api/v1/analytics/top_items")
+    assert resp.status_code == 500
+    assert resp.get_json() == {"error": "Internal server error"}
+
+@pytest.mark.parametrize("value, stored", [
+    ("2024-11-01", "2024-11-01 00:00:00"),
+    ("2024-11-01 18:30:00", "2024-11-01 18:30:00"),
+])
+def test_create_order_normalizes_order_date(client, conn, customer_id, make_restaurant, value, stored):
+    restaurant_id, (item,) = make_restaurant()
+    resp = client.post("/api/v1/orders", json={"customer_id": customer_id, "restaurant_id": restaurant_id,
+                                               "items": [[item, 1]], "order_date": value})
+    assert resp.status_code == 201
+    order_id = resp.get_json()["data"]["Order_ID"]
+    assert str(fetchone(conn, "SELECT Order_Date FROM ORDERS WHERE Order_ID = %s", (order_id,))["Order_Date"]) == stored
+
+@pytest.mark.parametrize("value", ["yesterday", "2024-13-01", "01/11/2024", 20241101])
+def test_create_order_rejects_bad_order_date(client, customer_id, make_restaurant, value):
+    restaurant_id, (item,) = make_restaurant()
+    resp = client.post("/api/v1/orders", json={"customer_id": customer_id, "restaurant_id": restaurant_id,
+                                               "items": [[item, 1]], "order_date": value})
+    assert resp.status_code == 400
+    assert "order_date" in resp.get_json()["error"]
+
+def test_get_is_conditional(client, make_restaurant):
+    restaurant_id, _ = make_restaurant()
+    resp = client.get(f"/api/v1/restaurants/{restaurant_id}")
+    assert resp.status_code == 200 and resp.headers["ETag"]
+    again = client.get(f"/api/v1/restaurants/{restaurant_id}", headers={"If-None-Match": resp.headers["ETag"]})
+    assert again.status_code == 304
+
+def test_missing_reference_is_reported_without_driver_details(client, customer_id, make_restaurant):
+    resp = client.post("/api/v1/food_items", json={"name": "Orphan", "price": 5, "restaurant_id": 999999})
+    assert resp.status_code == 409 and resp.get_json() == {"error": "Referenced row not found"}
+    restaurant_id, (item,) = make_restaurant()
+    order_id = client.post("/api/v1/orders", json={"customer_id": customer_id, "restaurant_id": restaurant_id,
+                                                   "items": [[item, 1]]}).get_json()["data"]["Order_ID"]
+    resp = client.post(f"/api/v1/orders/{order_id}/items", json={"item_id": 999999})
+    assert resp.status_code == 409 and resp.get_json() == {"error": "Referenced row not found"}
+
+def test_duplicate_is_reported_without_driver_details(client):
+    body = {"code": "DUPLICATE-CODE", "discount": 10}
+    client.post("/api/v1/coupons", json=body)
+    resp = client.post("/api/v1/coupons", json=body)
+    assert resp.status_code == 409 and resp.get_json() == {"error": "Conflicts with existing data"}
+
+def test_place_order_json_error_is_not_leaked(client, monkeypatch):
+    import app
+    def broken(*args, **kwargs):
+        raise RuntimeError("no such column: Secret_Column")
+    monkeypatch.setattr(app, "place_order", broken)
+    resp = client.post("/orders/place", json={"customer_id": 1, "restaurant_id": 1, "items": [[1, 1]]})
+    assert resp.status_code == 500 and "Secret_Column" not in resp.get_data(as_text=True)
@@ -0,0 +1,92 @@
+# tests/test_asgi.py
+import asyncio
+
+import flask
+import pytest
+
+import asgi
+import metrics
+
+def _scope(path, query=b"", method="GET"):
+    return {"type": "http", "method": method, "path": path, "query_string": query, "headers": [],
+            "http_version": "1.1", "scheme": "http", "root_path": ""}
+
+async def _receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+def call(path, query=b"", method="GET"):
+    """Run one request through asgi.app; returns (status, headers, body)."""
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi.app(_scope(path, query, method), _receive, send))
+    start = sent[0]
+    return start["status"], dict(start["headers"]), b"".join(m.get("body", b"") for m in sent[1:])
+
+@pytest.fixture(autouse=True)
+def _app(flask_app):
+    return flask_app
+
+def test_async_routes_record_request_metrics(make_restaurant):
+    restaurant_id, _ = make_restaurant()
+    route = "api_v1.get_restaurants"
+    before = metrics.http_requests.value(route, "200"), metrics.http_requests.value(route, "404")
+    assert call(f"/api/v1/restaurants/{restaurant_id}")[0] == 200
+    assert call("/api/v1/restaurants/999999")[0] == 404
+    assert metrics.http_requests.value(route, "200") == before[0] + 1
+    assert metrics.http_requests.value(route, "404") == before[1] + 1
+    assert f'db_queries_per_request_count{{route="{route}"}}' in metrics.render()
+
+def test_async_search_counts_its_queries():
+    status, _, _ = call("/search", b"q=pizza")
+    assert status == 200
+    lines = [l for l in metrics.render().splitlines() if l.startswith('db_queries_per_request_sum{route="search_route"}')]
+    assert lines and float(lines[0].split()[-1]) > 0
+
+def test_async_error_is_recorded_as_500(monkeypatch):
+    async def broken(*args, **kwargs):
+        raise RuntimeError("boom")
+    monkeypatch.setattr(asgi.aiodb, "fetchall", broken)
+    before = metrics.http_requests.value("api_v1.list_order_items", "500")
+    status, _, body = call("/api/v1/orders/1/items")
+    assert status == 500 and b"boom" not in body
+    assert metrics.http_requests.value("api_v1.list_order_items", "500") == before + 1
+
+def test_events_over_the_cap_get_a_retry_hint(monkeypatch):
+    monkeypatch.setattr(asgi, "_sse_open", asgi.ASGI_SSE_STREAMS)
+    before = asgi.sse_turned_away.value()
+    status, headers, body = call("/events")
+    assert status == 200 and headers[b"content-type"] == b"text/event-stream"
+    assert body == f"retry: {asgi.SSE_BUSY_RETRY_MS}\n\n".encode()
+    assert asgi.sse_turned_away.value() == before + 1
+    # the rest of the site is unaffected
+    assert call("/restaurants")[0] == 200
+
+def test_unhandled_route_error_is_logged_under_asgi(flask_app, monkeypatch, capsys):
+    def broken():
+        raise RuntimeError("boom in a WSGI route")
+    monkeypatch.setitem(flask_app.view_functions, "restaurants", broken)
+    monkeypatch.setitem(flask_app.config, "PROPAGATE_EXCEPTIONS", False)
+    # pytest's log capture stands in for Flask's default handler, which writes to environ["wsgi.errors"]
+    monkeypatch.setattr(flask_app.logger, "handlers", [flask.logging.default_handler])
+    assert call("/restaurants")[0] == 500
+    err = capsys.readouterr().err
+    assert "RuntimeError: boom in a WSGI route" in err and "Logging error" not in err
+
+def test_head_gets_headers_without_a_body(make_restaurant):
+    restaurant_id, _ = make_restaurant()
+    status, headers, body = call(f"/api/v1/restaurants/{restaurant_id}", method="HEAD")
+    assert status == 200 and int(headers[b"content-length"]) > 0 and body == b""
+
+def test_failure_after_the_response_began_sends_no_second_start(make_restaurant):
+    restaurant_id, _ = make_restaurant()
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+        if message["type"] == "http.response.body":
+            raise OSError("client went away")
+    asyncio.run(asgi.app(_scope(f"/api/v1/restaurants/{restaurant_id}"), _receive, send))
+    assert [m["type"] for m in sent] == ["http.response.start", "http.response.body"]
@@ -0,0 +1,69 @@
+# tests/test_cache.py
+import multiprocessing
+import os
+import threading
+
+import pytest
+
+from cache import FileVersions, LocalVersions, ReadThroughCache
+
+def _bump_many(directory, n):
+    versions = FileVersions(directory)
+    for _ in range(n):
+        versions.bump("ORDERS")
+
+def test_file_versions_stay_fixed_size(tmp_path):
+    versions = FileVersions(str(tmp_path))
+    assert versions.get("ORDERS") == 0
+    for _ in range(1000):
+        versions.bump("ORDERS")
+    assert versions.get("ORDERS") == 1000
+    assert os.path.getsize(tmp_path / "ORDERS.version") == 8
+
+def test_file_versions_are_shared_between_instances(tmp_path):
+    reader, writer = FileVersions(str(tmp_path)), FileVersions(str(tmp_path))
+    before = reader.get("COUPON")  # opens and keeps the descriptor
+    writer.bump("COUPON")
+    assert reader.get("COUPON") == before + 1
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_concurrent_bumps_from_processes_and_threads_all_count(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_bump_many, args=(str(tmp_path), 200)) for _ in range(4)]
+    threads = [threading.Thread(target=_bump_many, args=(str(tmp_path), 200)) for _ in range(4)]
+    for w in procs + threads:
+        w.start()
+    for w in procs + threads:
+        w.join()
+    assert all(p.exitcode == 0 for p in procs)
+    assert FileVersions(str(tmp_path)).get("ORDERS") == 1600
+
+def test_read_through_cache_serves_until_a_table_changes():
+    versions = LocalVersions()
+    cache = ReadThroughCache("t", ("A", "B"), versions=versions)
+    loads = []
+    load = lambda: loads.append(1) or len(loads)
+    assert cache.get("k", load) == 1
+    assert cache.get("k", load) == 1
+    versions.bump("B")
+    assert cache.get("k", load) == 2
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+def test_write_during_load_is_not_served_afterwards():
+    versions = LocalVersions()
+    cache = ReadThroughCache("t", ("A",), versions=versions)
+
+    def load_racing_a_write():
+        versions.bump("A")  # the write commits while the old value is being read
+        return "stale"
+    assert cache.get("k", load_racing_a_write) == "stale"
+    assert cache.get("k", lambda: "fresh") == "fresh"
+
+def test_lru_eviction_and_ttl():
+    cache = ReadThroughCache("t", ("A",), max_entries=2, versions=LocalVersions())
+    for key in "abc":
+        cache.get(key, lambda: key)
+    assert cache.stats()["evictions"] == 1 and cache.stats()["size"] == 2
+    expired = ReadThroughCache("t", ("A",), ttl=0, versions=LocalVersions())
+    expired.get("k", lambda: 1)
+    assert expired.get("k", lambda: 2) == 2
@@ -0,0 +1,130 @@
+# tests/test_coupons.py
+import itertools
+from decimal import Decimal
+
+import pytest
+
+from cache import invalidate
+from conftest import fetchone
+from coupons import Coupon, coupon_index, discount_amount
+from orders import OrderError, place_order
+
+_codes = itertools.count(1)
+
+@pytest.fixture
+def make_coupon(conn):
+    def make(discount, max_redemptions=None, expiry_date="2099-12-31"):
+        code = f"TEST{next(_codes)}"
+        with conn.cursor() as cur:
+            cur.execute("INSERT INTO COUPON (Code, Discount, Expiry_Date, Max_Redemptions) VALUES (%s, %s, %s, %s)",
+                        (code, discount, expiry_date, max_redemptions))
+        invalidate("COUPON")
+        return code
+    return make
+
+def _total(conn, order_id):
+    return float(fetchone(conn, "SELECT Total_Amount FROM ORDERS WHERE Order_ID = %s", (order_id,))["Total_Amount"])
+
+def test_coupon_discount_applies_at_checkout(conn, customer_id, make_restaurant, make_coupon):
+    restaurant_id, (item,) = make_restaurant(prices=(15,))
+    code = make_coupon(50)
+    order_id, total, _ = place_order(conn, customer_id, restaurant_id, [[item, 1]], coupon_code=code.lower())
+    assert total == Decimal("7.50") and _total(conn, order_id) == 7.5
+
+@pytest.mark.parametrize("via_api", [False, True])
+def test_editing_a_discounted_order_keeps_cents(client, conn, customer_id, make_restaurant, make_coupon, via_api):
+    restaurant_id, (main, side) = make_restaurant(prices=(15, 3))
+    order_id, _, _ = place_order(conn, customer_id, restaurant_id, [[main, 1]], coupon_code=make_coupon(50))
+    if via_api:
+        assert client.post(f"/api/v1/orders/{order_id}/items", json={"item_id": side, "quantity": 1}).status_code == 201
+    else:
+        client.post(f"/order_details/add/{order_id}", data={"item_id": side, "quantity": 1})
+    assert _total(conn, order_id) == 9.0
+    if via_api:
+        assert client.delete(f"/api/v1/orders/{order_id}/items/{side}").status_code == 204
+    else:
+        client.get(f"/order_details/delete/{order_id}/{side}")
+    assert _total(conn, order_id) == 7.5
+
+def test_redemption_cap_is_enforced(conn, customer_id, make_restaurant, make_coupon):
+    restaurant_id, (item,) = make_restaurant()
+    code = make_coupon(10, max_redemptions=1)
+    place_order(conn, customer_id, restaurant_id, [[item, 1]], coupon_code=code)
+    orders_before = fetchone(conn, "SELECT COUNT(*) AS n FROM ORDERS")["n"]
+    with pytest.raises(OrderError, match="fully redeemed|no longer available"):
+        place_order(conn, customer_id, restaurant_id, [[item, 1]], coupon_code=code)
+    assert fetchone(conn, "SELECT COUNT(*) AS n FROM ORDERS")["n"] == orders_before
+    assert fetchone(conn, "SELECT Redemption_Count FROM COUPON WHERE Code = %s", (code,))["Redemption_Count"] == 1
+
+def test_redeem_rechecks_the_cap_in_the_transaction(conn, customer_id, make_restaurant, make_coupon):
+    restaurant_id, (item,) = make_restaurant()
+    code = make_coupon(10, max_redemptions=1)
+    coupon_index.lookup(conn, code)  # index loaded while the code is still available
+    with conn.cursor() as cur:  # another worker redeems it meanwhile
+        cur.execute("UPDATE COUPON SET Redemption_Count = 1 WHERE Code = %s", (code,))
+    with pytest.raises(OrderError, match="no longer available"):
+        place_order(conn, customer_id, restaurant_id, [[item, 1]], coupon_code=code)
+
+def test_expired_and_unknown_codes_are_rejected(conn, customer_id, make_restaurant, make_coupon):
+    restaurant_id, (item,) = make_restaurant()
+    for code in (make_coupon(10, expiry_date="2001-01-01"), "NOSUCHCODE"):
+        with pytest.raises(OrderError, match="Unknown or expired"):
+            place_order(conn, customer_id, restaurant_id, [[item, 1]], coupon_code=code)
+
+@pytest.mark.parametrize("discount", [150, 0, -5, "nan", "lots"])
+def test_api_rejects_out_of_range_discounts(client, discount):
+    resp = client.post("/api/v1/coupons", json={"code": f"BAD{next(_codes)}", "discount": discount})
+    assert resp.status_code == 400
+
+def test_api_accepts_a_valid_discount(client):
+    resp = client.post("/api/v1/coupons", json={"code": f" ok{next(_codes)} ", "discount": "12.5"})
+    assert resp.status_code == 201
+    data = resp.get_json()["data"]
+    assert data["Code"].startswith("OK") and data["Discount"] == 12.5
+
+def test_legacy_discount_above_100_is_clamped(conn, customer_id, make_restaurant, make_coupon):
+    restaurant_id, (item,) = make_restaurant(prices=(20,))
+    order_id, total, _ = place_order(conn, customer_id, restaurant_id, [[item, 1]], coupon_code=make_coupon(150))
+    assert total == 0 and _total(conn, order_id) == 0
+    assert discount_amount(Decimal("20"), Coupon(1, "X", Decimal(100), None, None)) == Decimal("20.00")
+
+@pytest.mark.parametrize("subtotal", ["-1", "NaN", "Infinity", "abc"])
+def test_validate_rejects_bad_subtotals(client, make_coupon, subtotal):
+    resp = client.get(f"/api/v1/coupons/validate?code={make_coupon(10)}&subtotal={subtotal}")
+    assert resp.status_code == 400
+
+def test_validate_reports_the_discount(client, make_coupon):
+    resp = client.get(f"/api/v1/coupons/validate?code={make_coupon(25)}&subtotal=40")
+    data = resp.get_json()["data"]
+    assert data["valid"] and data["discount"] == 10.0 and data["total"] == 30.0
+
+@pytest.mark.parametrize("field, value", [("max_redemptions", "ten"), ("max_redemptions", -1),
+                                          ("max_redemptions", 2.5), ("max_redemptions", True),
+                                          ("expiry_date", "31/12/2099"), ("expiry_date", "2099-02-30")])
+def test_api_rejects_bad_limits(client, field, value):
+    resp = client.post("/api/v1/coupons", json={"code": f"BAD{next(_codes)}", "discount": 10, field: value})
+    assert resp.status_code == 400
+
+@pytest.mark.parametrize("field, value", [("max_redemptions", "ten"), ("expiry_date", "next week")])
+def test_form_rejects_bad_limits(client, conn, field, value):
+    code = f"FORM{next(_codes)}"
+    client.post("/coupons/add", data={"code": code, "discount": "10", field: value})
+    assert fetchone(conn, "SELECT COUNT(*) AS n FROM COUPON WHERE Code = %s", (code,))["n"] == 0
+
+def test_form_stores_valid_limits(client, conn):
+    code = f"FORM{next(_codes)}"
+    client.post("/coupons/add", data={"code": code, "discount": "10", "max_redemptions": " 3 ",
+                                      "expiry_date": "2099-12-31"})
+    row = fetchone(conn, "SELECT Max_Redemptions, Expiry_Date FROM COUPON WHERE Code = %s", (code,))
+    assert row["Max_Redemptions"] == 3 and str(row["Expiry_Date"]) == "2099-12-31"
+
+def test_bad_legacy_row_does_not_break_other_codes(client, conn, make_coupon):
+    bad, good = make_coupon(10, max_redemptions="ten"), make_coupon(10)  # stored as TEXT on SQLite
+    try:
+        resp = client.get(f"/api/v1/coupons/validate?code={good}&subtotal=10")
+        assert resp.status_code == 200 and resp.get_json()["data"]["valid"]
+        assert not client.get(f"/api/v1/coupons/validate?code={bad}").get_json()["data"]["valid"]
+    finally:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM COUPON WHERE Code = %s", (bad,))
+        invalidate("COUPON")
@@ -0,0 +1,118 @@
+# tests/test_db.py
+import time
+
+import pymysql
+import pytest
+from pymysql.constants import SERVER_STATUS
+
+from db import ConnectionPool, PoolTimeout, _translate_query
+
+@pytest.mark.parametrize("query, expected", [
+    ("SELECT * FROM T WHERE a = %s AND b = %s", ("SELECT * FROM T WHERE a = ? AND b = ?", "qmark")),
+    ("SELECT * FROM T WHERE a = %(a)s OR b = %(a)s", ("SELECT * FROM T WHERE a = :a OR b = :a", "named")),
+    ("SELECT '%s', \"%s\", `%s` FROM T WHERE a = %s", ("SELECT '%s', \"%s\", `%s` FROM T WHERE a = ?", "qmark")),
+    ("SELECT 'it''s %s' WHERE a = %s", ("SELECT 'it''s %s' WHERE a = ?", "qmark")),
+    ("SELECT * FROM T WHERE Name LIKE %s ESCAPE '\\' AND Pct = '10%%' AND x %% 2 = %s",
+     ("SELECT * FROM T WHERE Name LIKE ? ESCAPE '\\' AND Pct = '10%' AND x % 2 = ?", "qmark")),
+    ("SELECT 1 -- don't use %s here\nWHERE a = %s", ("SELECT 1 -- don't use %s here\nWHERE a = ?", "qmark")),
+    ("SELECT 1 /* isn't %s */ WHERE a = %s", ("SELECT 1 /* isn't %s */ WHERE a = ?", "qmark")),
+    ("SELECT 100 %% 7", ("SELECT 100 % 7", None)),
+])
+def test_translate_query(query, expected):
+    assert _translate_query(query, True) == expected
+
+def test_query_without_params_is_untouched():
+    assert _translate_query("SELECT '100%%' WHERE a = %s", False) == ("SELECT '100%%' WHERE a = %s", None)
+
+def test_translations_are_cached():
+    query = "SELECT * FROM T WHERE cached = %s"
+    first = _translate_query(query, True)
+    hits = _translate_query.cache_info().hits
+    assert _translate_query(query, True) is first
+    assert _translate_query.cache_info().hits == hits + 1
+
+def test_mixed_placeholder_styles_are_rejected():
+    with pytest.raises(ValueError, match="mixes"):
+        _translate_query("SELECT * FROM T WHERE a = %s AND b = %(b)s", True)
+
+def test_compat_cursor_runs_translated_queries(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT %s AS a, %s || '%%' AS b -- don't\n", (1, "50"))
+        assert cur.fetchone() == {"a": 1, "b": "50%"}
+        cur.execute("SELECT %(x)s AS x, %(x)s + 1 AS y", {"x": 2})
+        assert cur.fetchone() == {"x": 2, "y": 3}
+        with pytest.raises(TypeError):
+            cur.execute("SELECT %(x)s", (1,))
+
+# -------- ConnectionPool --------
+class _FakeMySQL:
+    """Just enough of a pymysql connection for the pool: transaction and autocommit flags."""
+    def __init__(self):
+        self.open, self.in_trans, self.auto, self.rollbacks, self.ping_fails = True, False, True, 0, False
+
+    @property
+    def server_status(self):
+        return SERVER_STATUS.SERVER_STATUS_IN_TRANS if self.in_trans else 0
+
+    def begin(self): self.in_trans = True
+    def rollback(self): self.in_trans, self.rollbacks = False, self.rollbacks + 1
+    def get_autocommit(self): return self.auto
+    def autocommit(self, value): self.auto = value
+    def close(self): self.open = False
+
+    def ping(self, reconnect=False):
+        if self.ping_fails:
+            raise pymysql.err.OperationalError(2006, "MySQL server has gone away")
+
+@pytest.fixture
+def pool():
+    made = []
+
+    def factory():
+        made.append(_FakeMySQL())
+        return made[-1]
+    pool = ConnectionPool(factory, max_size=2, timeout=0.05, recycle=3600, ping_after=3600)
+    pool.made = made
+    return pool
+
+def test_exhausted_pool_times_out_then_recovers(pool):
+    first, second = pool.checkout(), pool.checkout()
+    started = time.monotonic()
+    with pytest.raises(PoolTimeout):
+        pool.checkout()
+    assert time.monotonic() - started >= 0.05 and pool.stats()["timeouts"] == 1
+    raw = first._raw
+    first.close()
+    with pool.checkout() as again:
+        assert again._raw is raw  # reused, not a new connection
+    second.close()
+    assert pool.stats()["created"] == 2 and pool.stats()["in_use"] == 0
+
+def test_failed_transaction_is_rolled_back_and_reset_before_reuse(pool):
+    with pytest.raises(ValueError):
+        with pool.checkout() as conn:
+            conn.begin()
+            conn.autocommit(False)
+            raise ValueError("application error mid-transaction")
+    with pool.checkout() as conn:
+        raw = conn._raw
+        assert raw is pool.made[0] and raw.rollbacks == 1
+        assert not raw.in_trans and raw.auto
+    assert pool.stats()["discarded"] == 0
+
+def test_broken_connections_are_dropped(pool):
+    with pytest.raises(pymysql.err.OperationalError):
+        with pool.checkout():
+            raise pymysql.err.OperationalError(2013, "Lost connection to MySQL server")
+    with pool.checkout() as conn:
+        conn._raw.close()  # the server hung up while it was checked out
+    assert pool.stats()["idle"] == 0 and pool.stats()["discarded"] == 2
+    assert not pool.made[0].open
+
+def test_idle_connection_failing_its_ping_is_replaced(pool):
+    with pool.checkout() as conn:
+        stale = conn._raw
+    stale.ping_fails, pool.ping_after = True, 0
+    with pool.checkout() as conn:
+        assert conn._raw is not stale and not stale.open
+    assert pool.stats()["discarded"] == 1
@@ -0,0 +1,150 @@
+# tests/test_dispatch.py
+import threading
+import time
+
+import pytest
+
+from conftest import fetchone
+from dispatch import Backpressure, Dispatcher, GridIndex, LocationBatcher, haversine_km, utc_timestamp
+
+CELL = 0.01
+
+def _index(*agents):
+    index = GridIndex(CELL)
+    for agent_id, lat, lon in agents:
+        index.upsert(agent_id, lat, lon, seen=1.0)
+    return index
+
+def _anyone(agent_id):
+    return True
+
+def test_agent_across_a_cell_border_beats_one_in_the_same_cell():
+    # the pickup sits at the east edge of its cell; agent 2 is just over the border
+    index = _index((1, 12.0051, 77.0001), (2, 12.0051, 77.0102))
+    agent_id, km = index.nearest(12.0051, 77.0099, _anyone)
+    assert agent_id == 2 and km == pytest.approx(haversine_km(12.0051, 77.0099, 12.0051, 77.0102))
+
+def test_search_widens_until_it_finds_a_rider():
+    index = _index((7, 12.0555, 77.0555))  # five cells out in both directions
+    agent_id, km = index.nearest(12.0005, 77.0005, _anyone)
+    assert agent_id == 7 and 8 < km < 9
+    assert index.nearest(12.0005, 77.0005, _anyone, max_km=5) is None
+
+def test_nearest_skips_agents_that_are_not_accepted():
+    index = _index((1, 12.0, 77.0), (2, 12.0, 77.003), (3, 12.0, 77.03))
+    assert index.nearest(12.0, 77.0, lambda a: a != 1)[0] == 2
+    assert index.nearest(12.0, 77.0, lambda a: a == 3)[0] == 3
+
+def test_moving_agent_changes_cell_and_late_pings_are_ignored():
+    index = _index((1, 12.0, 77.0))
+    index.upsert(1, 12.5, 77.5, seen=5.0)
+    index.upsert(1, 12.0, 77.0, seen=2.0)  # arrived late
+    assert index.nearest(12.0, 77.0, _anyone, max_km=5) is None
+    assert index.nearest(12.5, 77.5, _anyone)[0] == 1 and len(index) == 1
+
+@pytest.fixture
+def riders(conn):
+    """Three agents that exist in DELIVERY_AGENT, tracked by a fresh Dispatcher at 20.0, 80.0."""
+    dispatcher = Dispatcher(cell_deg=CELL)
+    agents = []
+    with conn.cursor() as cur:
+        for i in range(3):
+            cur.execute("INSERT INTO DELIVERY_AGENT (Name) VALUES (%s)", (f"Rider {i}",))
+            agents.append(cur.lastrowid)
+    for i, agent_id in enumerate(agents):
+        dispatcher.ping(agent_id, 20.0, 80.0 + i * 0.001)
+    return dispatcher, agents
+
+def test_open_delivery_keeps_a_rider_busy_whatever_its_date(conn, customer_id, make_restaurant, riders):
+    dispatcher, (nearest, second, _) = riders
+    restaurant_id, _ = make_restaurant()
+    with conn.cursor() as cur:
+        cur.execute("INSERT INTO ORDERS (Customer_ID, Restaurant_ID, Order_Date, Total_Amount) "
+                    "VALUES (%s, %s, '2020-01-01 12:00:00', 10)", (customer_id, restaurant_id))
+        cur.execute("INSERT INTO DELIVERY (Order_ID, Agent_ID, Delivery_Date, Status) VALUES (%s, %s, %s, %s)",
+                    (cur.lastrowid, nearest, "2020-01-01", "Out for Delivery"))
+        delivery_id = cur.lastrowid
+    dispatcher.refresh(conn, force=True)
+    assert dispatcher.nearest(20.0, 80.0)[0] == second
+    with conn.cursor() as cur:
+        cur.execute("UPDATE DELIVERY SET Status = 'Delivered' WHERE Delivery_ID = %s", (delivery_id,))
+    dispatcher.refresh(conn, force=True)
+    assert dispatcher.nearest(20.0, 80.0)[0] == nearest
+
+def test_concurrent_claims_never_share_a_rider(riders):
+    dispatcher, agents = riders
+    results, start = [], threading.Barrier(8)
+
+    def claim():
+        start.wait()
+        found = dispatcher.claim(20.0, 80.0)
+        results.append(found and found[0])
+    threads = [threading.Thread(target=claim) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    claimed = [r for r in results if r]
+    assert sorted(claimed) == sorted(agents) and results.count(None) == 5
+    dispatcher.release(agents[0])
+    assert dispatcher.claim(20.0, 80.0)[0] == agents[0]
+
+# -------- LocationBatcher --------
+def _until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+def _location(conn, agent_id):
+    return fetchone(conn, "SELECT Latitude, Longitude, Last_Updated FROM RIDER_LOCATION WHERE Agent_ID = %s",
+                    (agent_id,))
+
+def _batcher(**kwargs):
+    return LocationBatcher(**dict({"flush_seconds": 3600, "max_pending": 100, "batch_size": 100,
+                                   "index": Dispatcher(cell_deg=CELL)}, **kwargs))
+
+def test_newest_ping_per_agent_wins(conn, riders):
+    _, (agent_id, _, _) = riders
+    batcher = _batcher()
+    now = time.time()
+    batcher.submit([(agent_id, 21.0, 81.0, now - 30), (agent_id, 21.2, 81.2, now - 10)])
+    batcher.submit([(agent_id, 21.1, 81.1, now - 20)])  # older than what is pending
+    assert batcher.pending() == 1 and batcher.flush() == 1
+    row = _location(conn, agent_id)
+    assert (float(row["Latitude"]), float(row["Longitude"])) == (21.2, 81.2)
+
+def test_rows_are_stamped_with_the_receive_time(conn, riders):
+    _, (agent_id, _, _) = riders
+    batcher = _batcher()
+    before = time.time()
+    batcher.submit([(agent_id, 21.0, 81.0, before - 3600)])  # the rider's clock is an hour behind
+    batcher.flush()
+    assert utc_timestamp(_location(conn, agent_id)["Last_Updated"]) >= int(before)
+
+def test_full_batch_flushes_without_waiting_for_the_interval(conn, riders):
+    _, agents = riders
+    batcher = _batcher(batch_size=2)
+    batcher.submit([(a, 22.0, 82.0, time.time()) for a in agents[:2]])
+    assert _until(lambda: batcher.pending() == 0)
+    assert all(_location(conn, a) for a in agents[:2])
+
+def test_interval_flushes_a_partial_batch(conn, riders):
+    _, (agent_id, _, _) = riders
+    batcher = _batcher(flush_seconds=0.05)
+    batcher.submit([(agent_id, 23.0, 83.0, time.time())])
+    assert _until(lambda: batcher.pending() == 0 and batcher.last_flush is not None)
+    assert float(_location(conn, agent_id)["Latitude"]) == 23.0
+
+def test_full_queue_pushes_back_but_accepts_pending_agents(riders):
+    _, (a, b, c) = riders
+    batcher = _batcher(max_pending=2)
+    now = time.time()
+    batcher.submit([(a, 24.0, 84.0, now), (b, 24.0, 84.0, now)])
+    with pytest.raises(Backpressure) as raised:
+        batcher.submit([(c, 24.0, 84.0, now)])
+    assert raised.value.retry_after >= 1
+    assert batcher.submit([(a, 24.1, 84.1, now + 1)]) == 1  # coalesces; takes no new slot
+    assert batcher.pending() == 2
@@ -0,0 +1,61 @@
+# tests/test_events.py
+import re
+import time
+
+import pytest
+
+import app
+import events
+from conftest import fetchone
+from events import DatabaseBackend, EventBroker, LocalBackend, sse_stream
+
+def _ids(chunks):
+    return [int(i) for i in re.findall(r"^id: (\d+)$", "".join(chunks), re.M)]
+
+def _types(chunks):
+    return re.findall(r"^event: (\S+)$", "".join(chunks), re.M)
+
+@pytest.fixture
+def short_streams(monkeypatch):
+    monkeypatch.setattr(events, "EVENTS_STREAM_SECONDS", 0.3)
+    monkeypatch.setattr(events, "EVENTS_HEARTBEAT_SECONDS", 0.05)
+
+def test_types_filter_on_the_event_family(short_streams):
+    broker = EventBroker(LocalBackend())
+    stream = sse_stream(broker, types={"order"})
+    assert next(stream) == "retry: 3000\n\n"  # subscribed from here on
+    broker.publish("order.created", order_id=1)
+    broker.publish("delivery.created", delivery_id=2)
+    broker.publish("order_detail.added", order_id=1)
+    broker.publish("order.deleted", order_id=1)
+    assert _types(stream) == ["order.created", "order.deleted"]
+
+def test_stream_ends_after_its_time_and_unsubscribes(short_streams):
+    broker = EventBroker(LocalBackend())
+    started = time.monotonic()
+    chunks = list(sse_stream(broker))
+    assert 0.3 <= time.monotonic() - started < 2
+    assert ": keep-alive\n\n" in chunks and broker.stats()["subscribers"] == 0
+
+def test_events_route_resumes_from_last_event_id(client, conn, short_streams, monkeypatch):
+    broker = EventBroker(DatabaseBackend(poll_seconds=0.05))
+    monkeypatch.setattr(app, "broker", broker)
+    for n in range(3):
+        broker.publish("order.created", order_id=n)
+    newest = fetchone(conn, "SELECT MAX(Event_ID) AS m FROM EVENT_LOG")["m"]
+    resp = client.get("/events?types=order", headers={"Last-Event-ID": str(newest - 2)})
+    assert resp.mimetype == "text/event-stream"
+    body = resp.get_data(as_text=True)
+    assert _ids([body]) == [newest - 1, newest]  # replayed once, not again when the poller sees them
+
+def test_full_subscriber_queue_drops_instead_of_blocking(monkeypatch):
+    broker = EventBroker(LocalBackend())
+    monkeypatch.setattr(events, "EVENTS_QUEUE_SIZE", 2)
+    slow = broker.subscribe()
+    monkeypatch.setattr(events, "EVENTS_QUEUE_SIZE", 100)
+    healthy = broker.subscribe()
+    started = time.monotonic()
+    for n in range(5):
+        broker.publish("order.created", order_id=n)
+    assert time.monotonic() - started < 0.5
+    assert slow.qsize() == 2 and healthy.qsize() == 5 and broker.dropped == 3
@@ -0,0 +1,52 @@
+# tests/test_export.py
+import export
+
+class _FakeCursor:
+    def __init__(self, conn, rows):
+        self.conn, self.rows, self.description = conn, list(rows), [("Order_ID",), ("Total_Amount",)]
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
+    def execute(self, sql, params=None): self.conn.statements.append(sql.strip())
+    def close(self): pass
+
+    def fetchmany(self, n):
+        batch, self.rows = self.rows[:n], self.rows[n:]
+        return batch
+
+class _FakeMySQLConn:
+    """Stands in for a pooled MySQL connection; records what runs on it."""
+    def __init__(self, rows):
+        self.rows, self.statements, self.discarded = rows, [], False
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): pass
+    def cursor(self, cursorclass=None): return _FakeCursor(self, self.rows if cursorclass else ())
+    def discard(self): self.discarded = True
+
+def _fake(monkeypatch, rows):
+    conn = _FakeMySQLConn(rows)
+    monkeypatch.setattr(export, "get_conn", lambda readonly=False: conn)
+    monkeypatch.setattr(export, "is_sqlite_conn", lambda c: False)
+    return conn
+
+def test_write_timeout_is_reset_after_the_export(monkeypatch):
+    conn = _fake(monkeypatch, [{"Order_ID": i, "Total_Amount": 1} for i in range(5)])
+    body = "".join(export.stream_export("orders", "csv", batch_size=2))
+    assert body.splitlines()[0] == "Order_ID,Total_Amount" and len(body.splitlines()) == 6
+    assert conn.statements[0] == "SET SESSION net_write_timeout = 3600"
+    assert conn.statements[-1] == "SET SESSION net_write_timeout = DEFAULT"
+    assert not conn.discarded
+
+def test_abandoned_export_discards_instead_of_resetting(monkeypatch):
+    conn = _fake(monkeypatch, [{"Order_ID": i, "Total_Amount": 1} for i in range(5)])
+    chunks = export.stream_export("orders", "jsonl", batch_size=2)
+    next(chunks)
+    chunks.close()  # client went away
+    assert conn.discarded
+    assert "SET SESSION net_write_timeout = DEFAULT" not in conn.statements
+
+def test_sqlite_export_streams_rows(flask_app, client):
+    resp = client.get("/export/orders.jsonl")
+    assert resp.status_code == 200
+    assert resp.get_data(as_text=True).count("\n") >= 1
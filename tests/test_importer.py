@@ -0,0 +1,85 @@
+# tests/test_importer.py
+import io
+import itertools
+from contextlib import contextmanager
+
+import pytest
+
+import importer
+from conftest import fetchone
+from importer import import_records, read_records
+
+_runs = itertools.count(1)
+
+def _csv(*lines):
+    return io.StringIO("\n".join(lines) + "\n")
+
+def _items(conn, restaurant_id):
+    with conn.cursor() as cur:
+        cur.execute("SELECT Name FROM FOOD_ITEM WHERE Restaurant_ID = %s ORDER BY Item_ID", (restaurant_id,))
+        return [r["Name"] for r in cur.fetchall()]
+
+@pytest.fixture
+def chunks(monkeypatch):
+    """Counts the transactions import_records opens (one per chunk it commits)."""
+    opened = []
+    real = importer.transaction
+
+    @contextmanager
+    def counting(conn):
+        opened.append(conn)
+        with real(conn):
+            yield conn
+    monkeypatch.setattr(importer, "transaction", counting)
+    return opened
+
+def test_rows_are_committed_in_chunks(conn, make_restaurant, chunks):
+    restaurant_id, _ = make_restaurant(prices=())
+    rows = [f"Dish {i},{i}.50,{restaurant_id}" for i in range(5)]
+    report = import_records(conn, "food_items", read_records(_csv("name,price,restaurant_id", *rows), "csv"),
+                            chunk_size=2)
+    assert report.to_dict()["inserted"] == 5 and len(chunks) == 3
+    assert _items(conn, restaurant_id) == [f"Dish {i}" for i in range(5)]
+
+def test_bad_rows_are_reported_by_line_and_the_rest_land(conn, make_restaurant, chunks):
+    restaurant_id, _ = make_restaurant(prices=())
+    data = _csv("name,price,restaurant_id",
+                f"Soup,4,{restaurant_id}",         # line 2
+                f"Salad,5,{restaurant_id}",        # line 3: first chunk ends here
+                "Ghost Dish,6,999999",             # line 4: no such restaurant (FK)
+                f"Stew,not-a-price,{restaurant_id}",  # line 5: fails validation
+                f"Bread,2,{restaurant_id}",        # line 6
+                f"Cake,3,{restaurant_id}")         # line 7
+    report = import_records(conn, "food_items", read_records(data, "csv"), chunk_size=2).to_dict()
+    errors = {e["line"]: e["error"] for e in report["errors"]}
+    assert sorted(errors) == [4, 5] and "FOREIGN KEY" in errors[4] and errors[5] == "price must be a number"
+    assert report["inserted"] == 4 and report["failed"] == 2 and report["rows_read"] == 6
+    assert _items(conn, restaurant_id) == ["Soup", "Salad", "Bread", "Cake"]
+
+def test_unknown_restaurant_name_is_rejected(conn, make_restaurant):
+    restaurant_id, _ = make_restaurant(prices=(), name=f"Importer Kitchen {next(_runs)}")
+    name = fetchone(conn, "SELECT Name FROM RESTAURANT WHERE Restaurant_ID = %s", (restaurant_id,))["Name"]
+    data = _csv('{"name": "Naan", "price": 2, "restaurant": "%s"}' % name,
+                '{"name": "Rice", "price": 2, "restaurant": "Nowhere Diner"}')
+    report = import_records(conn, "food_items", read_records(data, "jsonl")).to_dict()
+    assert report["inserted"] == 1 and report["errors"] == [{"line": 2, "error": "unknown restaurant 'Nowhere Diner'"}]
+    assert _items(conn, restaurant_id) == ["Naan"]
+
+def test_rerunning_a_file_skips_rows_already_imported(conn):
+    run = f"Rerun{next(_runs)}"
+    lines = ["name,email,phone", f"Ana {run},ana@example.com,", f"Ben {run},,555-0100",
+             f"Ana {run},ana@example.com,"]  # repeated within the file too
+    first = import_records(conn, "customers", read_records(_csv(*lines), "csv")).to_dict()
+    again = import_records(conn, "customers", read_records(_csv(*lines), "csv")).to_dict()
+    assert (first["inserted"], first["skipped"]) == (2, 1)
+    assert (again["inserted"], again["skipped"], again["failed"]) == (0, 3, 0)
+    assert fetchone(conn, "SELECT COUNT(*) AS n FROM CUSTOMER WHERE Name LIKE %s", (f"% {run}",))["n"] == 2
+
+def test_import_route_returns_the_report(client, make_restaurant):
+    restaurant_id, _ = make_restaurant(prices=())
+    upload = io.BytesIO(f"name,price,restaurant_id\nTaco,3,{restaurant_id}\n,1,{restaurant_id}\n".encode())
+    resp = client.post("/import/food_items", data={"file": (upload, "menu.csv")})
+    report = resp.get_json()
+    assert resp.status_code == 200 and report["inserted"] == 1
+    assert report["errors"] == [{"line": 3, "error": "name is required"}]
+    assert client.post("/import/drivers", data={"file": (io.BytesIO(b"x"), "x.csv")}).status_code == 400
@@ -0,0 +1,132 @@
+# tests/test_jobs.py
+from datetime import datetime
+
+import pytest
+
+import app
+import jobs
+import tasks
+from conftest import fetchone
+from jobs import RetryLater, claim, enqueue, run_job, task
+
+calls = []
+
+@task("test_ok")
+def _ok(conn, payload):
+    calls.append(payload)
+
+@task("test_boom")
+def _boom(conn, payload):
+    raise RuntimeError("boom")
+
+@task("test_later")
+def _later(conn, payload):
+    raise RetryLater("not yet", delay=600)
+
+@pytest.fixture
+def queue(conn):
+    """An empty JOB table (other tests leave their jobs behind)."""
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM JOB")
+    calls.clear()
+    return conn
+
+def _job(conn, job_id):
+    return fetchone(conn, "SELECT * FROM JOB WHERE Job_ID = %s", (job_id,))
+
+def _run_due(conn):
+    return [run_job(job, "test-worker") for job in claim(conn, "test-worker", 10)]
+
+def _make_due(conn, job_id):
+    with conn.cursor() as cur:
+        cur.execute("UPDATE JOB SET Run_At = '2000-01-01 00:00:00' WHERE Job_ID = %s", (job_id,))
+
+def test_job_runs_once(queue):
+    job_id = enqueue(queue, "test_ok", {"n": 1})
+    assert _run_due(queue) == ["done"]
+    assert _run_due(queue) == []
+    assert calls == [{"n": 1}] and _job(queue, job_id)["Status"] == "done"
+
+def test_a_claimed_job_is_not_claimed_again(queue):
+    enqueue(queue, "test_ok")
+    assert len(claim(queue, "worker-a", 10)) == 1
+    assert claim(queue, "worker-b", 10) == []
+
+def test_failures_back_off_then_fail(queue):
+    job_id = enqueue(queue, "test_boom", max_attempts=3)
+    outcomes = []
+    for _ in range(3):
+        outcomes += _run_due(queue)
+        job = _job(queue, job_id)
+        if job["Status"] == "queued":
+            assert job["Run_At"] > datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")  # backed off
+            _make_due(queue, job_id)
+    assert outcomes == ["retry", "retry", "failed"]
+    job = _job(queue, job_id)
+    assert job["Status"] == "failed" and job["Attempts"] == 3 and job["Last_Error"] == "RuntimeError: boom"
+
+def test_retry_later_uses_its_delay(queue):
+    job_id = enqueue(queue, "test_later")
+    assert _run_due(queue) == ["retry"]
+    job = _job(queue, job_id)
+    run_at = datetime.strptime(job["Run_At"], "%Y-%m-%d %H:%M:%S")
+    assert 590 < (run_at - datetime.utcnow()).total_seconds() <= 600
+    assert job["Last_Error"] == "not yet"
+
+def test_unknown_task_fails_without_retrying(queue):
+    job_id = enqueue(queue, "no_such_task", max_attempts=5)
+    assert _run_due(queue) == ["failed"]
+    assert _job(queue, job_id)["Attempts"] == 1
+
+def test_expired_lease_is_claimable_again(queue):
+    job_id = enqueue(queue, "test_ok")
+    claim(queue, "dead-worker", 10)
+    with queue.cursor() as cur:
+        cur.execute("UPDATE JOB SET Locked_Until = '2000-01-01 00:00:00' WHERE Job_ID = %s", (job_id,))
+    assert [j["Job_ID"] for j in claim(queue, "worker-b", 10)] == [job_id]
+
+def test_unassigned_order_keeps_waiting_for_a_rider(queue, client, customer_id, make_restaurant, monkeypatch):
+    restaurant_id, _ = make_restaurant()
+    with queue.cursor() as cur:
+        cur.execute("UPDATE RESTAURANT SET Latitude = 12.97, Longitude = 77.59 WHERE Restaurant_ID = %s",
+                    (restaurant_id,))
+    monkeypatch.setattr(app.dispatcher, "assign", lambda conn, rid: None)
+    monkeypatch.setattr(tasks.dispatcher, "assign", lambda conn, rid: None)
+    client.post("/orders/add", data={"customer_id": customer_id, "restaurant_id": restaurant_id})
+    job = fetchone(queue, "SELECT * FROM JOB WHERE Task = 'assign_rider'")
+    assert job["Max_Attempts"] == tasks.ASSIGN_MAX_ATTEMPTS
+    assert tasks.ASSIGN_MAX_ATTEMPTS > jobs.JOB_MAX_ATTEMPTS
+
+    with queue.cursor() as cur:  # well past the generic job retry budget
+        cur.execute("UPDATE JOB SET Attempts = %s WHERE Job_ID = %s", (jobs.JOB_MAX_ATTEMPTS + 3, job["Job_ID"]))
+    assert _run_due(queue) == ["retry"]
+    job = _job(queue, job["Job_ID"])
+    run_at = datetime.strptime(job["Run_At"], "%Y-%m-%d %H:%M:%S")
+    assert (run_at - datetime.utcnow()).total_seconds() <= tasks.ASSIGN_RETRY_SECONDS  # capped, not exponential
+
+def test_add_order_is_atomic(queue, client, customer_id, make_restaurant, monkeypatch):
+    restaurant_id, _ = make_restaurant()
+    monkeypatch.setattr(app.dispatcher, "assign", lambda conn, rid: None)
+
+    def broken_touch(conn, **kwargs):
+        raise RuntimeError("rollup queue unavailable")
+    monkeypatch.setattr(app, "touch_order", broken_touch)
+    before = fetchone(queue, "SELECT COUNT(*) AS n FROM ORDERS")["n"]
+    client.post("/orders/add", data={"customer_id": customer_id, "restaurant_id": restaurant_id})
+    assert fetchone(queue, "SELECT COUNT(*) AS n FROM ORDERS")["n"] == before
+    assert fetchone(queue, "SELECT COUNT(*) AS n FROM JOB")["n"] == 0
+
+def test_add_delivery_is_atomic(queue, client, customer_id, make_restaurant, monkeypatch):
+    restaurant_id, _ = make_restaurant()
+    with queue.cursor() as cur:
+        cur.execute("INSERT INTO DELIVERY_AGENT (Name) VALUES ('Atomic')")
+        agent_id = cur.lastrowid
+        cur.execute("INSERT INTO ORDERS (Customer_ID, Restaurant_ID, Order_Date, Total_Amount) "
+                    "VALUES (%s, %s, '2024-05-01 12:00:00', 10)", (customer_id, restaurant_id))
+        order_id = cur.lastrowid
+
+    def broken_hook(conn, status):
+        raise RuntimeError("job queue unavailable")
+    monkeypatch.setattr(app, "after_delivery_update", broken_hook)
+    client.post("/deliveries/add", data={"order_id": order_id, "agent_id": agent_id, "status": "Delivered"})
+    assert fetchone(queue, "SELECT COUNT(*) AS n FROM DELIVERY WHERE Order_ID = %s", (order_id,))["n"] == 0
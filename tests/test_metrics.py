@@ -0,0 +1,83 @@
+# tests/test_metrics.py
+import re
+
+import pytest
+
+import metrics
+
+_NAME = r"[a-zA-Z_:][a-zA-Z0-9_:]*"
+_SAMPLE = re.compile(rf'^({_NAME})(?:\{{((?:[a-zA-Z_]\w*="(?:[^"\\\n]|\\[\\"n])*",?)*)\}})? (\S+)$')
+_LABEL = re.compile(r'([a-zA-Z_]\w*)="((?:[^"\\]|\\.)*)"')
+_TYPES = {"counter", "gauge", "histogram", "summary", "untyped"}
+
+def parse(text):
+    """Prometheus text format (0.0.4) -> {(name, ((label, value), ...)): float}; fails on anything malformed."""
+    assert text.endswith("\n")
+    samples, types, family = {}, set(), None
+    for line in text.splitlines():
+        if line.startswith("# HELP "):
+            continue
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            assert re.fullmatch(_NAME, name) and kind in _TYPES and name not in types, line
+            types.add(name)
+            family = name
+            continue
+        match = _SAMPLE.match(line)
+        assert match, f"not a sample line: {line!r}"
+        name, labels, value = match.groups()
+        assert family in (name, re.sub(r"_(bucket|sum|count)$", "", name)), f"{name} is not under its # TYPE line"
+        key = (name, tuple(_LABEL.findall(labels or "")))
+        assert key not in samples, f"duplicate series {line!r}"
+        samples[key] = float(value)
+    return samples
+
+def _histogram_count(samples, name, route):
+    return samples.get((f"{name}_count", (("route", route),)), 0)
+
+@pytest.fixture
+def scrape(client):
+    def scrape():
+        resp = client.get("/metrics")
+        assert resp.status_code == 200 and resp.mimetype == "text/plain"
+        return parse(resp.get_data(as_text=True))
+    return scrape
+
+def test_metrics_output_parses_as_prometheus_text(client, scrape):
+    client.get("/restaurants")
+    samples = scrape()
+    buckets = [(labels, v) for (name, labels), v in samples.items()
+               if name == "http_request_seconds_bucket" and ("route", "restaurants") in labels]
+    assert buckets[-1][0][-1] == ("le", "+Inf")
+    assert [v for _, v in buckets] == sorted(v for _, v in buckets)  # cumulative
+    assert buckets[-1][1] == _histogram_count(samples, "http_request_seconds", "restaurants")
+
+def test_escaped_label_values_still_parse():
+    counter = metrics.Counter("test_escaping_total", "Label escaping", ("route",))
+    counter.inc(1, 'a "quoted" back\\slash\nnewline')
+    try:
+        labels = (("route", 'a \\"quoted\\" back\\\\slash\\nnewline'),)
+        assert parse(metrics.render())[("test_escaping_total", labels)] == 1
+    finally:
+        metrics._registry.remove(counter)
+
+def test_requests_are_labelled_by_route_not_path(client, scrape):
+    before = scrape()
+    for order_id in (999991, 999992):
+        assert client.get(f"/order_details/{order_id}").status_code == 200
+    after = scrape()
+    key = ("http_requests_total", (("route", "order_details"), ("status", "200")))
+    assert after[key] == before.get(key, 0) + 2
+    assert _histogram_count(after, "http_request_seconds", "order_details") == \
+        _histogram_count(before, "http_request_seconds", "order_details") + 2
+    assert not [labels for _, labels in after if any("/" in value for _, value in labels)]
+
+def test_cursor_executes_are_counted(conn):
+    selects, rows = metrics.db_queries.value("background", "SELECT"), metrics.db_rows.value("background")
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1 AS a UNION ALL SELECT 2")
+        assert len(cur.fetchall()) == 2
+        with pytest.raises(Exception):
+            cur.execute("SELECT * FROM NO_SUCH_TABLE")  # failed statements count too
+    assert metrics.db_queries.value("background", "SELECT") == selects + 2
+    assert metrics.db_rows.value("background") == rows + 2
@@ -0,0 +1,102 @@
+# tests/test_orders.py
+import pytest
+
+from conftest import fetchone
+from orders import OrderError, place_order
+
+def _count(conn, table):
+    return int(fetchone(conn, f"SELECT COUNT(*) AS n FROM {table}")["n"])
+
+def test_order_and_lines_written_together(conn, customer_id, make_restaurant):
+    restaurant_id, (dal, naan) = make_restaurant(prices=(15, 4.5))
+    order_id, total, _ = place_order(conn, customer_id, restaurant_id, [[dal, 2], {"item_id": naan}, [dal, 1]])
+    assert float(total) == 49.5
+    order = fetchone(conn, "SELECT Total_Amount, Restaurant_ID FROM ORDERS WHERE Order_ID = %s", (order_id,))
+    assert float(order["Total_Amount"]) == 49.5 and order["Restaurant_ID"] == restaurant_id
+    with conn.cursor() as cur:
+        cur.execute("SELECT Item_ID, Quantity FROM ORDER_DETAIL WHERE Order_ID = %s ORDER BY Item_ID", (order_id,))
+        assert [(r["Item_ID"], r["Quantity"]) for r in cur.fetchall()] == [(dal, 3), (naan, 1)]
+
+@pytest.mark.parametrize("cart", [
+    [[999999, 1]],           # unknown item
+    "foreign",               # item of another restaurant
+    [["x", 1]],              # malformed line
+    [[1, 0]],                # non-positive quantity
+    [],                      # empty cart
+])
+def test_rejected_cart_writes_nothing(conn, customer_id, make_restaurant, cart):
+    restaurant_id, (item,) = make_restaurant()
+    _, (other,) = make_restaurant()
+    if cart == "foreign":
+        cart = [[item, 1], [other, 1]]
+    before = {t: _count(conn, t) for t in ("ORDERS", "ORDER_DETAIL", "JOB")}
+    with pytest.raises(OrderError):
+        place_order(conn, customer_id, restaurant_id, cart)
+    assert {t: _count(conn, t) for t in before} == before
+
+@pytest.mark.parametrize("restaurant_id", ["abc", None, "1.5"])
+def test_invalid_restaurant_is_a_client_error(client, restaurant_id):
+    resp = client.post("/orders/place", json={"customer_id": 1, "restaurant_id": restaurant_id or "",
+                                               "items": [[1, 1]]})
+    assert resp.status_code == 400
+    resp = client.post("/api/v1/orders", json={"customer_id": 1, "restaurant_id": restaurant_id,
+                                               "items": [[1, 1]]})
+    assert resp.status_code == 400
+
+def test_failed_add_order_releases_the_reserved_rider(client, make_restaurant, monkeypatch):
+    import app
+    restaurant_id, _ = make_restaurant()
+    released = []
+    monkeypatch.setattr(app.dispatcher, "assign", lambda conn, rid: 4242)
+    monkeypatch.setattr(app.dispatcher, "release", released.append)
+    # no such customer: the FK check fails the INSERT after the rider was reserved
+    resp = client.post("/orders/add", data={"customer_id": 999999, "restaurant_id": restaurant_id})
+    assert resp.status_code == 302
+    assert released == [4242]
+
+def test_rejected_place_order_releases_the_reserved_rider(conn, customer_id, make_restaurant, monkeypatch):
+    import orders
+    restaurant_id, _ = make_restaurant()
+    released = []
+    monkeypatch.setattr(orders.dispatcher, "assign", lambda conn, rid: 4242)
+    monkeypatch.setattr(orders.dispatcher, "release", released.append)
+    with pytest.raises(OrderError):
+        place_order(conn, customer_id, restaurant_id, [[999999, 1]])
+    assert released == [4242]
+
+@pytest.mark.parametrize("path", ["/orders/place", "/api/v1/orders"])
+def test_order_created_event_names_the_dispatched_rider(client, conn, customer_id, make_restaurant,
+                                                        monkeypatch, path):
+    import api
+    import app
+    import orders
+    restaurant_id, (item,) = make_restaurant()
+    with conn.cursor() as cur:
+        cur.execute("INSERT INTO DELIVERY_AGENT (Name) VALUES ('Nearest')")
+        rider = cur.lastrowid
+    monkeypatch.setattr(orders.dispatcher, "assign", lambda conn, rid: rider)
+    events = []
+    for module in (app, api):
+        monkeypatch.setattr(module, "publish", lambda type, **data: events.append((type, data)))
+    resp = client.post(path, json={"customer_id": customer_id, "restaurant_id": restaurant_id, "items": [[item, 1]]})
+    assert resp.status_code == 201
+    assert events[0][0] == "order.created" and events[0][1]["agent_id"] == rider
+
+def test_failed_add_delivery_releases_the_reserved_rider(client, conn, customer_id, make_restaurant):
+    import app
+    restaurant_id, _ = make_restaurant()
+    with conn.cursor() as cur:
+        cur.execute("UPDATE RESTAURANT SET Latitude = 45.4321, Longitude = 12.3456 WHERE Restaurant_ID = %s",
+                    (restaurant_id,))
+        cur.execute("INSERT INTO ORDERS (Customer_ID, Restaurant_ID, Order_Date, Total_Amount) "
+                    "VALUES (%s, %s, '2024-05-01 12:00:00', 10)", (customer_id, restaurant_id))
+        order_id = cur.lastrowid
+    ghost = 987654  # tracked by the dispatcher but not in DELIVERY_AGENT: the INSERT's FK check fails
+    app.dispatcher.ping(ghost, 45.4321, 12.3456)
+    try:
+        resp = client.post("/deliveries/add", data={"order_id": order_id})
+        assert resp.status_code == 302
+        assert fetchone(conn, "SELECT COUNT(*) AS n FROM DELIVERY WHERE Order_ID = %s", (order_id,))["n"] == 0
+        assert app.dispatcher.nearest(45.4321, 12.3456)[0] == ghost  # not held any more
+    finally:
+        app.dispatcher.forget(ghost)
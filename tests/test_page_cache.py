@@ -0,0 +1,68 @@
+# tests/test_page_cache.py
+import itertools
+
+import pytest
+
+import app
+import db
+from cache import cache_stats
+
+_names = (f"000 Page Cache Bistro {n}" for n in itertools.count(1))  # sorts onto the first page
+
+def _stats():
+    return cache_stats()["page_restaurants"]
+
+def _add(client, name):
+    resp = client.post("/restaurants/add", data={"name": name})
+    assert resp.status_code == 302
+    return resp
+
+def test_repeat_view_is_served_with_an_etag(client, make_restaurant):
+    make_restaurant()
+    first = client.get("/restaurants")
+    hits = _stats()["hits"]
+    second = client.get("/restaurants")
+    assert first.status_code == second.status_code == 200
+    assert second.data == first.data and second.headers["ETag"] == first.headers["ETag"]
+    assert _stats()["hits"] == hits + 1
+    assert client.get("/restaurants", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+def test_gzip_representation_has_its_own_etag(client, make_restaurant):
+    make_restaurant()
+    plain = client.get("/restaurants")
+    gz = client.get("/restaurants", headers={"Accept-Encoding": "gzip"})
+    assert gz.headers["Content-Encoding"] == "gzip" and "Accept-Encoding" in gz.headers["Vary"]
+    assert gz.headers["ETag"] == plain.headers["ETag"][:-1] + '-gz"'
+    assert client.get("/restaurants", headers={"Accept-Encoding": "gzip",
+                                               "If-None-Match": plain.headers["ETag"]}).status_code == 200
+
+def test_add_invalidates_and_flashes_bypass_the_cache(client):
+    client.get("/restaurants")
+    name = next(_names)
+    _add(client, name)
+    stores = _stats()["size"], _stats()["misses"]
+    flashed = client.get("/restaurants")  # renders (and consumes) the flash: not cached
+    assert b"Restaurant added successfully" in flashed.data and name.encode() in flashed.data
+    assert (_stats()["size"], _stats()["misses"]) == stores
+    again = client.get("/restaurants")
+    assert b"Restaurant added successfully" not in again.data and name.encode() in again.data
+
+@pytest.fixture
+def with_replicas(monkeypatch):
+    """Replicas configured; on SQLite every read still goes to the one database."""
+    monkeypatch.setattr(app, "MYSQL_REPLICA_URLS", ["mysql://replica"])
+    monkeypatch.setattr(db, "MYSQL_REPLICA_URLS", ["mysql://replica"])
+    yield
+    db.pin_reads_to_primary(False)
+
+def test_unpinned_view_right_after_a_write_is_not_cached(flask_app, with_replicas):
+    writer, reader = flask_app.test_client(), flask_app.test_client()
+    name = next(_names)
+    _add(writer, name)
+    unsettled = _stats()["unsettled"]
+    reader.get("/restaurants")  # a replica may not have the row yet: don't keep this page
+    assert _stats()["unsettled"] == unsettled + 1
+    # the writer's session is pinned to the primary, and what it loads is stored
+    assert name.encode() in writer.get("/restaurants").data
+    assert name.encode() in writer.get("/restaurants").data
+    assert _stats()["unsettled"] == unsettled + 1
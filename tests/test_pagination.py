@@ -0,0 +1,115 @@
+# tests/test_pagination.py
+import pytest
+
+from app import DELIVERY_KEYSET
+from pagination import Keyset, encode_cursor, fetch_page, page_size
+
+DELIVERY_SQL = "SELECT d.* FROM DELIVERY d"
+
+@pytest.fixture
+def deliveries(conn, customer_id, make_restaurant):
+    """Seven deliveries of one order: two share a date, three have none. Returns their IDs in page order."""
+    restaurant_id, _ = make_restaurant()
+    with conn.cursor() as cur:
+        cur.execute("INSERT INTO DELIVERY_AGENT (Name) VALUES ('Pager')")
+        agent_id = cur.lastrowid
+        cur.execute("INSERT INTO ORDERS (Customer_ID, Restaurant_ID, Order_Date, Total_Amount) "
+                    "VALUES (%s, %s, '2024-05-01 12:00:00', 10)", (customer_id, restaurant_id))
+        order_id = cur.lastrowid
+        ids = {}
+        for date in ("2024-05-03", None, "2024-05-01", "2024-05-03", None, "2024-05-02", None):
+            cur.execute("INSERT INTO DELIVERY (Order_ID, Agent_ID, Delivery_Date, Status) VALUES (%s, %s, %s, 'Pending')",
+                        (order_id, agent_id, date))
+            ids[cur.lastrowid] = date or ""
+    expected = sorted(ids, key=lambda i: (ids[i], i), reverse=True)
+    return order_id, expected
+
+def _page(cur, order_id, **kwargs):
+    return fetch_page(cur, DELIVERY_SQL, DELIVERY_KEYSET, params=(order_id,), where="d.Order_ID = %s", **kwargs)
+
+def _walk(cur, order_id, limit):
+    seen, cursor = [], None
+    while True:
+        page = _page(cur, order_id, after=cursor, limit=limit)
+        seen += [r["Delivery_ID"] for r in page.rows]
+        if not page.next_cursor:
+            return seen, page
+        cursor = page.next_cursor
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 7, 50])
+def test_forward_walk_includes_null_dates(conn, deliveries, limit):
+    order_id, expected = deliveries
+    with conn.cursor() as cur:
+        seen, _ = _walk(cur, order_id, limit)
+    assert seen == expected
+
+def test_backward_walk_mirrors_forward(conn, deliveries):
+    order_id, expected = deliveries
+    with conn.cursor() as cur:
+        _, last = _walk(cur, order_id, 2)
+        seen, cursor = [r["Delivery_ID"] for r in last.rows], last.prev_cursor
+        while cursor:
+            page = _page(cur, order_id, before=cursor, limit=2)
+            seen = [r["Delivery_ID"] for r in page.rows] + seen
+            cursor = page.prev_cursor
+    assert seen == expected
+
+def test_first_page_has_no_prev_and_last_has_no_next(conn, deliveries):
+    order_id, expected = deliveries
+    with conn.cursor() as cur:
+        first = _page(cur, order_id, limit=len(expected))
+        assert first.prev_cursor is None and first.next_cursor is None
+        after_last = _page(cur, order_id, after=encode_cursor([None, 0]), limit=5)
+    assert after_last.rows == [] and after_last.to_dict() == {"limit": 5, "next": None, "prev": None}
+
+@pytest.mark.parametrize("cursor", ["not-base64!", encode_cursor(["2024-05-03"]), encode_cursor({"a": 1}), ""])
+def test_bad_cursor_means_first_page(conn, deliveries, cursor):
+    order_id, expected = deliveries
+    with conn.cursor() as cur:
+        page = _page(cur, order_id, after=cursor, limit=3)
+    assert [r["Delivery_ID"] for r in page.rows] == expected[:3]
+
+def test_null_rows_are_their_own_segment():
+    keyset = Keyset(("a", "A"), ("b", "B"), descending=True, nullable=True)
+    assert keyset.order_by() == "a DESC, b DESC"
+    assert keyset.segments() == [("a IS NOT NULL", []), ("a IS NULL", [])]
+    assert keyset.segments([5, 9]) == [("(a <= %s AND ((a < %s) OR (a = %s AND b < %s)))", [5, 5, 5, 9]),
+                                       ("a IS NULL", [])]
+    assert keyset.segments([None, 9]) == [("(a IS NULL AND (b < %s))", [9])]
+    assert keyset.segments([None, 9], reverse=True) == [("(a IS NULL AND (b > %s))", [9]), ("a IS NOT NULL", [])]
+    assert keyset.segments([5, 9], reverse=True) == [("(a >= %s AND ((a > %s) OR (a = %s AND b > %s)))", [5, 5, 5, 9])]
+
+class _Explaining:
+    """Cursor stand-in that records the query plan of each statement fetch_page runs."""
+    def __init__(self, cur):
+        self._cur, self.plans = cur, []
+
+    def execute(self, sql, params):
+        self._cur.execute("EXPLAIN QUERY PLAN " + sql, params)
+        self.plans.append(" | ".join(r["detail"] for r in self._cur.fetchall()))
+        self._cur.execute(sql, params)
+
+    def fetchall(self):
+        return self._cur.fetchall()
+
+@pytest.mark.parametrize("direction", ["after", "before"])
+@pytest.mark.parametrize("cursor", [None, ["2024-05-02", 10 ** 9], [None, 10 ** 9]])
+def test_delivery_pages_use_the_date_index(conn, cursor, direction):
+    with conn.cursor() as cur:
+        explaining = _Explaining(cur)
+        fetch_page(explaining, DELIVERY_SQL, DELIVERY_KEYSET, limit=3, **{direction: cursor and encode_cursor(cursor)})
+    for plan in explaining.plans:
+        assert "IX_Delivery_Date" in plan and "TEMP B-TREE" not in plan, plan
+
+@pytest.mark.parametrize("raw, size", [(None, 50), ("x", 50), ("0", 1), ("-5", 1), ("10", 10), ("100000", 200)])
+def test_page_size_clamps(raw, size):
+    assert page_size(raw) == size
+
+def test_listing_page_walks_all_deliveries(client, deliveries):
+    order_id, expected = deliveries
+    seen, cursor = [], ""
+    while cursor is not None:
+        data = client.get(f"/deliveries?format=json&limit=4&after={cursor}").get_json()
+        seen += [r["Delivery_ID"] for r in data["rows"] if r["Order_ID"] == order_id]
+        cursor = data["page"]["next"]
+    assert seen == expected
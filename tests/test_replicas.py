@@ -0,0 +1,114 @@
+# tests/test_replicas.py
+import pytest
+
+import cache
+import db
+from cache import LocalVersions, ReadThroughCache
+from stats import DashboardStats
+
+PRIMARY = "mysql://app@primary:3306/restaurant"
+REPLICAS = ["mysql://app@replica-a:3306/restaurant", "mysql://app@replica-b:3306/restaurant"]
+
+class _FakeRaw:
+    open = True
+    server_status = 0
+
+    def __init__(self, url):
+        self.url = url
+
+    def ping(self, reconnect=False): pass
+    def get_autocommit(self): return True
+    def close(self): pass
+
+@pytest.fixture
+def mysql(monkeypatch):
+    """MYSQL_URL plus two replicas, with connects recorded instead of made; `down` holds failing URLs."""
+    down = set()
+
+    def connect(url=None):
+        if url in down:
+            raise OSError(f"connection refused: {url}")
+        return _FakeRaw(url or PRIMARY)
+    monkeypatch.setattr(db, "MYSQL_URL", PRIMARY)
+    monkeypatch.setattr(db, "MYSQL_REPLICA_URLS", REPLICAS)
+    monkeypatch.setattr(db, "_mysql_connect", connect)
+    db.reset_pool()
+    yield down
+    db.pin_reads_to_primary(False)
+    monkeypatch.undo()
+    db.reset_pool()
+
+def _read_from(readonly=True):
+    with db.get_conn(readonly=readonly) as conn:
+        return conn._raw.url
+
+def test_reads_rotate_over_replicas_and_writes_use_the_primary(mysql):
+    assert {_read_from() for _ in range(4)} == set(REPLICAS)
+    assert _read_from(readonly=False) == PRIMARY
+
+def test_failed_replica_is_skipped_then_rechecked(mysql, monkeypatch):
+    mysql.add(REPLICAS[0])
+    assert [_read_from() for _ in range(4)] == [REPLICAS[1]] * 4
+    replicas = db._get_replicas()
+    assert replicas.stats()["failures"] == 1  # tried once, then skipped while down
+    mysql.clear()
+    monkeypatch.setattr(replicas, "_down_until", [0.0, 0.0])  # retry window over
+    assert {_read_from() for _ in range(4)} == set(REPLICAS)
+
+def test_primary_serves_when_no_replica_can(mysql):
+    mysql.update(REPLICAS)
+    assert _read_from() == PRIMARY
+    assert db._get_replicas().stats()["fallbacks"] == 1
+
+def test_pinned_reads_use_the_primary(mysql):
+    db.pin_reads_to_primary(True)
+    assert _read_from() == PRIMARY and db.reads_pinned() and not db.replica_reads()
+
+@pytest.fixture
+def with_replicas(monkeypatch):
+    monkeypatch.setattr(db, "MYSQL_REPLICA_URLS", REPLICAS)
+    yield
+    db.pin_reads_to_primary(False)
+
+def test_replica_load_right_after_a_write_is_not_cached(with_replicas):
+    versions = LocalVersions()
+    c = ReadThroughCache("replica_test", ("RESTAURANT",), versions=versions)
+    versions.bump("RESTAURANT")  # a write just committed; the replica may not have it yet
+    assert c.get("k", lambda: "maybe stale") == "maybe stale"
+    assert c.get("k", lambda: "reloaded") == "reloaded"
+    assert c.stats()["unsettled"] == 2 and c.stats()["size"] == 0
+
+def test_primary_load_or_settled_replica_load_is_cached(with_replicas, monkeypatch):
+    versions = LocalVersions()
+    c = ReadThroughCache("replica_test", ("RESTAURANT",), versions=versions)
+    versions.bump("RESTAURANT")
+    db.pin_reads_to_primary(True)
+    assert c.get("k", lambda: "fresh") == "fresh"
+    db.pin_reads_to_primary(False)
+    assert c.get("k", lambda: "unused") == "fresh"
+
+    c.clear()
+    monkeypatch.setattr(cache, "READ_YOUR_WRITES_SECONDS", 0)  # replication has caught up
+    assert c.get("k", lambda: "settled") == "settled"
+    assert c.get("k", lambda: "unused") == "settled"
+
+def test_dashboard_snapshot_is_bypassed_for_pinned_reads(with_replicas, conn):
+    stats = DashboardStats(ttl=60)
+    stats._value, stats._expires = {"orders": -1}, float("inf")  # a snapshot from a lagging replica
+    assert stats.get(conn) == {"orders": -1}
+    db.pin_reads_to_primary(True)
+    fresh = stats.get(conn)
+    assert fresh["orders"] >= 0
+    db.pin_reads_to_primary(False)
+    assert stats.get(conn) == fresh
+
+def test_writes_pin_the_session_to_the_primary(client, monkeypatch):
+    import app
+    seen = []
+    monkeypatch.setattr(app, "MYSQL_REPLICA_URLS", REPLICAS)
+    monkeypatch.setattr(db, "MYSQL_REPLICA_URLS", REPLICAS)
+    monkeypatch.setattr(app, "render_template", lambda *a, **kw: seen.append(db.reads_pinned()) or "")
+    client.get("/")
+    client.post("/customers/add", data={"name": "Pinned Customer"})
+    client.get("/")
+    assert seen == [False, True]
@@ -0,0 +1,79 @@
+# tests/test_search.py
+import pytest
+
+from cache import invalidate
+from conftest import fetchone
+from search import search, statement
+from test_asgi import call
+
+def _add_item(conn, restaurant_id, name):
+    with conn.cursor() as cur:
+        cur.execute("INSERT INTO FOOD_ITEM (Name, Price, Restaurant_ID) VALUES (%s, %s, %s)", (name, 9, restaurant_id))
+        item_id = cur.lastrowid
+    invalidate("FOOD_ITEM")
+    return item_id
+
+def _write(conn, sql, params):
+    with conn.cursor() as cur:
+        cur.execute(sql, params)
+    invalidate("RESTAURANT", "FOOD_ITEM")
+
+def _names(conn, q, kind="items"):
+    return [r["Name"] for r in search(conn, q, (kind,))[kind]]
+
+def test_every_word_matches_and_the_last_as_a_prefix(conn, make_restaurant):
+    restaurant_id, _ = make_restaurant(prices=())
+    _add_item(conn, restaurant_id, "Quokka Chicken Tikka")
+    _add_item(conn, restaurant_id, "Quokka Chickpea Curry")
+    assert sorted(_names(conn, "quokka chick")) == ["Quokka Chicken Tikka", "Quokka Chickpea Curry"]
+    assert _names(conn, "QUOK tik") == ["Quokka Chicken Tikka"]
+    assert _names(conn, "quokka tikka masala") == []
+
+def test_fts_index_follows_inserts_updates_and_deletes(conn, make_restaurant):
+    restaurant_id, _ = make_restaurant(prices=(), name="Wallaby Grill")
+    item_id = _add_item(conn, restaurant_id, "Wombat Stew")
+    assert _names(conn, "wombat") == ["Wombat Stew"]
+    _write(conn, "UPDATE FOOD_ITEM SET Name = %s WHERE Item_ID = %s", ("Platypus Stew", item_id))
+    assert _names(conn, "wombat") == [] and _names(conn, "platypus") == ["Platypus Stew"]
+    _write(conn, "UPDATE RESTAURANT SET Address = %s WHERE Restaurant_ID = %s", ("9 Kookaburra Lane", restaurant_id))
+    assert _names(conn, "kookaburra", "restaurants") == ["Wallaby Grill"]
+    # deleting the restaurant cascades to its items; the triggers fire for both
+    _write(conn, "DELETE FROM RESTAURANT WHERE Restaurant_ID = %s", (restaurant_id,))
+    assert _names(conn, "platypus") == [] and _names(conn, "wallaby", "restaurants") == []
+    for table in ("FOOD_ITEM_FTS", "RESTAURANT_FTS"):  # index matches its content table exactly
+        _write(conn, f"INSERT INTO {table} ({table}, rank) VALUES ('integrity-check', 1)", ())
+
+@pytest.mark.parametrize("q, found", [
+    ('"', False), ('near"east', True), ("*", False), ("ne*", True), ("NEAR", True), ("NEAR(near east)", True),
+    ("NEAR(near east, 2)", False), ("near AND east", False), ("near OR pizza", False), ("NOT pizza", False),
+    ("Name:near", False), ("{Name}: near", False), ("^near", True), ("-near", True), ("near + east", True),
+])
+def test_fts_syntax_in_user_input_is_searched_literally(q, found, client, conn, make_restaurant):
+    restaurant_id, _ = make_restaurant(prices=())
+    if not fetchone(conn, "SELECT 1 AS x FROM FOOD_ITEM WHERE Name = %s", ("Near East Platter",)):
+        _add_item(conn, restaurant_id, "Near East Platter")
+    resp = client.get("/search", query_string={"q": q, "type": "items"})
+    assert resp.status_code == 200
+    status, _, _ = call("/search", f"q={q}&type=items".encode())
+    assert status == 200
+    assert ("Near East Platter" in [r["Name"] for r in resp.get_json()["items"]]) is found
+
+def test_short_words_fall_back_to_like_on_mysql(conn, make_restaurant):
+    restaurant_id, _ = make_restaurant(prices=(), name="Ox Bow Diner")
+    _add_item(conn, restaurant_id, "Ox Tail Soup")
+    _add_item(conn, restaurant_id, "Boxed Oxo Cube")
+    _add_item(conn, restaurant_id, "Boxed Lunch")
+    _add_item(conn, restaurant_id, "Qa_Special")
+    _add_item(conn, restaurant_id, "X_Ray Fries")
+    assert "MATCH" in statement("items", ["oxtail"], False, 10)[0]
+
+    def run(kind, terms):
+        sql, params = statement(kind, terms, False, 10)
+        assert "MATCH" not in sql  # the fallback SQL runs on either backend
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            return [r["Name"] for r in cur.fetchall()]
+    assert run("items", ["ox"]) == ["Ox Tail Soup", "Boxed Oxo Cube"]  # not "Boxed Lunch"
+    assert run("items", ["ox", "ta"]) == ["Ox Tail Soup"]
+    assert run("items", ["x_"]) == ["X_Ray Fries"] and run("items", ["q_"]) == []  # "_" is not a wildcard
+    assert run("restaurants", ["bo", "di"]) == ["Ox Bow Diner"]
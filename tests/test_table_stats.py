@@ -0,0 +1,45 @@
+# tests/test_table_stats.py
+from conftest import fetchone
+from db import STATS_TABLES, ensure_schema
+from stats import DashboardStats
+
+def _counters(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT Table_Name, Row_Count FROM TABLE_STATS")
+        return {r["Table_Name"]: int(r["Row_Count"]) for r in cur.fetchall()}
+
+def _actual(conn):
+    return {t: int(fetchone(conn, f"SELECT COUNT(*) AS n FROM {t}")["n"]) for t in STATS_TABLES}
+
+def test_counters_match_row_counts(conn):
+    assert _counters(conn) == _actual(conn)
+
+def test_triggers_follow_inserts_deletes_and_cascades(conn, make_restaurant):
+    before = _counters(conn)
+    restaurant_id, _ = make_restaurant(prices=(5, 6, 7))
+    assert _counters(conn)["RESTAURANT"] == before["RESTAURANT"] + 1
+    assert _counters(conn)["FOOD_ITEM"] == before["FOOD_ITEM"] + 3
+
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM RESTAURANT WHERE Restaurant_ID = %s", (restaurant_id,))
+    assert _counters(conn) == before  # the FOOD_ITEM rows went with it
+    assert _counters(conn) == _actual(conn)
+
+def test_schema_rerun_keeps_counters(conn, make_restaurant):
+    make_restaurant()
+    expected = _actual(conn)
+    ensure_schema(conn)
+    ensure_schema(conn)
+    assert _counters(conn) == expected
+    assert fetchone(conn, "SELECT COUNT(*) AS n FROM TABLE_STATS")["n"] == len(STATS_TABLES)
+
+def test_dashboard_falls_back_to_counting(conn):
+    expected = DashboardStats(ttl=0).get(conn)
+    saved = _counters(conn)
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM TABLE_STATS")
+    try:
+        assert DashboardStats(ttl=0).get(conn) == expected
+    finally:
+        with conn.cursor() as cur:
+            cur.executemany("INSERT INTO TABLE_STATS (Table_Name, Row_Count) VALUES (%s, %s)", list(saved.items()))